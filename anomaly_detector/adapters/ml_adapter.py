@@ -2,28 +2,207 @@
 """
 MLflowAdapter implements MLflowPort for experiment tracking and model registry.
 """
+import os
+import time
+import queue
+import atexit
+import logging
+import threading
 import mlflow
+import mlflow.pyfunc
+import mlflow.sklearn
+from concurrent.futures import Future
+from mlflow.entities import Metric, Param
+from mlflow.utils.mlflow_tags import MLFLOW_PARENT_RUN_ID
 from anomaly_detector.domain.ports import MLflowPort
 
+logger = logging.getLogger(__name__)
+
+
+class CompositeModelWrapper(mlflow.pyfunc.PythonModel):
+    """Serves a composite detector (e.g. ShardedAnomalyDetector) as a single pyfunc model."""
+    def __init__(self, composite):
+        self.composite = composite
+
+    def predict(self, context, model_input):
+        scored = self.composite.score(model_input)
+        return scored[['is_anomaly', 'anomaly_score']]
+
+
+class BundleModelWrapper(mlflow.pyfunc.PythonModel):
+    """Serves an AnomalyDetector model bundle (logged as the 'bundle' artifact) as a pyfunc model."""
+    def load_context(self, context):
+        from anomaly_detector.domain.anomaly_detection import AnomalyDetector
+        self.detector = AnomalyDetector.from_bundle(context.artifacts['bundle'])
+
+    def predict(self, context, model_input):
+        scored = self.detector.score(model_input)
+        return scored[['is_anomaly', 'anomaly_score']]
+
+
+def _run_concurrently(calls: list):
+    """Runs (fn, args) pairs on plain threads (usable at interpreter exit) and re-raises the first error."""
+    errors = []
+
+    def target(fn, args):
+        try:
+            fn(*args)
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=target, args=(fn, args), daemon=True) for fn, args in calls]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+
 
 class MLflowAdapter(MLflowPort):
-    def __init__(self, experiment_name: str, tracking_uri: str = None):
+    """
+    Logging calls are queued to a background worker so training and scoring return as
+    soon as the model is ready; log_run returns a Future with the run id. Params,
+    metrics and artifacts staged through log_params/log_metrics/log_artifact are
+    batched into a single run. flush() waits for everything queued (also run at exit).
+    """
+    def __init__(self, experiment_name: str, tracking_uri: str = None, async_logging: bool = True):
         if tracking_uri:
             mlflow.set_tracking_uri(tracking_uri)
-        mlflow.set_experiment(experiment_name)
+        experiment = mlflow.set_experiment(experiment_name)
         self.client = mlflow.tracking.MlflowClient()
         self.experiment_name = experiment_name
+        self.experiment_id = experiment.experiment_id
+        self.async_logging = async_logging
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self._staged = {'params': {}, 'metrics': {}, 'artifacts': []}
+        self._staged_lock = threading.Lock()
+        atexit.register(self._flush_at_exit)
 
-    def log_run(self, sk_model, params: dict, metrics: dict, artifacts: list, input_example=None, signature=None, registered_model_name=None):
+    def _ensure_worker(self):
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._drain, name="mlflow-logger", daemon=True)
+                self._worker.start()
+
+    def _drain(self):
+        while True:
+            future, fn, args, kwargs = self._queue.get()
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(fn(*args, **kwargs))
+                    except Exception as e:
+                        logger.error("MLflow logging failed: %s", e)
+                        future.set_exception(e)
+            finally:
+                self._queue.task_done()
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        """Queues fn on the logging worker (after everything queued before it); runs inline if async_logging is off."""
+        future = Future()
+        if not self.async_logging:
+            future.set_running_or_notify_cancel()
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        self._ensure_worker()
+        self._queue.put((future, fn, args, kwargs))
+        return future
+
+    def flush(self, timeout: float = None) -> bool:
+        """Commits staged params/metrics/artifacts and waits until every queued job has finished."""
+        self.commit_staged()
+        if not self.async_logging:
+            return True
+        if timeout is None:
+            self._queue.join()
+            return True
+        done = threading.Event()
+        self.submit(done.set)
+        return done.wait(timeout)
+
+    def _flush_at_exit(self):
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error("MLflow flush at exit failed: %s", e)
+
+    def log_run(self, sk_model, params: dict, metrics: dict, artifacts: list, input_example=None, signature=None, registered_model_name=None, composite_model=None, run_name: str = None, model_bundle: str = None) -> Future:
         """
-        Logs all params, metrics, model, and artifacts in a single MLflow run context.
+        Logs all params, metrics, model, and artifacts in a single MLflow run (in the background).
+        A composite_model (anything with score(df)) is logged as a pyfunc model instead of sk_model;
+        otherwise a model_bundle folder is logged as a pyfunc model that scores from the bundle.
+        Returns a Future resolving to the run id.
         """
-        with mlflow.start_run() as run:
-            if params:
-                mlflow.log_params(params)
-            if metrics:
-                mlflow.log_metrics(metrics)
-            if sk_model is not None:
+        staged = self._take_staged()
+        return self.submit(
+            self._log_run_job,
+            sk_model=sk_model,
+            params={**staged['params'], **(params or {})},
+            metrics={**staged['metrics'], **(metrics or {})},
+            artifacts=staged['artifacts'] + list(artifacts or []),
+            input_example=input_example,
+            signature=signature,
+            registered_model_name=registered_model_name,
+            composite_model=composite_model,
+            run_name=run_name,
+            model_bundle=model_bundle
+        )
+
+    def _log_run_job(self, sk_model, params: dict, metrics: dict, artifacts: list, input_example=None, signature=None,
+                     registered_model_name=None, composite_model=None, run_name: str = None, model_bundle: str = None) -> str:
+        run_id = self.client.create_run(self.experiment_id, run_name=run_name).info.run_id
+        try:
+            # Params and metrics go out in one batched request
+            timestamp = int(time.time() * 1000)
+            self.client.log_batch(
+                run_id,
+                metrics=[Metric(k, float(v), timestamp, 0) for k, v in (metrics or {}).items() if v is not None],
+                params=[Param(k, str(v)) for k, v in (params or {}).items()]
+            )
+            calls = [(self._log_artifact_path, (run_id, path)) for path in artifacts if path]
+            if composite_model is not None or model_bundle is not None or sk_model is not None:
+                calls.append((self._log_model, (run_id, sk_model, composite_model, input_example, signature,
+                                                registered_model_name, model_bundle)))
+            # Artifacts upload concurrently with model serialization
+            _run_concurrently(calls)
+        except Exception:
+            self.client.set_terminated(run_id, status="FAILED")
+            raise
+        self.client.set_terminated(run_id)
+        return run_id
+
+    def _log_artifact_path(self, run_id: str, path: str):
+        if os.path.isdir(path):
+            self.client.log_artifacts(run_id, path, artifact_path=os.path.basename(os.path.normpath(path)))
+        else:
+            self.client.log_artifact(run_id, path)
+
+    @staticmethod
+    def _log_model(run_id: str, sk_model, composite_model, input_example, signature, registered_model_name, model_bundle=None):
+        # Model flavors need an active run; the fluent run stack is per thread
+        with mlflow.start_run(run_id=run_id):
+            if composite_model is not None:
+                mlflow.pyfunc.log_model(
+                    artifact_path="model",
+                    python_model=CompositeModelWrapper(composite_model),
+                    input_example=input_example,
+                    registered_model_name=registered_model_name
+                )
+            elif model_bundle is not None:
+                mlflow.pyfunc.log_model(
+                    artifact_path="model",
+                    python_model=BundleModelWrapper(),
+                    artifacts={'bundle': model_bundle},
+                    input_example=input_example,
+                    signature=signature,
+                    registered_model_name=registered_model_name
+                )
+            else:
                 mlflow.sklearn.log_model(
                     sk_model=sk_model,
                     artifact_path="model",
@@ -31,11 +210,46 @@ class MLflowAdapter(MLflowPort):
                     signature=signature,
                     registered_model_name=registered_model_name
                 )
-            if artifacts:
-                for path in artifacts:
-                    if path:
-                        mlflow.log_artifact(path)
-            return run.info.run_id
+
+    def log_sweep(self, trials: list, params: dict = None, metric_keys=None, run_name: str = "hyperparameter_sweep") -> Future:
+        """
+        Logs a hyperparameter sweep as one parent run with a nested run per trial (in the background).
+        Trials are expected best-first; the first one is also logged on the parent as best_*.
+        Returns a Future resolving to the parent run id.
+        """
+        return self.submit(self._log_sweep_job, [dict(trial) for trial in trials], dict(params or {}),
+                           set(metric_keys or []), run_name)
+
+    def _log_batch(self, run_id: str, values: dict, metric_keys: set, prefix: str = ""):
+        timestamp = int(time.time() * 1000)
+        self.client.log_batch(
+            run_id,
+            metrics=[Metric(f"{prefix}{k}", float(v), timestamp, 0) for k, v in values.items() if k in metric_keys and v is not None],
+            params=[Param(f"{prefix}{k}", str(v)) for k, v in values.items() if k not in metric_keys]
+        )
+
+    def _log_sweep_job(self, trials: list, params: dict, metric_keys: set, run_name: str) -> str:
+        parent_id = self.client.create_run(self.experiment_id, run_name=run_name).info.run_id
+        try:
+            if params:
+                self._log_batch(parent_id, params, set())
+            for i, trial in enumerate(trials):
+                # Nesting is the parentRunId tag the fluent API would set
+                child_id = self.client.create_run(self.experiment_id, run_name=f"{run_name}_trial_{i}",
+                                                  tags={MLFLOW_PARENT_RUN_ID: parent_id}).info.run_id
+                try:
+                    self._log_batch(child_id, trial, metric_keys)
+                except Exception:
+                    self.client.set_terminated(child_id, status="FAILED")
+                    raise
+                self.client.set_terminated(child_id)
+            if trials:
+                self._log_batch(parent_id, trials[0], metric_keys, prefix="best_")
+        except Exception:
+            self.client.set_terminated(parent_id, status="FAILED")
+            raise
+        self.client.set_terminated(parent_id)
+        return parent_id
 
     def log_model(self, sk_model, artifact_path, input_example, signature, registered_model_name=None):
         with mlflow.start_run():
@@ -48,16 +262,31 @@ class MLflowAdapter(MLflowPort):
             )
 
     def log_params(self, params: dict):
-        with mlflow.start_run():
-            mlflow.log_params(params)
+        """Staged; sent with the next log_run or commit_staged in the same run."""
+        with self._staged_lock:
+            self._staged['params'].update(params)
 
     def log_metrics(self, metrics: dict):
-        with mlflow.start_run():
-            mlflow.log_metrics(metrics)
+        """Staged; sent with the next log_run or commit_staged in the same run."""
+        with self._staged_lock:
+            self._staged['metrics'].update(metrics)
 
     def log_artifact(self, path: str):
-        with mlflow.start_run():
-            mlflow.log_artifact(path)
+        """Staged; sent with the next log_run or commit_staged in the same run."""
+        with self._staged_lock:
+            self._staged['artifacts'].append(path)
+
+    def _take_staged(self) -> dict:
+        with self._staged_lock:
+            staged, self._staged = self._staged, {'params': {}, 'metrics': {}, 'artifacts': []}
+        return staged
+
+    def commit_staged(self, run_name: str = None):
+        """Logs staged params, metrics and artifacts as one run; returns a Future (None if nothing is staged)."""
+        staged = self._take_staged()
+        if not any(staged.values()):
+            return None
+        return self.submit(self._log_run_job, sk_model=None, run_name=run_name, **staged)
 
     def register_model(self, model, name: str):
         with mlflow.start_run():
@@ -0,0 +1,185 @@
+"""
+ModelCache keeps registered model versions on local disk.
+
+Each (model name, version) is downloaded once from the tracking store into
+``<cache_dir>/<name>/<version>/``. Models logged from a model bundle carry the
+scaler, spatial preprocessor and compiled forest inside the model folder. Files
+are checksummed on download; on load only their size and mtime are compared with
+the recorded ones and a file is re-hashed when those differ. Least-recently-used
+versions are evicted under a size budget, and the bundle arrays are loaded
+memory-mapped.
+"""
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import threading
+import yaml
+import mlflow
+import mlflow.pyfunc
+import mlflow.sklearn
+from collections import OrderedDict
+from pathlib import Path
+from anomaly_detector.domain.model_bundle import ModelBundle
+from anomaly_detector.kernel import load_config
+
+logger = logging.getLogger(__name__)
+
+CHECKSUMS_FILE = "checksums.json"
+MODEL_DIR = "model"
+BUNDLE_ARTIFACT = "bundle"
+
+
+def _sha256(path: Path, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _file_state(path: Path, digest: str = None) -> dict:
+    stat = path.stat()
+    return {'sha256': digest or _sha256(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _dir_size(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+class ModelCache:
+    def __init__(self, cache_dir: str = ".model_cache", max_bytes: int = 2048 * 1024 * 1024, max_loaded: int = 2):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.max_loaded = max_loaded
+        self._loaded = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config_path: str = None) -> "ModelCache":
+        artifact_config = load_config("artifacts.yaml", config_path)
+        return cls(
+            cache_dir=artifact_config.get("model_cache_dir", ".model_cache"),
+            max_bytes=int(artifact_config.get("model_cache_max_mb", 2048)) * 1024 * 1024
+        )
+
+    def entry_dir(self, name: str, version) -> Path:
+        return self.cache_dir / name / str(version)
+
+    def get(self, name: str, version, run_id: str = None, source: str = None) -> dict:
+        """
+        Returns {'model', 'scaler', 'spatial_preprocessor', 'compiled_forest'} (missing artifacts are None),
+        from memory, then local disk, then the tracking store.
+        """
+        key = (name, str(version))
+        with self._lock:
+            if key in self._loaded:
+                self._loaded.move_to_end(key)
+                self._touch(self.entry_dir(name, version))
+                return self._loaded[key]
+            entry = self.entry_dir(name, version)
+            if not self._verify(entry):
+                shutil.rmtree(entry, ignore_errors=True)
+                self._download(entry, run_id, source)
+                self._evict(keep=entry)
+            self._touch(entry)
+            loaded = self._load(entry)
+            self._loaded[key] = loaded
+            while len(self._loaded) > self.max_loaded:
+                self._loaded.popitem(last=False)
+            return loaded
+
+    def _download(self, entry: Path, run_id: str, source: str):
+        start = time.time()
+        tmp = entry.with_name(f".{entry.name}.tmp-{os.getpid()}")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        try:
+            downloaded = mlflow.artifacts.download_artifacts(artifact_uri=source or f"runs:/{run_id}/{MODEL_DIR}",
+                                                             dst_path=str(tmp / ".download"))
+            shutil.move(downloaded, tmp / MODEL_DIR)
+            shutil.rmtree(tmp / ".download", ignore_errors=True)
+            checksums = {
+                p.relative_to(tmp).as_posix(): _file_state(p) for p in sorted(tmp.rglob("*")) if p.is_file()
+            }
+            self._write_checksums(tmp, checksums)
+            os.replace(tmp, entry)
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        logger.info(f"Cached {entry} in {time.time() - start:.2f}s")
+
+    @staticmethod
+    def _write_checksums(entry: Path, checksums: dict):
+        tmp_path = entry / f".{CHECKSUMS_FILE}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(checksums, f, indent=2)
+        os.replace(tmp_path, entry / CHECKSUMS_FILE)
+
+    def _verify(self, entry: Path) -> bool:
+        """
+        Files whose size and mtime still match the recorded ones are trusted; the others
+        are re-hashed and their new size and mtime recorded when the hash still matches.
+        """
+        checksum_path = entry / CHECKSUMS_FILE
+        if not checksum_path.exists():
+            return False
+        with open(checksum_path, "r") as f:
+            checksums = json.load(f)
+        changed = False
+        for rel_path, expected in checksums.items():
+            path = entry / rel_path
+            if not path.is_file():
+                logger.warning(f"Missing {path}; refetching {entry}")
+                return False
+            # Entries written before size/mtime were recorded hold the digest only
+            if isinstance(expected, str):
+                expected = {'sha256': expected}
+            stat = path.stat()
+            if stat.st_size == expected.get('size') and stat.st_mtime_ns == expected.get('mtime_ns'):
+                continue
+            digest = _sha256(path)
+            if digest != expected['sha256']:
+                logger.warning(f"Checksum mismatch for {path}; refetching {entry}")
+                return False
+            checksums[rel_path] = _file_state(path, digest)
+            changed = True
+        if changed:
+            self._write_checksums(entry, checksums)
+        return True
+
+    @staticmethod
+    def _touch(entry: Path):
+        checksum_path = entry / CHECKSUMS_FILE
+        if checksum_path.exists():
+            os.utime(checksum_path)
+
+    def _evict(self, keep: Path):
+        """Drops least-recently-used versions until the cache fits max_bytes (never `keep`)."""
+        entries = [p.parent for p in self.cache_dir.glob(f"*/*/{CHECKSUMS_FILE}")]
+        sizes = {entry: _dir_size(entry) for entry in entries}
+        total = sum(sizes.values())
+        for entry in sorted(entries, key=lambda e: (e / CHECKSUMS_FILE).stat().st_mtime):
+            if total <= self.max_bytes:
+                break
+            if entry == keep:
+                continue
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= sizes[entry]
+            self._loaded.pop((entry.parent.name, entry.name), None)
+            logger.info(f"Evicted {entry} from model cache")
+
+    def _load(self, entry: Path) -> dict:
+        model_dir = entry / MODEL_DIR
+        with open(model_dir / "MLmodel", "r") as f:
+            flavors = (yaml.safe_load(f) or {}).get("flavors", {})
+        model = mlflow.sklearn.load_model(str(model_dir)) if "sklearn" in flavors else mlflow.pyfunc.load_model(str(model_dir))
+        loaded = {'model': model, 'scaler': None, 'spatial_preprocessor': None, 'compiled_forest': None}
+        # Models logged from a bundle list it among their pyfunc artifacts
+        bundle_path = flavors.get("python_function", {}).get("artifacts", {}).get(BUNDLE_ARTIFACT, {}).get("path")
+        if bundle_path and (model_dir / bundle_path).is_dir():
+            bundle = ModelBundle.load(str(model_dir / bundle_path), mmap_mode='r')
+            loaded.update(scaler=bundle.scaler, spatial_preprocessor=bundle.spatial_preprocessor(), compiled_forest=bundle.forest)
+        return loaded
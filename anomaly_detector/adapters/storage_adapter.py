@@ -7,19 +7,52 @@ import pyarrow as pa
 import pyarrow.parquet as pq
 import boto3
 import os
+import json
+import hashlib
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from boto3.s3.transfer import TransferConfig
+from concurrent.futures import ThreadPoolExecutor
 from anomaly_detector.domain.ports import StoragePort
 
+MB = 1024 * 1024
+
+
+def local_etag(path: str, multipart_threshold: int = 8 * MB, multipart_chunksize: int = 8 * MB) -> str:
+    """S3-style ETag of a local file: MD5 for single-part uploads, MD5 of part MD5s plus '-N' for multipart."""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        if size < multipart_threshold:
+            return hashlib.md5(f.read()).hexdigest()
+        part_digests = [hashlib.md5(chunk).digest() for chunk in iter(lambda: f.read(multipart_chunksize), b"")]
+    return f"{hashlib.md5(b''.join(part_digests)).hexdigest()}-{len(part_digests)}"
 
 
 class StorageAdapter(StoragePort):
-    def __init__(self, s3_bucket=None, aws_access_key=None, aws_secret_key=None):
+    def __init__(self, s3_bucket=None, aws_access_key=None, aws_secret_key=None, endpoint_url=None,
+                 region_name=None, max_workers: int = 16, max_attempts: int = 5,
+                 multipart_threshold: int = 8 * MB, multipart_chunksize: int = 8 * MB):
         self.s3_bucket = s3_bucket
+        self.max_workers = max_workers
+        # Shared by all upload threads: the connection pool must be at least as large as the thread pool
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_threshold,
+            multipart_chunksize=multipart_chunksize,
+            max_concurrency=4,
+            use_threads=True
+        )
         self.s3 = None
         if s3_bucket and aws_access_key and aws_secret_key:
             self.s3 = boto3.client(
                 's3',
                 aws_access_key_id=aws_access_key,
-                aws_secret_access_key=aws_secret_key
+                aws_secret_access_key=aws_secret_key,
+                endpoint_url=endpoint_url,
+                region_name=region_name,
+                config=Config(
+                    max_pool_connections=max_workers * self.transfer_config.max_request_concurrency,
+                    retries={'max_attempts': max_attempts, 'mode': 'adaptive'}
+                )
             )
 
     def read(self, path: str) -> pd.DataFrame:
@@ -41,6 +74,64 @@ class StorageAdapter(StoragePort):
 
     def upload(self, local_path: str, s3_key: str):
         if self.s3:
-            self.s3.upload_file(local_path, self.s3_bucket, s3_key)
+            self.s3.upload_file(local_path, self.s3_bucket, s3_key, Config=self.transfer_config)
         else:
             raise RuntimeError("S3 client not configured.")
+
+    def download_json(self, s3_key: str):
+        """Parsed JSON object at s3_key, None when it does not exist."""
+        if not self.s3:
+            raise RuntimeError("S3 client not configured.")
+        try:
+            response = self.s3.get_object(Bucket=self.s3_bucket, Key=s3_key)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404'):
+                return None
+            raise
+        return json.load(response['Body'])
+
+    def remote_etags(self, prefix: str = "") -> dict:
+        """{key: ETag} for every object under prefix (one paginated listing)."""
+        etags = {}
+        paginator = self.s3.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.s3_bucket, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                etags[obj['Key']] = obj['ETag'].strip('"')
+        return etags
+
+    def upload_many(self, files, skip_unchanged: bool = True) -> dict:
+        """
+        Uploads {local_path: s3_key} (or (local_path, s3_key) pairs) concurrently.
+        Objects whose remote ETag equals the local one are skipped; remote ETags are listed
+        once per top-level prefix of the keys, never the whole bucket. Throttling and
+        transient errors are retried by the client (adaptive mode, max_attempts). Returns
+        {'uploaded': [...], 'skipped': [...], 'failed': {key: error}}.
+        """
+        if not self.s3:
+            raise RuntimeError("S3 client not configured.")
+        pairs = list(files.items()) if isinstance(files, dict) else list(files)
+        remote = {}
+        if skip_unchanged:
+            # One listing per top-level prefix: the common prefix of unrelated keys is the whole bucket
+            groups = {}
+            for _, s3_key in pairs:
+                groups.setdefault(s3_key.split('/', 1)[0], []).append(s3_key)
+            for keys in groups.values():
+                remote.update(self.remote_etags(os.path.commonprefix(keys)))
+        todo, skipped = [], []
+        for local_path, s3_key in pairs:
+            if s3_key in remote and remote[s3_key] == local_etag(
+                    local_path, self.transfer_config.multipart_threshold, self.transfer_config.multipart_chunksize):
+                skipped.append(s3_key)
+            else:
+                todo.append((local_path, s3_key))
+        report = {'uploaded': [], 'skipped': skipped, 'failed': {}}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(self.upload, local_path, s3_key): s3_key for local_path, s3_key in todo}
+            for future, s3_key in futures.items():
+                try:
+                    future.result()
+                    report['uploaded'].append(s3_key)
+                except Exception as e:
+                    report['failed'][s3_key] = str(e)
+        return report
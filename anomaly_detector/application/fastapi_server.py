@@ -4,7 +4,6 @@ FastAPI server for model serving, orchestrating domain and adapters.
 
 import os
 import logging
-import yaml
 import pandas as pd
 import mlflow
 import time
@@ -23,6 +22,8 @@ from anomaly_detector.domain.services import run_pipeline
 from anomaly_detector.application.ports import APIPort
 from anomaly_detector.adapters.metrics_adapter import MetricsAdapter
 from anomaly_detector.adapters.ml_adapter import MLflowAdapter
+from anomaly_detector.adapters.model_cache import ModelCache
+from anomaly_detector.kernel import CONFIG_DIR, load_config as load_yaml_config
 from prometheus_client import generate_latest
 
 
@@ -91,15 +92,9 @@ logging.basicConfig(level=logging.INFO)
 
 # Load config from YAML
 def load_config():
-    config_path = os.path.join(os.path.dirname(__file__), "..", "configs", "train.yaml")
-    try:
-        with open(config_path, "r") as f:
-            config = yaml.safe_load(f)
-        logger.info(f"Loaded config from {config_path}")
-        return config
-    except Exception as e:
-        logger.error(f"Failed to load config: {e}")
-        return {}
+    config = load_yaml_config("train.yaml")
+    logger.info(f"Loaded config from {CONFIG_DIR / 'train.yaml'}")
+    return config
 
 
 class APIService(APIPort):
@@ -113,6 +108,8 @@ class APIService(APIPort):
         self.model_version = None
         self.model_metrics = {}
         self.model = None
+        self.model_artifacts = {}
+        self.model_cache = ModelCache.from_config()
         self.load_best_model()
 
     def load_best_model(self):
@@ -122,13 +119,20 @@ class APIService(APIPort):
             versions = sorted(versions, key=lambda v: v.last_updated_timestamp, reverse=True)
             if versions:
                 best_version = versions[0]
+                if self.model is not None and best_version.version == self.model_version:
+                    return
+                # Local versioned cache: the registry is only hit the first time a version is seen
+                self.model_artifacts = self.model_cache.get(
+                    self.model_name, best_version.version, run_id=best_version.run_id, source=best_version.source
+                )
                 self.model_version = best_version.version
-                self.model = mlflow.sklearn.load_model(best_version.source)
+                self.model = self.model_artifacts['model']
                 run = client.get_run(best_version.run_id)
                 self.model_metrics = run.data.metrics
                 logger.info(f"Loaded model version {self.model_version} for {self.model_name}")
             else:
                 self.model = None
+                self.model_artifacts = {}
                 self.model_version = None
                 self.model_metrics = {}
         except Exception as e:
@@ -201,10 +205,11 @@ class APIService(APIPort):
                 model_features=params.get("model_features"),
                 contamination=params.get("contamination", 0.22),
                 n_estimators=params.get("n_estimators", 50),
-                max_samples=params.get("max_samples", 0.25)
+                max_samples=params.get("max_samples", 0.25),
+                ml_adapter=self.ml_adapter
             )
-            # After a successful run, reload best/latest model
-            self.load_best_model()
+            # Reload best/latest model once the background MLflow logging of this run has finished
+            self.ml_adapter.submit(self.load_best_model)
             preds = df_processed['is_anomaly'].tolist()
             scores = df_processed['anomaly_score'].tolist() if 'anomaly_score' in df_processed else [0.0]*len(preds)
             return BatchPredictResponse(
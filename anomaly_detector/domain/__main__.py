@@ -25,7 +25,8 @@ def main():
     print(f"Detecting and loading Uber NYC trip data from {data_dir} ...")
     df = extract_and_concat_uber_csvs(data_dir)
     print(f"Loaded {len(df)} rows. Running pipeline...")
-    results = run_pipeline(df)
+    # Reruns on the same data only execute the stages whose inputs changed
+    results = run_pipeline(df, use_cache=True)
     print("Pipeline complete.")
     # Optionally print summary
     if results and len(results) > 0:
@@ -5,19 +5,22 @@ Anomaly detection logic (Isolation Forest, evaluation, etc.)
 """
 import pandas as pd
 import numpy as np
-import pickle
-import yaml
+import os
+import shutil
+import tempfile
 from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
 from mlflow.models import infer_signature
 from .feature_engineering import SpatialPreprocessor
-from anomaly_detector.kernel import ensure_dir
-import pyarrow as pa
-import pyarrow.parquet as pq
+from .scoring import ScoringEngine
+from .compiled_forest import CompiledForest
+from .model_bundle import ModelBundle
+from .summary import SummaryEngine, ZONE_DAILY_COLUMNS, weekly_from_daily, zone_totals
+from .indicators import update_indicators_file, update_table_file, write_indicators
+from .parquet_writer import PartitionedParquetWriter, partition_codes
+from anomaly_detector.kernel import ensure_dir, load_config
 from pathlib import Path
-from shapely.geometry import Point
-import geopandas as gpd
-import requests
+from collections import deque
 
 
 class Evaluator:
@@ -53,6 +56,17 @@ class Evaluator:
         self.mv_em_curves = df
         return df
 
+    def evaluate(self, scorer, X, decision_scores: np.ndarray, n_random=5000, n_thresholds=100, random_state=42):
+        """
+        Computes MV/EM curves for a fitted scorer (anything exposing decision_function).
+        Returns (curves, mv_area, em_area).
+        """
+        real_scores = -decision_scores
+        random_X = self.sample_random_uniform(X, n_samples=n_random, random_state=random_state)
+        random_scores = -scorer.decision_function(random_X)
+        curves = self.approximate_mv_em_curves(real_scores, random_scores, n_thresholds=n_thresholds)
+        return curves, curves["mass"].sum(), curves["em"].sum()
+
     def sample_random_uniform(self, X: np.ndarray, n_samples=10000, random_state=42) -> np.ndarray:
         rng = np.random.RandomState(random_state)
         mins = X.min(axis=0)
@@ -65,7 +79,8 @@ class AnomalyDetector:
     """Detect anomalies using IsolationForest with spatial features."""
 
     def __init__(self, feature_cols: list, contamination: float = 0.1, n_estimators: int = 100, max_samples: float = 0.7,
-                 use_density: bool = True, density_neighbors: int = 5, random_state: int = 42, config_path: str = None):
+                 use_density: bool = True, density_neighbors: int = 5, random_state: int = 42, config_path: str = None,
+                 trees_per_window: int = 10, max_windows: int = 24, n_jobs: int = -1, compiled_max_rows: int = 128):
         self.feature_cols = feature_cols
         self.contamination = contamination
         self.n_estimators = n_estimators
@@ -73,6 +88,10 @@ class AnomalyDetector:
         self.use_density = use_density
         self.density_neighbors = density_neighbors
         self.random_state = random_state
+        self.n_jobs = n_jobs
+        # Batches up to this many rows use the compiled forest (lower per-call overhead);
+        # larger ones the chunked, threaded sklearn traversal, which has far more throughput
+        self.compiled_max_rows = compiled_max_rows
         self.spatial_preprocessor = SpatialPreprocessor(lat_col='centroid_lat', lon_col='centroid_lon')
         self.model = None
         self.evaluator = Evaluator()
@@ -83,147 +102,232 @@ class AnomalyDetector:
         self.input_example = None
         self.signature = None
         self.df_proc_ = None
+        self.compiled_forest = None
+        self.features_ = None
+        self.input_cols_ = None
+        # Per-run folder for the model bundle and evaluation files (never the working directory)
+        self.artifact_dir = None
+        self.bundle_path = None
+        # Streaming retrain state: (window_key, CompiledForest) per live time window, oldest first
+        self.trees_per_window = trees_per_window
+        self.max_windows = max_windows
+        self.window_forests = deque()
+        self.windows_seen_ = 0
 
         # Load artifact file names from YAML config
-        if config_path is None:
-            config_path = str(Path(__file__).parent.parent / "configs" / "artifacts.yaml")
-        try:
-            with open(config_path, "r") as f:
-                artifact_config = yaml.safe_load(f)
-        except Exception:
-            artifact_config = {}
-        self.preproc_path = artifact_config.get("preproc_path", "spatial_preprocessor.pkl")
-        self.scaler_path = artifact_config.get("scaler_path", "scaler.pkl")
-        self.curves_csv = artifact_config.get("curves_csv", "mv_em_curves.csv")
-        self.sample_csv = artifact_config.get("sample_csv", "processed_data_sample.csv")
+        artifact_config = load_config("artifacts.yaml", config_path)
+        self.curves_name = artifact_config.get("curves_csv", "mv_em_curves.csv")
+        self.sample_name = artifact_config.get("sample_csv", "processed_data_sample.csv")
         self.indicators_parquet = artifact_config.get("indicators_parquet", "indicators.parquet")
+        self.bundle_name = artifact_config.get("model_bundle_dir", "model_bundle")
+        self.run_artifacts_root = artifact_config.get("run_artifacts_dir") or None
+
+    def _new_artifact_dir(self) -> str:
+        if self.run_artifacts_root:
+            ensure_dir(Path(self.run_artifacts_root))
+        self.artifact_dir = tempfile.mkdtemp(prefix="anomaly_run_", dir=self.run_artifacts_root)
+        return self.artifact_dir
+
+    @property
+    def curves_csv(self) -> str:
+        return os.path.join(self.artifact_dir, self.curves_name)
+
+    @property
+    def sample_csv(self) -> str:
+        return os.path.join(self.artifact_dir, self.sample_name)
 
-    def fit(self, df: pd.DataFrame):
+    def cleanup_artifacts(self):
+        """Removes the per-run artifact folder (e.g. once MLflow logging has finished)."""
+        if self.artifact_dir:
+            shutil.rmtree(self.artifact_dir, ignore_errors=True)
+
+    def prepare_features(self, df: pd.DataFrame, fit: bool = True):
+        """
+        Steps 1-3 of fit: spatial preprocessing, feature selection and scaling.
+        With fit=False the already fitted preprocessor and scaler are reused.
+        Returns (df_proc, X_scaled).
+        """
         # 1. Spatial preprocessing
-        df_proc = self.spatial_preprocessor.fit_transform(df)
+        df_proc = self.spatial_preprocessor.fit_transform(df) if fit else self.spatial_preprocessor.transform(df)
         if self.use_density:
             df_proc['local_density'] = self.spatial_preprocessor.compute_local_density(df_proc, n_neighbors=self.density_neighbors)
         else:
             df_proc['local_density'] = np.nan
         # 2. Feature selection
-        features = [col for col in self.feature_cols if col in df_proc.columns]
-        features += ['x_scaled', 'y_scaled']
-        if self.use_density:
-            features.append('local_density')
-        X = df_proc[features].fillna(0)
+        if fit or self.features_ is None:
+            features = [col for col in self.feature_cols if col in df_proc.columns]
+            features += ['x_scaled', 'y_scaled']
+            if self.use_density:
+                features.append('local_density')
+            self.features_ = features
+        X = df_proc[self.features_].fillna(0)
         # 3. Scaling
-        X_scaled_array = self.scaler.fit_transform(X)
+        X_scaled_array = self.scaler.fit_transform(X) if fit else self.scaler.transform(X)
         X_scaled = pd.DataFrame(X_scaled_array, columns=X.columns, index=X.index)
+        return df_proc, X_scaled
+
+    def fit(self, df: pd.DataFrame, save_artifacts: bool = True):
+        # 1-3. Spatial preprocessing, feature selection and scaling
+        df_proc, X_scaled = self.prepare_features(df)
         # 4. Model training
         self.model = IsolationForest(
             random_state=self.random_state,
             contamination=self.contamination,
             n_estimators=self.n_estimators,
             max_samples=self.max_samples,
-            n_jobs=-1
+            n_jobs=self.n_jobs
         )
         self.model.fit(X_scaled)
-        df_proc['is_anomaly'] = pd.Series(self.model.predict(X_scaled)).apply(lambda x: 1 if x == -1 else 0).values
-        df_proc['anomaly_score'] = self.model.decision_function(X_scaled)
+        # Single forest pass: labels are derived from the decision scores and the fitted offset
+        engine = ScoringEngine(self.model)
+        is_anomaly, anomaly_score = engine.score(X_scaled)
+        df_proc['is_anomaly'] = is_anomaly
+        df_proc['anomaly_score'] = anomaly_score
         # 5. Evaluation
-        real_scores = -df_proc['anomaly_score'].values
-        random_X = self.evaluator.sample_random_uniform(X_scaled, n_samples=5000, random_state=self.random_state)
-        random_scores = -self.model.decision_function(random_X)
-        self.mv_em_df = self.evaluator.approximate_mv_em_curves(real_scores, random_scores, n_thresholds=100)
-        self.mv_area = self.mv_em_df["mass"].sum()
-        self.em_area = self.mv_em_df["em"].sum()
-        # 6. Save artifacts to disk
-        self.input_example = X_scaled.head(5)
-        self.signature = infer_signature(X_scaled, self.model.predict(X_scaled))
-        with open(self.preproc_path, 'wb') as f:
-            pickle.dump(self.spatial_preprocessor, f)
-        with open(self.scaler_path, 'wb') as f:
-            pickle.dump(self.scaler, f)
-        self.mv_em_df.to_csv(self.curves_csv, index=False)
-        df_proc.head(100).to_csv(self.sample_csv, index=False)
+        self.mv_em_df, self.mv_area, self.em_area = self.evaluator.evaluate(
+            engine, X_scaled, anomaly_score, random_state=self.random_state
+        )
+        # 6. Save artifacts to a per-run folder
+        self.input_cols_ = list(dict.fromkeys(
+            [c for c in self.feature_cols if c in df.columns] +
+            [self.spatial_preprocessor.lat_col, self.spatial_preprocessor.lon_col]
+        ))
+        self.input_example = df[self.input_cols_].head(5)
+        self.signature = infer_signature(self.input_example, df_proc[['is_anomaly', 'anomaly_score']].head(5))
+        self.compiled_forest = CompiledForest.from_isolation_forest(self.model, feature_names=list(X_scaled.columns))
+        if save_artifacts:
+            self._new_artifact_dir()
+            self.save_bundle()
+            self.mv_em_df.to_csv(self.curves_csv, index=False)
+            df_proc.head(100).to_csv(self.sample_csv, index=False)
         self.df_proc_ = df_proc
         return df_proc, X_scaled
 
-    @staticmethod
-    def summarize(df: pd.DataFrame) -> pd.DataFrame:
+    def score(self, df: pd.DataFrame) -> pd.DataFrame:
         """
-        Summarizes anomaly results by date, rush hour, hot location, and demand increase.
-        Downloads NYC Taxi Zones GeoJSON if missing.
-        Returns a DataFrame with columns matching h3_uber.py logic.
+        Scores new rows with the fitted preprocessing and forest: the compiled form for small
+        batches (or when it is the only one, e.g. loaded from a bundle), else the sklearn model.
         """
-        # Ensure taxi_zones.geojson exists and is valid (not empty, not corrupt)
-        geojson_url = "https://data.cityofnewyork.us/resource/8meu-9t5y.geojson"
-        geojson_path = Path("resources") / "taxi_zones.geojson"
-        if not geojson_path.parent.exists():
-            geojson_path.parent.mkdir(parents=True, exist_ok=True)
-        need_download = False
-        # Check if file exists and is non-empty
-        if not geojson_path.exists() or geojson_path.stat().st_size < 1000:
-            need_download = True
-        else:
-            # Try to read file, if error or empty, re-download
-            try:
-                gdf = gpd.read_file(geojson_path)
-                if gdf.empty or 'geometry' not in gdf.columns:
-                    need_download = True
-            except Exception:
-                need_download = True
-        if need_download:
-            print(f"Downloading {geojson_url} to {geojson_path} ...")
-            resp = requests.get(geojson_url)
-            resp.raise_for_status()
-            with open(geojson_path, "wb") as f:
-                f.write(resp.content)
-            print("Download complete.")
-        # Load zones GeoDataFrame
-        zones_gdf = gpd.read_file(geojson_path)[['zone', 'geometry']]
+        if self.model is None and self.compiled_forest is None:
+            raise ValueError("AnomalyDetector not fitted. Call fit first.")
+        df_proc, X_scaled = self.prepare_features(df, fit=False)
+        small = self.compiled_forest is not None and len(X_scaled) <= self.compiled_max_rows
+        model = self.compiled_forest if self.model is None or small else self.model
+        is_anomaly, anomaly_score = ScoringEngine(model, n_jobs=self.n_jobs).score(X_scaled)
+        df_proc['is_anomaly'] = is_anomaly
+        df_proc['anomaly_score'] = anomaly_score
+        return df_proc
 
-        df = df.copy()
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        df['date'] = df['timestamp'].dt.date
+    def artifact_paths(self) -> list:
+        """Local artifacts written by fit besides the model bundle, in the order they are logged to MLflow."""
+        return [self.curves_csv, self.sample_csv]
 
-        # 1. Aggregate daily sums and rush hour
-        daily = (
-            df
-            .groupby('date')
-            .agg(
-                sum_trips=('value', 'sum'),
-                sum_anomalies=('is_anomaly', 'sum'),
-                rush_hour=('Hour', lambda s: int(s.value_counts().idxmax()) if not s.empty else None)
-            )
-            .reset_index()
+    def to_bundle(self) -> ModelBundle:
+        preproc = self.spatial_preprocessor
+        return ModelBundle(
+            features=self.features_,
+            input_cols=self.input_cols_ or [],
+            spatial={'lat_col': preproc.lat_col, 'lon_col': preproc.lon_col, 'mean_lat': float(preproc.mean_lat),
+                     'mean_lon': float(preproc.mean_lon), 'scaler': preproc.scaler},
+            scaler=self.scaler,
+            forest=self.compiled_forest,
+            params={'feature_cols': self.feature_cols, 'use_density': self.use_density,
+                    'density_neighbors': self.density_neighbors, 'contamination': self.contamination}
         )
 
-        # 2. Determine hot location per day by max rolling mean
-        hot = (
-            df
-            .loc[df.groupby('date')['value'].idxmax()]
-            .loc[:, ['date', 'centroid_lon', 'centroid_lat']]
-            .rename(columns={'centroid_lon': 'lon', 'centroid_lat': 'lat'})
-        )
-        hot['geometry'] = [Point(xy) for xy in zip(hot.lon, hot.lat)]
-        hot_gdf = gpd.GeoDataFrame(hot, geometry='geometry', crs=zones_gdf.crs)
-        joined = gpd.sjoin(hot_gdf, zones_gdf, how='left', predicate='within')
-        hot['hot_location'] = joined['zone']
-        hot = hot[['date', 'hot_location']]
+    def save_bundle(self, path: str = None) -> str:
+        """Writes the model bundle (default: <artifact_dir>/model_bundle) and returns its path."""
+        if path is None:
+            path = os.path.join(self.artifact_dir or self._new_artifact_dir(), self.bundle_name)
+        self.bundle_path = self.to_bundle().save(path)
+        return self.bundle_path
 
-        # 3. Merge daily with hot location
-        daily = daily.merge(hot, on='date', how='left')
+    @classmethod
+    def from_bundle(cls, path: str, mmap_mode: str = 'r') -> "AnomalyDetector":
+        """Scoring-only detector backed by a (memory-mapped) model bundle."""
+        bundle = ModelBundle.load(path, mmap_mode=mmap_mode)
+        detector = cls(feature_cols=bundle.params.get('feature_cols', bundle.features),
+                       contamination=bundle.params.get('contamination', 0.1),
+                       use_density=bundle.params.get('use_density', True),
+                       density_neighbors=bundle.params.get('density_neighbors', 5))
+        detector.spatial_preprocessor = bundle.spatial_preprocessor()
+        detector.scaler = bundle.scaler
+        detector.features_ = bundle.features
+        detector.input_cols_ = bundle.input_cols
+        detector.compiled_forest = bundle.forest
+        detector.bundle_path = str(path)
+        return detector
 
-        # 4. Compute week-over-week increase: current 7-day sum vs previous 7-day
-        daily = daily.sort_values('date')
-        daily['trips_7d'] = daily['sum_trips'].rolling(window=7, min_periods=1).sum()
-        daily['trips_7d_prev'] = daily['trips_7d'].shift(1)
-        daily['increased_demand'] = daily['trips_7d'] - daily['trips_7d_prev']
-        daily['increased_demand_pct'] = np.where(
-            daily['trips_7d_prev'] == 0,
-            0,
-            (daily['increased_demand'] / daily['trips_7d_prev'] * 100).round(2)
+    def partial_fit(self, df: pd.DataFrame, window_key=None):
+        """
+        Streaming retrain for one new time window (e.g. the latest hours).
+        Only trees_per_window new trees are fitted, on this window's rows; once more than
+        max_windows windows are live the oldest window's trees are retired. The spatial
+        preprocessor and scaler are fitted on the first window and then frozen so that
+        trees from different windows see the same feature space. A forest from an earlier
+        fit() (or bundle) is kept as the first live window instead of being discarded.
+        The live ensemble becomes the scoring model; call save_bundle() to persist it.
+        Returns df_proc for the window with is_anomaly and anomaly_score.
+        """
+        first_window = not hasattr(self.scaler, 'mean_')
+        if not self.window_forests and self.compiled_forest is not None and not first_window:
+            self.window_forests.append(('fit', self.compiled_forest))
+        df_proc, X_scaled = self.prepare_features(df, fit=first_window)
+        window_model = IsolationForest(
+            random_state=self.random_state + self.windows_seen_,
+            contamination=self.contamination,
+            n_estimators=self.trees_per_window,
+            max_samples=self.max_samples,
+            n_jobs=self.n_jobs
+        )
+        window_model.fit(X_scaled)
+        self.windows_seen_ += 1
+        self.window_forests.append(
+            (window_key, CompiledForest.from_isolation_forest(window_model, feature_names=list(X_scaled.columns)))
         )
+        while len(self.window_forests) > self.max_windows:
+            self.window_forests.popleft()
+        # Offset follows the contamination quantile of the newest window under the live ensemble
+        ensemble = CompiledForest.concat([forest for _, forest in self.window_forests])
+        raw_scores = ScoringEngine(ensemble).score_samples(X_scaled)
+        ensemble.offset_ = float(np.percentile(raw_scores, 100.0 * self.contamination))
+        anomaly_score = raw_scores - np.float32(ensemble.offset_)
+        df_proc['is_anomaly'] = (anomaly_score < 0).astype(np.int64)
+        df_proc['anomaly_score'] = anomaly_score
+        self.model = ensemble
+        self.compiled_forest = ensemble
+        return df_proc
+
+    def fit_windows(self, df: pd.DataFrame, freq: str = 'D', time_col: str = 'timestamp',
+                    save_artifacts: bool = True) -> pd.DataFrame:
+        """
+        Replays a history window by window (pandas frequency string) through partial_fit,
+        then writes the model bundle of the final ensemble once.
+        """
+        windows = pd.to_datetime(df[time_col]).dt.floor(freq)
+        results = [self.partial_fit(df_window, window_key=key) for key, df_window in df.groupby(windows, sort=True)]
+        if results and save_artifacts:
+            self.save_bundle()
+        return pd.concat(results) if results else df.iloc[0:0]
+
+    @property
+    def live_windows(self) -> list:
+        return [key for key, _ in self.window_forests]
+
+    @staticmethod
+    def summarize(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Summarizes anomaly results by date, rush hour, hot location, and demand increase.
+        Hot locations come from the precomputed H3 cell -> taxi zone lookup (built once from
+        resources/taxi_zones.geojson, downloaded if missing).
+        Returns a DataFrame with columns matching h3_uber.py logic.
+        """
+        return SummaryEngine().build(df)['daily']
 
-        # 5. Final selection
-        df_final = daily[['date', 'sum_trips', 'sum_anomalies', 'rush_hour', 'hot_location', 'increased_demand_pct']]
-        return df_final
+    @staticmethod
+    def summarize_all(df: pd.DataFrame) -> dict:
+        """Daily, weekly and per-zone summaries from a single aggregation pass ({'daily', 'weekly', 'zone'})."""
+        return SummaryEngine().build(df)
 
     def save_partitioned_parquet(self,
                                  df: pd.DataFrame,
@@ -231,37 +335,54 @@ class AnomalyDetector:
                                  base_dir: str,
                                  anomaly_col: str = 'is_anomaly',
                                  time_col: str = 'timestamp',
-                                 summary_path: str = None):
+                                 summary_path: str = None,
+                                 extra_summaries: dict = None):
         """
-        Saves DataFrame to partitioned parquet files based on anomaly status and date.
-        Also saves summary indicators.parquet (configurable) in a separate directory or path.
+        Saves DataFrame to partitioned parquet files based on anomaly status and date
+        (sorted, tuned files; see parquet_writer and the gold layer writer config).
+        Only partitions present in df are rewritten; returns the keys of changed partitions.
+        Also merges the summary into indicators.parquet (configurable) in a separate directory or path,
+        plus indicators_<name>.parquet for every frame in extra_summaries.
         """
-        df = df.copy()
-        df[time_col] = pd.to_datetime(df[time_col])
-        df['date_code'] = df[time_col].dt.strftime('%Y-%m-%d')
-        df['type_code'] = df[anomaly_col].apply(lambda x: 'anomalous' if x == 1 else 'non_anomalous')
-        ensure_dir(Path(base_dir))
-        pq.write_to_dataset(
-            pa.Table.from_pandas(df),
-            root_path=str(base_dir),
-            partition_cols=['type_code', 'date_code'],
-            basename_template='part-{i}.parquet'
-        )
+        changed_partitions = self.save_partitions(df, base_dir, anomaly_col=anomaly_col, time_col=time_col)
         # Save summary to the correct summary_path if provided, else fallback to old behavior
-        if summary_path:
-            summary_dir = Path(summary_path)
-            ensure_dir(summary_dir)
-            pq.write_table(
-                pa.Table.from_pandas(df_summary),
-                str(summary_dir / self.indicators_parquet)
-            )
-            print(f"Summary saved to {summary_dir / self.indicators_parquet}")
-        else:
-            fallback_dir = Path(f"{base_dir}_summarize")
-            ensure_dir(fallback_dir)
-            pq.write_table(
-                pa.Table.from_pandas(df_summary),
-                str(fallback_dir / self.indicators_parquet)
-            )
-            print(f"Summary saved to {fallback_dir / self.indicators_parquet}")
-        print(f"Data saved to partitioned parquet in {base_dir}")
+        self.save_summaries(df_summary, summary_path or f"{base_dir}_summarize", extra_summaries=extra_summaries)
+        return changed_partitions
+
+    def save_partitions(self, df: pd.DataFrame, base_dir: str, anomaly_col: str = 'is_anomaly',
+                        time_col: str = 'timestamp') -> list:
+        """Upserts the (type_code, date_code) partitions of df; returns the keys of changed partitions."""
+        writer = PartitionedParquetWriter.from_layer_config('gold')
+        ensure_dir(Path(base_dir))
+        changed_partitions = writer.write(df, base_dir, codes=partition_codes(df, anomaly_col=anomaly_col, time_col=time_col))
+        print(f"Data saved to partitioned parquet in {base_dir} ({len(changed_partitions)} partitions changed)")
+        return changed_partitions
+
+    def save_summaries(self, df_summary: pd.DataFrame, summary_dir: str, extra_summaries: dict = None) -> list:
+        """
+        Merges df_summary into indicators.parquet and refreshes the rollups next to it; returns the changed dates.
+        The weekly table is rebuilt from the full daily table and the zone table from
+        indicators_zone_daily.parquet, which is upserted by date, so incremental runs keep
+        earlier periods. Any other extra summary is written as indicators_<name>.parquet.
+        Every file is replaced atomically.
+        """
+        summary_dir = Path(summary_dir)
+        stem = Path(self.indicators_parquet).stem
+        # Indicators are upserted: only changed dates and their 7-day windows are recomputed
+        indicators, changed_dates = update_indicators_file(summary_dir / self.indicators_parquet, df_summary)
+        print(f"Summary saved to {summary_dir / self.indicators_parquet} ({len(changed_dates)} dates updated)")
+        extra = dict(extra_summaries or {})
+        tables = {}
+        if 'weekly' in extra:
+            extra.pop('weekly')
+            tables['weekly'] = weekly_from_daily(indicators)
+        if 'zone_daily' in extra:
+            extra.pop('zone', None)
+            zone_daily = update_table_file(summary_dir / f"{stem}_zone_daily.parquet", extra.pop('zone_daily'),
+                                           ZONE_DAILY_COLUMNS)
+            tables['zone'] = zone_totals(zone_daily)
+        tables.update(extra)
+        for name, df_extra in tables.items():
+            extra_path = write_indicators(df_extra, summary_dir / f"{stem}_{name}.parquet")
+            print(f"Summary ({name}) saved to {extra_path}")
+        return [str(d) for d in changed_dates]
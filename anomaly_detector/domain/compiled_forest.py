@@ -0,0 +1,200 @@
+"""
+Flattened Isolation Forest for low-latency inference.
+
+A fitted ``IsolationForest`` is exported into contiguous NumPy arrays (one entry
+per node across all trees) and scored with a vectorized traversal, bypassing
+scikit-learn's per-estimator overhead. The compiled form is stored as a folder
+of ``.npy`` files plus a JSON header so it can be loaded memory-mapped.
+"""
+import json
+import numpy as np
+from pathlib import Path
+from anomaly_detector.kernel import ensure_dir
+
+FORMAT_VERSION = 1
+ARRAY_NAMES = ('feature', 'threshold', 'children_left', 'children_right', 'path_length', 'roots', 'tree_norm')
+
+
+def average_path_length(n_samples) -> np.ndarray:
+    """Average path length of an unsuccessful BST search over n samples (c(n) in the paper)."""
+    n = np.asarray(n_samples, dtype=np.float64)
+    out = np.zeros_like(n)
+    out[n == 2] = 1.0
+    big = n > 2
+    out[big] = 2.0 * (np.log(n[big] - 1.0) + np.euler_gamma) - 2.0 * (n[big] - 1.0) / n[big]
+    return out
+
+
+class CompiledForest:
+    """
+    Isolation Forest compiled into flat node arrays.
+
+    Leaves point to themselves so every row can be advanced ``max_depth`` times
+    without branching. ``path_length`` holds, for each leaf, its depth plus the
+    c(n) correction for the samples it holds; ``tree_norm`` holds c(max_samples)
+    of the tree it belongs to.
+    """
+    def __init__(self, feature, threshold, children_left, children_right, path_length, roots, tree_norm,
+                 offset: float, n_features: int, max_depth: int, feature_names=None, chunk_size: int = 65536):
+        self.feature = feature
+        self.threshold = threshold
+        self.children_left = children_left
+        self.children_right = children_right
+        self.path_length = path_length
+        self.roots = roots
+        self.tree_norm = tree_norm
+        self.offset_ = float(offset)
+        self.n_features = int(n_features)
+        self.max_depth = int(max_depth)
+        self.feature_names = list(feature_names) if feature_names is not None else None
+        self.chunk_size = chunk_size
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @classmethod
+    def from_isolation_forest(cls, model, feature_names=None) -> "CompiledForest":
+        """Export a fitted scikit-learn IsolationForest."""
+        if feature_names is None and hasattr(model, 'feature_names_in_'):
+            feature_names = list(model.feature_names_in_)
+        tree_norm_value = float(average_path_length([model.max_samples_])[0])
+        features, thresholds, lefts, rights, path_lengths, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator, est_features in zip(model.estimators_, model.estimators_features_):
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            left = tree.children_left.astype(np.int64)
+            right = tree.children_right.astype(np.int64)
+            is_leaf = left == -1
+            # Node depths, one level at a time from the root
+            depth = np.zeros(n_nodes, dtype=np.int64)
+            level, level_depth = np.array([0], dtype=np.int64), 0
+            while level.size:
+                depth[level] = level_depth
+                internal = level[~is_leaf[level]]
+                level = np.concatenate([left[internal], right[internal]])
+                level_depth += 1
+            max_depth = max(max_depth, level_depth - 1)
+            node_ids = np.arange(n_nodes, dtype=np.int64)
+            left = np.where(is_leaf, node_ids, left) + offset
+            right = np.where(is_leaf, node_ids, right) + offset
+            feature = np.where(is_leaf, 0, np.asarray(est_features)[np.maximum(tree.feature, 0)])
+            threshold = np.where(is_leaf, np.inf, tree.threshold)
+            path_length = np.where(is_leaf, depth + average_path_length(tree.n_node_samples), 0.0)
+            features.append(feature)
+            thresholds.append(threshold)
+            lefts.append(left)
+            rights.append(right)
+            path_lengths.append(path_length)
+            roots.append(offset)
+            offset += n_nodes
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(features), dtype=np.int32),
+            threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+            children_left=np.ascontiguousarray(np.concatenate(lefts), dtype=np.int32),
+            children_right=np.ascontiguousarray(np.concatenate(rights), dtype=np.int32),
+            path_length=np.ascontiguousarray(np.concatenate(path_lengths), dtype=np.float64),
+            roots=np.asarray(roots, dtype=np.int32),
+            tree_norm=np.full(len(roots), tree_norm_value, dtype=np.float64),
+            offset=model.offset_,
+            n_features=model.n_features_in_,
+            max_depth=max_depth,
+            feature_names=feature_names
+        )
+
+    @classmethod
+    def concat(cls, forests: list, offset: float = None) -> "CompiledForest":
+        """
+        Merge compiled forests into one ensemble (scores average over all trees).
+        Each tree keeps its own normalisation, so forests trained on windows of
+        different sizes can be combined. The offset defaults to the last forest's.
+        """
+        if not forests:
+            raise ValueError("Nothing to concatenate.")
+        node_offsets = np.cumsum([0] + [len(f.feature) for f in forests[:-1]])
+        return cls(
+            feature=np.concatenate([f.feature for f in forests]),
+            threshold=np.concatenate([f.threshold for f in forests]),
+            children_left=np.concatenate([f.children_left + o for f, o in zip(forests, node_offsets)]).astype(np.int32),
+            children_right=np.concatenate([f.children_right + o for f, o in zip(forests, node_offsets)]).astype(np.int32),
+            path_length=np.concatenate([f.path_length for f in forests]),
+            roots=np.concatenate([f.roots + o for f, o in zip(forests, node_offsets)]).astype(np.int32),
+            tree_norm=np.concatenate([f.tree_norm for f in forests]),
+            offset=forests[-1].offset_ if offset is None else offset,
+            n_features=forests[-1].n_features,
+            max_depth=max(f.max_depth for f in forests),
+            feature_names=forests[-1].feature_names
+        )
+
+    def _as_matrix(self, X) -> np.ndarray:
+        if hasattr(X, 'columns') and self.feature_names is not None:
+            X = X[self.feature_names]
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got {X.shape[1]}")
+        return X
+
+    def _leaves(self, X: np.ndarray) -> np.ndarray:
+        rows = np.arange(X.shape[0])[:, None]
+        nodes = np.broadcast_to(self.roots, (X.shape[0], self.n_trees)).copy()
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.children_left[nodes], self.children_right[nodes])
+        return nodes
+
+    def score_samples(self, X) -> np.ndarray:
+        """Same semantics as ``IsolationForest.score_samples`` (lower is more abnormal)."""
+        X = self._as_matrix(X)
+        out = np.empty(X.shape[0], dtype=np.float64)
+        for start in range(0, X.shape[0], self.chunk_size):
+            end = min(start + self.chunk_size, X.shape[0])
+            leaves = self._leaves(X[start:end])
+            depths = (self.path_length[leaves] / self.tree_norm).mean(axis=1)
+            out[start:end] = -np.power(2.0, -depths)
+        return out
+
+    def decision_function(self, X) -> np.ndarray:
+        return self.score_samples(X) - self.offset_
+
+    def predict(self, X) -> np.ndarray:
+        """Return -1 for anomalies and 1 for inliers, like ``IsolationForest.predict``."""
+        return np.where(self.decision_function(X) < 0, -1, 1)
+
+    def save(self, path: str) -> str:
+        """Write the arrays as ``.npy`` files plus a ``forest.json`` header into the folder ``path``."""
+        out_dir = Path(path)
+        ensure_dir(out_dir)
+        for name in ARRAY_NAMES:
+            np.save(out_dir / f"{name}.npy", np.ascontiguousarray(getattr(self, name)))
+        header = {
+            'format_version': FORMAT_VERSION,
+            'offset': self.offset_,
+            'n_features': self.n_features,
+            'max_depth': self.max_depth,
+            'n_trees': self.n_trees,
+            'feature_names': self.feature_names
+        }
+        with open(out_dir / "forest.json", "w") as f:
+            json.dump(header, f, indent=2)
+        return str(out_dir)
+
+    @classmethod
+    def load(cls, path: str, mmap_mode: str = 'r') -> "CompiledForest":
+        """Load a compiled forest; arrays are memory-mapped unless ``mmap_mode`` is None."""
+        in_dir = Path(path)
+        with open(in_dir / "forest.json", "r") as f:
+            header = json.load(f)
+        if header.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported compiled forest format: {header.get('format_version')}")
+        arrays = {name: np.load(in_dir / f"{name}.npy", mmap_mode=mmap_mode) for name in ARRAY_NAMES}
+        return cls(
+            **arrays,
+            offset=header['offset'],
+            n_features=header['n_features'],
+            max_depth=header['max_depth'],
+            feature_names=header.get('feature_names')
+        )
@@ -148,6 +148,10 @@ class SpatialPreprocessor:
 
     def compute_local_density(self, df: pd.DataFrame, n_neighbors: int = 5) -> pd.Series:
         coords = df[['x_scaled', 'y_scaled']].values
+        if len(coords) < 2:
+            return pd.Series(0.0, index=df.index)
+        # Small scoring batches may hold fewer rows than the configured neighbourhood
+        n_neighbors = min(n_neighbors, len(coords) - 1)
         neigh = NearestNeighbors(n_neighbors=n_neighbors + 1)
         neigh.fit(coords)
         distances, _ = neigh.kneighbors(coords)
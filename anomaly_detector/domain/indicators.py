@@ -0,0 +1,111 @@
+"""
+Incremental maintenance of the daily indicators table (indicators.parquet).
+
+The week-over-week trend of a row depends only on the 7-row trip sums ending at
+that row and at the previous row, so a change at position p affects positions
+p..p+7 and needs positions p-7..p-1 as context. The rolling state is therefore
+rebuilt from the persisted ``sum_trips`` column around the changed dates instead
+of recomputing the whole history, and the file is replaced atomically.
+"""
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pathlib import Path
+from .summary import add_demand_trend, DAILY_COLUMNS
+from anomaly_detector.kernel import ensure_dir
+
+BASE_COLUMNS = ['date', 'sum_trips', 'sum_anomalies', 'rush_hour', 'hot_location']
+TREND_WINDOW = 7
+
+
+def load_table(path, columns: list) -> pd.DataFrame:
+    path = Path(path)
+    if not path.exists():
+        return pd.DataFrame(columns=columns)
+    return pd.read_parquet(path)[columns]
+
+
+def load_indicators(path) -> pd.DataFrame:
+    return load_table(path, DAILY_COLUMNS)
+
+
+def write_indicators(df: pd.DataFrame, path) -> Path:
+    """Writes to a temporary file next to `path` and renames it over the old file."""
+    path = Path(path)
+    ensure_dir(path.parent)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), str(tmp_path))
+    os.replace(tmp_path, path)
+    return path
+
+
+def _changed_dates(existing: pd.DataFrame, new_daily: pd.DataFrame) -> pd.Index:
+    """Dates of new_daily that are missing from existing or differ in any base column."""
+    merged = new_daily[BASE_COLUMNS].merge(existing[BASE_COLUMNS], on='date', how='left', suffixes=('', '_old'),
+                                           indicator=True)
+    changed = merged['_merge'] == 'left_only'
+    for col in BASE_COLUMNS[1:]:
+        new, old = merged[col], merged[f"{col}_old"]
+        changed |= ~((new == old) | (new.isna() & old.isna()))
+    return pd.Index(merged.loc[changed, 'date'])
+
+
+def upsert_indicators(existing: pd.DataFrame, new_daily: pd.DataFrame) -> tuple:
+    """
+    Merges new daily rows into the indicators table, recomputing the demand trend
+    only for the positions whose 7-row windows touch a changed date.
+    Returns (indicators, changed_dates).
+    """
+    if existing.empty:
+        full = add_demand_trend(new_daily[BASE_COLUMNS].copy()).reset_index(drop=True)
+        return full[DAILY_COLUMNS], pd.Index(full['date'])
+    existing = existing.sort_values('date').reset_index(drop=True)
+    changed = _changed_dates(existing, new_daily)
+    if changed.empty:
+        return existing[DAILY_COLUMNS], changed
+    updated = new_daily[new_daily['date'].isin(changed)][BASE_COLUMNS]
+    df = pd.concat([existing[~existing['date'].isin(changed)], updated], ignore_index=True)
+    df = df.sort_values('date').reset_index(drop=True)
+    positions = np.flatnonzero(df['date'].isin(changed).to_numpy())
+    start = max(0, positions.min() - TREND_WINDOW)
+    end = min(len(df), positions.max() + TREND_WINDOW + 1)
+    window = add_demand_trend(df.iloc[start:end][BASE_COLUMNS].copy())
+    first_affected = positions.min()
+    df.loc[first_affected:end - 1, 'increased_demand_pct'] = window.loc[first_affected:, 'increased_demand_pct']
+    return df[DAILY_COLUMNS], changed
+
+
+def upsert_rows(existing: pd.DataFrame, new_rows: pd.DataFrame, key: str = 'date') -> pd.DataFrame:
+    """
+    Replaces every row of existing whose key appears in new_rows (a key is rewritten
+    whole, like a date partition) and keeps the others; sorted by key.
+    """
+    if existing.empty:
+        return new_rows.sort_values(key, kind='stable').reset_index(drop=True)
+    kept = existing[~existing[key].isin(new_rows[key])]
+    return pd.concat([kept, new_rows], ignore_index=True).sort_values(key, kind='stable').reset_index(drop=True)
+
+
+def update_table_file(path, new_rows: pd.DataFrame, columns: list, key: str = 'date') -> pd.DataFrame:
+    """Loads the table at path (if any), upserts new_rows by key and atomically rewrites it."""
+    table = upsert_rows(load_table(path, columns), new_rows[columns], key=key)
+    write_indicators(table, path)
+    return table
+
+
+def update_indicators_file(path, new_daily: pd.DataFrame) -> tuple:
+    """Loads indicators.parquet (if any), upserts new_daily and atomically rewrites it when something changed."""
+    indicators, changed = upsert_indicators(load_indicators(path), new_daily)
+    if len(changed):
+        write_indicators(indicators, path)
+    return indicators, changed
+
+
+def verify_indicators(df: pd.DataFrame) -> bool:
+    """True if the stored trend matches a full recompute from sum_trips."""
+    full = add_demand_trend(df[BASE_COLUMNS].copy()).reset_index(drop=True)
+    stored = df.sort_values('date').reset_index(drop=True)
+    return bool(np.allclose(stored['increased_demand_pct'].to_numpy(dtype=float),
+                            full['increased_demand_pct'].to_numpy(dtype=float), equal_nan=True))
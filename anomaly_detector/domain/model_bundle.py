@@ -0,0 +1,115 @@
+"""
+Versioned, memory-mappable model bundle.
+
+A bundle is one directory holding everything needed to score: the spatial
+preprocessor parameters, the feature scaler, the feature list and the compiled
+forest arrays. Small parameters live in ``manifest.json``; numeric arrays are
+plain ``.npy`` files so every server worker can memory-map one shared copy.
+"""
+import os
+import json
+import shutil
+import datetime
+import numpy as np
+from pathlib import Path
+from sklearn.preprocessing import StandardScaler
+from .compiled_forest import CompiledForest
+from .feature_engineering import SpatialPreprocessor
+from anomaly_detector.kernel import ensure_dir
+
+BUNDLE_FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+FOREST_DIR = "forest"
+
+
+def scaler_from_arrays(mean, scale, feature_names=None, n_samples_seen=None) -> StandardScaler:
+    """Rebuilds a fitted StandardScaler from its mean and scale."""
+    scaler = StandardScaler()
+    scaler.mean_ = np.asarray(mean, dtype=np.float64)
+    scaler.scale_ = np.asarray(scale, dtype=np.float64)
+    scaler.var_ = scaler.scale_ ** 2
+    scaler.n_features_in_ = len(scaler.mean_)
+    scaler.n_samples_seen_ = n_samples_seen
+    if feature_names is not None:
+        scaler.feature_names_in_ = np.asarray(feature_names, dtype=object)
+    return scaler
+
+
+class ModelBundle:
+    """
+    Everything AnomalyDetector.score needs, without pickles.
+    ``spatial`` holds the SpatialPreprocessor parameters (columns, mean lat/lon
+    and its x/y scaler); ``params`` holds detector settings such as use_density.
+    """
+    def __init__(self, features: list, input_cols: list, spatial: dict, scaler: StandardScaler,
+                 forest: CompiledForest, params: dict = None, metadata: dict = None):
+        self.features = list(features)
+        self.input_cols = list(input_cols)
+        self.spatial = spatial
+        self.scaler = scaler
+        self.forest = forest
+        self.params = params or {}
+        self.metadata = metadata or {}
+
+    def spatial_preprocessor(self) -> SpatialPreprocessor:
+        """Fitted SpatialPreprocessor rebuilt from the bundle parameters."""
+        preproc = SpatialPreprocessor(lat_col=self.spatial['lat_col'], lon_col=self.spatial['lon_col'])
+        preproc.mean_lat, preproc.mean_lon = self.spatial['mean_lat'], self.spatial['mean_lon']
+        preproc.scaler = self.spatial['scaler']
+        return preproc
+
+    def save(self, path: str) -> str:
+        """Writes the bundle into the folder `path` (built in a temp folder and renamed into place)."""
+        out_dir = Path(path)
+        ensure_dir(out_dir.parent)
+        tmp_dir = out_dir.with_name(f".{out_dir.name}.tmp-{os.getpid()}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        tmp_dir.mkdir(parents=True)
+        spatial_scaler = self.spatial['scaler']
+        arrays = {
+            'scaler_mean': self.scaler.mean_,
+            'scaler_scale': self.scaler.scale_,
+            'spatial_scaler_mean': spatial_scaler.mean_,
+            'spatial_scaler_scale': spatial_scaler.scale_
+        }
+        for name, array in arrays.items():
+            np.save(tmp_dir / f"{name}.npy", np.ascontiguousarray(array, dtype=np.float64))
+        self.forest.save(str(tmp_dir / FOREST_DIR))
+        manifest = {
+            'format_version': BUNDLE_FORMAT_VERSION,
+            'created_at': datetime.datetime.utcnow().isoformat() + 'Z',
+            'features': self.features,
+            'input_cols': self.input_cols,
+            'spatial': {k: v for k, v in self.spatial.items() if k != 'scaler'},
+            'params': self.params,
+            'arrays': sorted(arrays),
+            'forest': FOREST_DIR,
+            'metadata': self.metadata
+        }
+        with open(tmp_dir / MANIFEST_FILE, "w") as f:
+            json.dump(manifest, f, indent=2, default=float)
+        shutil.rmtree(out_dir, ignore_errors=True)
+        os.replace(tmp_dir, out_dir)
+        return str(out_dir)
+
+    @classmethod
+    def load(cls, path: str, mmap_mode: str = 'r') -> "ModelBundle":
+        """Loads a bundle; forest arrays are memory-mapped unless ``mmap_mode`` is None."""
+        in_dir = Path(path)
+        with open(in_dir / MANIFEST_FILE, "r") as f:
+            manifest = json.load(f)
+        if manifest.get('format_version') != BUNDLE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported model bundle format: {manifest.get('format_version')}")
+        arrays = {name: np.load(in_dir / f"{name}.npy") for name in manifest['arrays']}
+        spatial = dict(manifest['spatial'])
+        spatial['scaler'] = scaler_from_arrays(arrays['spatial_scaler_mean'], arrays['spatial_scaler_scale'],
+                                               feature_names=['x', 'y'])
+        return cls(
+            features=manifest['features'],
+            input_cols=manifest['input_cols'],
+            spatial=spatial,
+            scaler=scaler_from_arrays(arrays['scaler_mean'], arrays['scaler_scale'], feature_names=manifest['features']),
+            forest=CompiledForest.load(str(in_dir / manifest['forest']), mmap_mode=mmap_mode),
+            params=manifest.get('params', {}),
+            metadata=manifest.get('metadata', {})
+        )
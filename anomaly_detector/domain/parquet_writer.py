@@ -0,0 +1,237 @@
+"""
+Query-optimized writer for the partitioned parquet layers.
+
+Rows are sorted by timestamp and H3 cell inside each partition and written with
+explicit row-group sizes, dictionary-encoded cell ids, zstd compression, column
+statistics and the page index, so readers can prune row groups and pages.
+Writer settings come from the ``writer`` block of a layer in parquet_layers.yaml.
+
+Writes are partition-level upserts: only partitions present in the new data are
+rewritten, each through a temp file and an atomic rename, and ``_manifest.json``
+records every partition's row count, checksum and schema version so unchanged
+partitions are detected (and not shipped again).
+"""
+import os
+import sys
+import json
+import hashlib
+import logging
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pathlib import Path
+from anomaly_detector.kernel import ensure_dir, load_config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WRITER_OPTIONS = {
+    'sort_by': ['timestamp', 'h3_index'],
+    'row_group_size': 65536,
+    'data_page_size': 1048576,
+    'compression': 'zstd',
+    'compression_level': 3,
+    'dictionary_columns': ['h3_index'],
+    'write_statistics': True,
+    'write_page_index': True
+}
+PART_FILE = 'part-0.parquet'
+MANIFEST_FILE = '_manifest.json'
+SCHEMA_VERSION = 1
+
+
+def load_layer_config(layer: str = 'gold', config_path: str = None) -> dict:
+    layers = load_config("parquet_layers.yaml", config_path, required=True).get("layers", {})
+    if layer not in layers:
+        logger.warning("Layer %s is not configured in parquet_layers.yaml, using built-in defaults", layer)
+    return layers.get(layer, {})
+
+
+def partition_codes(df: pd.DataFrame, anomaly_col: str = 'is_anomaly', time_col: str = 'timestamp') -> dict:
+    """Vectorized type_code / date_code arrays (dates are formatted once per distinct day)."""
+    days, day_idx = np.unique(pd.to_datetime(df[time_col]).values.astype('datetime64[D]'), return_inverse=True)
+    return {
+        'type_code': np.where(df[anomaly_col].to_numpy() == 1, 'anomalous', 'non_anomalous'),
+        'date_code': np.datetime_as_string(days, unit='D')[day_idx]
+    }
+
+
+def file_sha256(path, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest(base_dir) -> dict:
+    path = Path(base_dir) / MANIFEST_FILE
+    if not path.exists():
+        return {'schema_version': SCHEMA_VERSION, 'partitions': {}}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_manifest(base_dir, manifest: dict) -> Path:
+    path = Path(base_dir) / MANIFEST_FILE
+    ensure_dir(Path(base_dir))
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+    return path
+
+
+class PartitionedParquetWriter:
+    """Writes one sorted, tuned parquet file per hive partition (``col=value/...``)."""
+    def __init__(self, partition_cols=('type_code', 'date_code'), sort_by=None, row_group_size: int = None,
+                 data_page_size: int = None, compression: str = None, compression_level: int = None,
+                 dictionary_columns=None, write_statistics: bool = None, write_page_index: bool = None):
+        opts = DEFAULT_WRITER_OPTIONS
+        self.partition_cols = list(partition_cols)
+        self.sort_by = list(sort_by if sort_by is not None else opts['sort_by'])
+        self.row_group_size = row_group_size or opts['row_group_size']
+        self.data_page_size = data_page_size or opts['data_page_size']
+        self.compression = compression or opts['compression']
+        self.compression_level = compression_level if compression_level is not None else opts['compression_level']
+        self.dictionary_columns = list(dictionary_columns if dictionary_columns is not None else opts['dictionary_columns'])
+        self.write_statistics = opts['write_statistics'] if write_statistics is None else write_statistics
+        self.write_page_index = opts['write_page_index'] if write_page_index is None else write_page_index
+
+    @classmethod
+    def from_layer_config(cls, layer: str = 'gold', config_path: str = None) -> "PartitionedParquetWriter":
+        layer_cfg = load_layer_config(layer, config_path)
+        return cls(partition_cols=layer_cfg.get('partition_cols', ['type_code', 'date_code']),
+                   **layer_cfg.get('writer', {}))
+
+    def write_table(self, table: pa.Table, path, sort: bool = True, expected_sha256: str = None) -> tuple:
+        """
+        Writes a single file with the tuned settings (via a temp file + rename), sorting it first by default.
+        If the new file's checksum equals `expected_sha256` and `path` exists, the old file is kept.
+        Returns (sha256, changed).
+        """
+        path = Path(path)
+        ensure_dir(path.parent)
+        sort_keys = [(c, 'ascending') for c in self.sort_by if c in table.column_names]
+        if sort and sort_keys:
+            table = table.sort_by(sort_keys)
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        pq.write_table(
+            table,
+            str(tmp_path),
+            row_group_size=self.row_group_size,
+            data_page_size=self.data_page_size,
+            compression=self.compression,
+            compression_level=self.compression_level,
+            use_dictionary=[c for c in self.dictionary_columns if c in table.column_names],
+            write_statistics=self.write_statistics,
+            write_page_index=self.write_page_index
+        )
+        sha256 = file_sha256(tmp_path)
+        if sha256 == expected_sha256 and path.exists():
+            tmp_path.unlink()
+            return sha256, False
+        os.replace(tmp_path, path)
+        return sha256, True
+
+    def partition_dir(self, base_dir, key) -> Path:
+        return Path(base_dir).joinpath(*[f"{col}={value}" for col, value in zip(self.partition_cols, key)])
+
+    def partition_key(self, part_dir, base_dir) -> str:
+        return Path(part_dir).relative_to(base_dir).as_posix()
+
+    def _record(self, manifest: dict, key: str, table: pa.Table, sha256: str, path: Path):
+        manifest['partitions'][key] = {
+            'file': path.name,
+            'rows': table.num_rows,
+            'bytes': path.stat().st_size,
+            'sha256': sha256,
+            'schema_version': SCHEMA_VERSION
+        }
+
+    def write(self, df: pd.DataFrame, base_dir: str, codes: dict = None, replace_scope=('date_code',)) -> list:
+        """
+        Upserts df partitioned by partition_cols. Partition values are taken from `codes`
+        (arrays aligned with df) or from df's own columns. Existing partitions sharing a
+        `replace_scope` value with the new data but absent from it (e.g. a date whose rows
+        are no longer anomalous) are removed. Returns the keys of changed partitions.
+        """
+        codes = codes or {}
+        keys = [np.asarray(codes[c]) if c in codes else df[c].to_numpy() for c in self.partition_cols]
+        factorized = [pd.factorize(k, sort=True) for k in keys]
+        key_idx = np.ravel_multi_index([f[0] for f in factorized], [len(f[1]) for f in factorized])
+        # One stable sort groups partitions and orders rows inside them
+        sort_cols = [pd.factorize(df[c], sort=True)[0] for c in reversed(self.sort_by) if c in df.columns]
+        order = np.lexsort(sort_cols + [key_idx]) if sort_cols else np.argsort(key_idx, kind='stable')
+        starts = np.r_[0, np.flatnonzero(np.diff(key_idx[order])) + 1]
+        ends = np.r_[starts[1:], len(order)]
+        # Convert to Arrow once; partitions are zero-copy slices of the sorted table
+        data = df.drop(columns=[c for c in self.partition_cols if c in df.columns])
+        table = pa.Table.from_pandas(data, preserve_index=False).take(order)
+        manifest = load_manifest(base_dir)
+        schema_changed = manifest.get('schema_version') != SCHEMA_VERSION
+        manifest.update({'schema_version': SCHEMA_VERSION, 'partition_cols': self.partition_cols})
+        written, changed = set(), []
+        for start, end in zip(starts, ends):
+            parts = np.unravel_index(key_idx[order[start]], [len(f[1]) for f in factorized])
+            out_dir = self.partition_dir(base_dir, [f[1][i] for f, i in zip(factorized, parts)])
+            key = self.partition_key(out_dir, base_dir)
+            previous = None if schema_changed else manifest['partitions'].get(key, {}).get('sha256')
+            part = table.slice(start, end - start)
+            sha256, is_changed = self.write_table(part, out_dir / PART_FILE, sort=False, expected_sha256=previous)
+            self._record(manifest, key, part, sha256, out_dir / PART_FILE)
+            written.add(key)
+            if is_changed:
+                changed.append(key)
+        # Partitions in the replaced scope that the new data no longer produces
+        scope = [self.partition_cols.index(c) for c in replace_scope if c in self.partition_cols]
+        touched = {tuple(k.split('/')[i] for i in scope) for k in written}
+        for key in list(manifest['partitions']):
+            if key not in written and scope and tuple(key.split('/')[i] for i in scope) in touched:
+                stale = Path(base_dir) / key
+                for f in stale.glob("*.parquet"):
+                    f.unlink()
+                if stale.is_dir() and not any(stale.iterdir()):
+                    stale.rmdir()
+                del manifest['partitions'][key]
+                changed.append(key)
+        save_manifest(base_dir, manifest)
+        return changed
+
+    def compact(self, base_dir: str, min_files: int = 2) -> list:
+        """Merges partitions holding at least `min_files` parquet files into a single sorted file."""
+        manifest = load_manifest(base_dir)
+        compacted = []
+        # Hidden and underscore-prefixed entries (manifest, stage caches) are not partitions
+        part_dirs = {p.parent for p in Path(base_dir).rglob("*.parquet")
+                     if not any(part.startswith(('_', '.')) for part in p.relative_to(base_dir).parts)}
+        for part_dir in sorted(part_dirs):
+            files = sorted(part_dir.glob("*.parquet"))
+            if len(files) < min_files:
+                continue
+            table = pa.concat_tables([pq.read_table(f, partitioning=None) for f in files], promote_options='default')
+            sha256, _ = self.write_table(table, part_dir / PART_FILE)
+            for f in files:
+                if f.name != PART_FILE:
+                    f.unlink()
+            self._record(manifest, self.partition_key(part_dir, base_dir), table, sha256, part_dir / PART_FILE)
+            compacted.append(part_dir)
+        if compacted:
+            save_manifest(base_dir, manifest)
+        return compacted
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python -m anomaly_detector.domain.parquet_writer <base_dir> [layer] [min_files]")
+        sys.exit(1)
+    base_dir = sys.argv[1]
+    layer = sys.argv[2] if len(sys.argv) > 2 else 'gold'
+    min_files = int(sys.argv[3]) if len(sys.argv) > 3 else 2
+    writer = PartitionedParquetWriter.from_layer_config(layer)
+    compacted = writer.compact(base_dir, min_files=min_files)
+    print(f"Compacted {len(compacted)} partitions in {base_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+Stage-caching DAG executor for the anomaly detection pipeline.
+
+A pipeline is a set of named stages. Each stage declares the stages it depends
+on and the parameters it reads; its fingerprint hashes its name, version,
+parameters and the fingerprints of its dependencies. Outputs are cached under
+``<cache root>/<stage>/<fingerprint>[.<ext>]``, outside the published parquet
+layers, so a rerun only executes stages whose fingerprint changed. Stages whose dependencies are satisfied run
+concurrently.
+"""
+import os
+import json
+import time
+import pickle
+import shutil
+import hashlib
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+from anomaly_detector.kernel import ensure_dir
+
+CACHE_FORMATS = ('parquet', 'pickle', 'json', 'dir')
+
+
+def fingerprint(*parts) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(json.dumps(part, sort_keys=True, default=str).encode())
+    return digest.hexdigest()[:20]
+
+
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    """Content hash of a DataFrame (values and column names, not the index)."""
+    digest = hashlib.sha256(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    digest.update(json.dumps(list(map(str, df.columns))).encode())
+    return digest.hexdigest()[:20]
+
+
+class Stage:
+    """
+    A pipeline step: ``func(params, **dep_outputs)`` returns the stage output.
+    ``cache`` is one of 'parquet', 'pickle', 'json', 'dir' or None (never cached);
+    'dir' outputs are written into a folder by ``dump(value, folder)`` and read back by ``restore(folder)``.
+    ``key(params)`` optionally derives the fingerprint from the inputs themselves (e.g. raw data);
+    ``keep`` overrides how many cached fingerprints are retained (1 for stages writing shared files).
+    """
+    def __init__(self, name: str, func, deps=(), params=(), cache: str = None, version: int = 1,
+                 key=None, keep: int = None, dump=None, restore=None):
+        if cache is not None and cache not in CACHE_FORMATS:
+            raise ValueError(f"Unknown cache format: {cache}")
+        if cache == 'dir' and (dump is None or restore is None):
+            raise ValueError(f"Stage {name} caches a folder and needs dump and restore")
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.params = list(params)
+        self.cache = cache
+        self.version = version
+        self.key = key
+        self.keep = keep
+        self.dump = dump
+        self.restore = restore
+
+
+class StageCache:
+    """Stores stage outputs by fingerprint under `root`, keeping the `keep` most recent per stage."""
+    def __init__(self, root: str = '.pipeline_cache', keep: int = 3):
+        self.root = Path(root)
+        self.keep = keep
+
+    def path(self, stage: Stage, fp: str) -> Path:
+        name = fp if stage.cache == 'dir' else f"{fp}.{stage.cache}"
+        return self.root / stage.name / name
+
+    def exists(self, stage: Stage, fp: str) -> bool:
+        return stage.cache is not None and self.path(stage, fp).exists()
+
+    def load(self, stage: Stage, fp: str):
+        path = self.path(stage, fp)
+        if stage.cache == 'dir':
+            return stage.restore(path)
+        if stage.cache == 'parquet':
+            return pd.read_parquet(path)
+        if stage.cache == 'pickle':
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def save(self, stage: Stage, fp: str, value):
+        path = self.path(stage, fp)
+        ensure_dir(path.parent)
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        if stage.cache == 'dir':
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            tmp_path.mkdir()
+            stage.dump(value, tmp_path)
+            shutil.rmtree(path, ignore_errors=True)
+        elif stage.cache == 'parquet':
+            value.to_parquet(tmp_path, index=False)
+        elif stage.cache == 'pickle':
+            with open(tmp_path, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        else:
+            with open(tmp_path, "w") as f:
+                json.dump(value, f, default=str)
+        os.replace(tmp_path, path)
+        self._evict(path, stage.keep or self.keep)
+
+    @staticmethod
+    def _evict(latest: Path, keep: int):
+        entries = sorted((p for p in latest.parent.iterdir() if p != latest and not p.name.startswith('.')),
+                         key=lambda p: p.stat().st_mtime, reverse=True)
+        for stale in entries[keep - 1:]:
+            if stale.is_dir():
+                shutil.rmtree(stale, ignore_errors=True)
+            else:
+                stale.unlink()
+
+
+class PipelineExecutor:
+    """Runs stages in dependency order, skipping cached ones and running independent ones concurrently."""
+    def __init__(self, stages: list, cache: StageCache = None, max_workers: int = None, use_cache: bool = True):
+        self.stages = {stage.name: stage for stage in stages}
+        for stage in stages:
+            missing = [d for d in stage.deps if d not in self.stages]
+            if missing:
+                raise ValueError(f"Stage {stage.name} depends on unknown stages: {missing}")
+        self.cache = cache or StageCache()
+        self.max_workers = max_workers
+        self.use_cache = use_cache
+        self.report = []
+
+    def _order(self) -> list:
+        order, done = [], set()
+        pending = dict(self.stages)
+        while pending:
+            ready = [name for name, s in pending.items() if all(d in done for d in s.deps)]
+            if not ready:
+                raise ValueError(f"Dependency cycle between stages: {sorted(pending)}")
+            for name in ready:
+                order.append(name)
+                done.add(name)
+                del pending[name]
+        return order
+
+    def plan(self, params: dict, force=(), targets=None) -> dict:
+        """
+        Fingerprints every stage and decides its action: 'run', 'load' (cached output needed
+        downstream or requested) or 'skip' (cached and not needed).
+        """
+        order = self._order()
+        fingerprints, forced = {}, set(force)
+        for name in order:
+            stage = self.stages[name]
+            if stage.key is not None:
+                fingerprints[name] = stage.key(params)
+            else:
+                fingerprints[name] = fingerprint(stage.name, stage.version, {p: params.get(p) for p in stage.params},
+                                                 [fingerprints[d] for d in stage.deps])
+            if any(d in forced for d in stage.deps):
+                forced.add(name)
+        must_run = {
+            name: name in forced or not (self.use_cache and self.cache.exists(self.stages[name], fingerprints[name]))
+            for name in order
+        }
+        needed = set(self.stages if targets is None else targets)
+        for name in reversed(order):
+            if must_run[name]:
+                needed.update(self.stages[name].deps)
+        actions = {name: 'run' if must_run[name] else ('load' if name in needed else 'skip') for name in order}
+        return {'order': order, 'fingerprints': fingerprints, 'actions': actions}
+
+    def _execute(self, stage: Stage, params: dict, fp: str, action: str, inputs: dict):
+        start = time.time()
+        if action == 'skip':
+            value, status = None, 'cached'
+        elif action == 'load':
+            value, status = self.cache.load(stage, fp), 'cached'
+        else:
+            value, status = stage.func(params, **inputs), 'ran'
+            if self.use_cache and stage.cache is not None:
+                self.cache.save(stage, fp, value)
+        return value, {'stage': stage.name, 'status': status, 'fingerprint': fp, 'seconds': round(time.time() - start, 3)}
+
+    def run(self, params: dict, force=(), targets=None) -> dict:
+        """
+        Runs the DAG and returns {stage name: output}. Stages in `force` (and their dependents)
+        rerun; cached outputs are only loaded when a running stage or `targets` needs them.
+        """
+        plan = self.plan(params, force=force, targets=targets)
+        outputs, pending = {}, {name: self.stages[name] for name in plan['order']}
+        self.report = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            running = {}
+            while pending or running:
+                ready = [s for s in pending.values() if all(d in outputs for d in s.deps)]
+                for stage in ready:
+                    del pending[stage.name]
+                    inputs = {d: outputs[d] for d in stage.deps}
+                    future = pool.submit(self._execute, stage, params, plan['fingerprints'][stage.name],
+                                         plan['actions'][stage.name], inputs)
+                    running[future] = stage.name
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    outputs[name], entry = future.result()
+                    self.report.append(entry)
+                    print(f"[pipeline] {entry['stage']}: {entry['status']} ({entry['seconds']}s)")
+        return outputs
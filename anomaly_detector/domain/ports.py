@@ -20,6 +20,12 @@ class StoragePort(ABC):
     @abstractmethod
     def upload(self, *args, **kwargs) -> None:
         pass
+    @abstractmethod
+    def upload_many(self, *args, **kwargs) -> dict:
+        pass
+    @abstractmethod
+    def download_json(self, *args, **kwargs) -> Any:
+        pass
 
 class MLflowPort(ABC):
     @abstractmethod
@@ -37,6 +43,9 @@ class MLflowPort(ABC):
     @abstractmethod
     def promote_model(self, name: str, stage: str):
         pass
+    @abstractmethod
+    def flush(self, timeout: float = None) -> bool:
+        pass
 
 class APIPort(ABC):
     @abstractmethod
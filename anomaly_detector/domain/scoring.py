@@ -0,0 +1,82 @@
+"""
+Chunked scoring engine for fitted Isolation Forest models.
+"""
+import os
+import numpy as np
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+
+@contextmanager
+def single_job(model):
+    """Temporarily sets the model's own ``n_jobs`` to 1 so chunk threads do not each fan out to every core."""
+    if not hasattr(model, 'n_jobs'):
+        yield model
+        return
+    n_jobs = model.n_jobs
+    model.n_jobs = 1
+    try:
+        yield model
+    finally:
+        model.n_jobs = n_jobs
+
+
+class ScoringEngine:
+    """
+    Scores samples in fixed-size chunks across worker threads.
+
+    Each row goes through the forest exactly once: the raw ``score_samples``
+    value is computed per chunk and both the decision function and the
+    anomaly label are derived from the model's fitted ``offset_``.
+    Tree traversal releases the GIL, so threads scale across cores while
+    memory stays bounded by ``chunk_size`` rows per worker; the model's own
+    ``n_jobs`` is pinned to 1 meanwhile so the two levels do not oversubscribe.
+    A CompiledForest is chunked the same way: its NumPy traversal releases the GIL too.
+    """
+    def __init__(self, model, chunk_size: int = 50000, n_jobs: int = -1):
+        self.model = model
+        self.chunk_size = chunk_size
+        self.n_jobs = n_jobs
+
+    def _n_workers(self, n_chunks: int) -> int:
+        n_jobs = self.n_jobs if self.n_jobs and self.n_jobs > 0 else (os.cpu_count() or 1)
+        return max(1, min(n_jobs, n_chunks))
+
+    def _run(self, X, offset: float) -> np.ndarray:
+        n_samples = X.shape[0]
+        out = np.empty(n_samples, dtype=np.float32)
+        if n_samples == 0:
+            return out
+        bounds = [(start, min(start + self.chunk_size, n_samples))
+                  for start in range(0, n_samples, self.chunk_size)]
+        take = X.iloc if hasattr(X, 'iloc') else X
+
+        def _score_chunk(bound):
+            start, end = bound
+            out[start:end] = self.model.score_samples(take[start:end]) - offset
+
+        n_workers = self._n_workers(len(bounds))
+        if n_workers == 1:
+            for bound in bounds:
+                _score_chunk(bound)
+        else:
+            with single_job(self.model), ThreadPoolExecutor(max_workers=n_workers) as pool:
+                list(pool.map(_score_chunk, bounds))
+        return out
+
+    def score_samples(self, X) -> np.ndarray:
+        """Return the model's ``score_samples`` for X as a preallocated float32 array."""
+        return self._run(X, 0.0)
+
+    def decision_function(self, X) -> np.ndarray:
+        """Return ``score_samples - offset_`` (negative values are anomalies)."""
+        return self._run(X, self.model.offset_)
+
+    def score(self, X):
+        """
+        Single-pass scoring.
+        Returns (is_anomaly, anomaly_score): 0/1 labels and float32 decision scores.
+        """
+        anomaly_score = self.decision_function(X)
+        is_anomaly = (anomaly_score < 0).astype(np.int64)
+        return is_anomaly, anomaly_score
@@ -4,22 +4,33 @@ Domain services for anomaly detection pipeline (Hexagonal Architecture)
 """
 
 import os
-import yaml
+import json
 import pandas as pd
 from .feature_engineering import TimestampProcessor, SpatialIndexer, Aggregator, FeatureEngineer, SpatialPreprocessor
 from .anomaly_detection import AnomalyDetector, Evaluator
+from .sharding import ShardedAnomalyDetector
 from anomaly_detector.adapters.ml_adapter import MLflowAdapter
 from .visualization import Visualizer
+from .parquet_writer import MANIFEST_FILE, load_manifest
+from .serving import publish_serving_payloads
+from .pipeline import Stage, StageCache, PipelineExecutor, frame_fingerprint
+from anomaly_detector.kernel import load_config
 
+DEFAULT_MODEL_FEATURES = ['value', 'Lag', 'Rolling_Mean', 'hour_sin', 'hour_cos', 'dow_sin', 'month_sin', 'month_cos']
+MODEL_BUNDLE_DIR = 'model_bundle'
 
-def run_pipeline(raw_df: pd.DataFrame, hex_resolution: int = 7, rolling_window: int = 168, model_features=None, contamination: float = 0.22, n_estimators: int = 50, max_samples: float = 0.25, parquet_layer: str = "gold", storage_adapter=None):
-    if model_features is None:
-        model_features = ['value', 'Lag', 'Rolling_Mean', 'hour_sin', 'hour_cos', 'dow_sin', 'month_sin', 'month_cos']
+
+def to_bronze(raw_df: pd.DataFrame) -> pd.DataFrame:
+    """Steps 1: standard column names and hourly timestamps."""
     # Given raw_df with columns ['Date/Time', 'Lat', 'Lon'], rename to standard cols:
-    raw_df = raw_df.rename(columns={'Date/Time': 'timestamp', 'Lat': 'lat', 'Lon': 'lon'})    
+    raw_df = raw_df.rename(columns={'Date/Time': 'timestamp', 'Lat': 'lat', 'Lon': 'lon'})
     # 1. Timestamp processing
     ts_proc = TimestampProcessor(datetime_col='timestamp')
-    df_ts = ts_proc.floor_to_hour(raw_df)
+    return ts_proc.floor_to_hour(raw_df)
+
+
+def to_silver(df_ts: pd.DataFrame, hex_resolution: int = 7) -> pd.DataFrame:
+    """Steps 2-3: H3 indexing and hourly aggregation per cell (with centroids)."""
     # 2. Spatial indexing
     indexer = SpatialIndexer(lat_col='lat', lon_col='lon', resolution=hex_resolution)
     df_indexed = indexer.add_h3_index(df_ts)
@@ -28,76 +39,227 @@ def run_pipeline(raw_df: pd.DataFrame, hex_resolution: int = 7, rolling_window:
     aggregator = Aggregator(time_col='timestamp_hour', h3_col='h3_index', value_col='value')
     df_agg = aggregator.aggregate_hourly(df_indexed)
     df_agg = df_agg.merge(centroids, how='left', on='h3_index')
-    # 4. Feature engineering
+    return df_agg
+
+
+def index_and_aggregate(raw_df: pd.DataFrame, hex_resolution: int = 7) -> pd.DataFrame:
+    """Steps 1-3: hourly timestamps, H3 indexing and hourly aggregation per cell (with centroids)."""
+    return to_silver(to_bronze(raw_df), hex_resolution=hex_resolution)
+
+
+def engineer_features(df_agg: pd.DataFrame, rolling_window: int = 168) -> pd.DataFrame:
+    """Step 4: time, lag, rolling and cyclic features on the hourly aggregates."""
     fe = FeatureEngineer(rolling_window=rolling_window, time_col='timestamp', value_col='value', group_col='h3_index')
     df_feat_result = fe.add_time_features(df_agg)
     df_feat_result = df_feat_result[df_feat_result['value'] > 0]
     df_feat_result = fe.add_lag_and_rolling(df_feat_result)
     df_feat = fe.add_cyclic_features(df_feat_result, drop_original=False)
-    # 5. Anomaly detection with MLflow experiment tracking
-    mlflow_config_path = os.path.join(os.path.dirname(__file__), "..", "configs", "train.yaml")
-    with open(mlflow_config_path, "r") as f:
-        train_config = yaml.safe_load(f)
-    mlflow_experiment = train_config.get("mlflow_experiment", "Uber_Anomaly_Detection_NY_City_Trips")
-    mlflow_tracking_uri = train_config.get("mlflow_tracking_uri", None)
-    ml_adapter = MLflowAdapter(experiment_name=mlflow_experiment, tracking_uri=mlflow_tracking_uri)
-    ad = AnomalyDetector(feature_cols=model_features, contamination=contamination, n_estimators=n_estimators, max_samples=max_samples)
-    df_processed, X_train = ad.fit(df_feat)
-    # Log all params, metrics, model, and artifacts in a single MLflow run
-    ml_adapter.log_run(
+    return df_feat
+
+
+def _load_yaml(name: str) -> dict:
+    return load_config(name, required=True)
+
+
+def _model_stage(params: dict, features: pd.DataFrame) -> dict:
+    """Step 5: anomaly detection with MLflow experiment tracking."""
+    model_features = params['model_features']
+    if params['shard_resolution'] is not None:
+        # One detector per coarse H3 region, trained in parallel and logged as a single composite model
+        ad = ShardedAnomalyDetector(feature_cols=model_features, shard_resolution=params['shard_resolution'], contamination=params['contamination'], n_estimators=params['n_estimators'], max_samples=params['max_samples'])
+    else:
+        ad = AnomalyDetector(feature_cols=model_features, contamination=params['contamination'], n_estimators=params['n_estimators'], max_samples=params['max_samples'])
+    df_processed, X_train = ad.fit(features)
+    # Log all params, metrics, model, and artifacts in a single MLflow run (queued, non-blocking)
+    sharded = params['shard_resolution'] is not None
+    logged = params['ml_adapter'].log_run(
         sk_model=ad.model,
-        params={
-            "hex_resolution": hex_resolution,
-            "rolling_window": rolling_window,
-            "model_features": model_features,
-            "contamination": contamination,
-            "n_estimators": n_estimators,
-            "max_samples": max_samples
-        },
+        composite_model=ad if sharded else None,
+        model_bundle=None if sharded else ad.bundle_path,
+        params={p: params[p] for p in MODEL_PARAMS},
         metrics={
             "num_rows": len(df_processed),
             "num_anomalies": df_processed["is_anomaly"].sum(),
             "mv_area": getattr(ad, "mv_area", None),
             "em_area": getattr(ad, "em_area", None)
         },
-        artifacts=[ad.preproc_path, ad.scaler_path, ad.curves_csv, ad.sample_csv],
+        artifacts=ad.artifact_paths(),
         input_example=ad.input_example,
         signature=ad.signature,
         registered_model_name='UberAnomalyIForest'
     )
-    # 6. Summarize
-    summarize_df = ad.summarize(df_processed)
+    # The per-run artifact folder is only needed until the run is logged
+    logged.add_done_callback(lambda _: ad.cleanup_artifacts())
+    return {'ad': ad, 'df_processed': df_processed, 'X_train': X_train}
+
+
+def _dump_model(model: dict, folder):
+    """Caches the model stage as its bundle (not a pickled detector) plus the scored frames."""
+    ad = model['ad']
+    sharded = isinstance(ad, ShardedAnomalyDetector)
+    meta = {'sharded': sharded, 'mv_area': getattr(ad, 'mv_area', None), 'em_area': getattr(ad, 'em_area', None)}
+    if sharded:
+        ad.save_bundles(os.path.join(folder, MODEL_BUNDLE_DIR))
+        meta.update(shard_resolution=ad.shard_resolution, shard_col=ad.shard_col, shard_rows=ad.shard_rows)
+    else:
+        ad.to_bundle().save(os.path.join(folder, MODEL_BUNDLE_DIR))
+    model['df_processed'].to_parquet(os.path.join(folder, "df_processed.parquet"))
+    model['X_train'].to_parquet(os.path.join(folder, "X_train.parquet"))
+    with open(os.path.join(folder, "model.json"), "w") as f:
+        json.dump(meta, f)
+
+
+def _restore_model(folder) -> dict:
+    """Model stage output rebuilt from a cached folder; the detector is backed by the cached bundle."""
+    with open(os.path.join(folder, "model.json"), "r") as f:
+        meta = json.load(f)
+    bundle_path = os.path.join(folder, MODEL_BUNDLE_DIR)
+    if meta['sharded']:
+        ad = ShardedAnomalyDetector.from_bundle(bundle_path, shard_resolution=meta['shard_resolution'],
+                                                shard_col=meta['shard_col'], shard_rows=meta['shard_rows'])
+    else:
+        ad = AnomalyDetector.from_bundle(bundle_path)
+    ad.mv_area, ad.em_area = meta['mv_area'], meta['em_area']
+    return {
+        'ad': ad,
+        'df_processed': pd.read_parquet(os.path.join(folder, "df_processed.parquet")),
+        'X_train': pd.read_parquet(os.path.join(folder, "X_train.parquet"))
+    }
+
+
+def _summarize_stage(params: dict, model: dict) -> dict:
+    """Step 6: daily, weekly and per-zone summaries in one pass, merged into indicators.parquet."""
+    ad = model['ad']
+    summaries = ad.summarize_all(model['df_processed'])
+    ad.save_summaries(summaries['daily'], params['summary_path'],
+                      extra_summaries={'weekly': summaries['weekly'], 'zone_daily': summaries['zone_daily']})
+    return summaries
+
+
+def _gold_stage(params: dict, model: dict) -> list:
+    """Step 7: partition upserts of the scored rows; returns the changed partitions."""
+    return model['ad'].save_partitions(model['df_processed'], params['base_dir'], anomaly_col='is_anomaly', time_col='timestamp')
+
+
+def _serving_stage(params: dict, gold: list) -> list:
+    """Step 7b: per-date API payloads for the dates whose gold partitions changed."""
+    return publish_serving_payloads(params['base_dir'], params['serving_dir'], gold)
+
+
+def _upload_stage(params: dict, gold: list, summarize: dict, serving: list) -> list:
+    """
+    Step 8: S3 upload (if adapter provided). Gold partitions are compared with the remote manifest,
+    so partitions missing or different remotely are uploaded whatever the previous runs did; the
+    manifest goes last. Serving payloads and the indicators file rely on the ETag check of upload_many.
+    """
+    storage_adapter, base_dir = params['storage_adapter'], params['base_dir']
+    if not storage_adapter:
+        return []
+    local = load_manifest(base_dir)['partitions']
+    remote = (storage_adapter.download_json(MANIFEST_FILE) or {}).get('partitions', {})
+    files = {
+        os.path.join(base_dir, key, entry['file']): f"{key}/{entry['file']}"
+        for key, entry in local.items() if remote.get(key, {}).get('sha256') != entry['sha256']
+    }
+    # Also upload indicators.parquet (summary) to gold_summary path from config
+    gold_summary_path = params['gold_summary_path']
+    indicators_path = os.path.join(params['summary_dir'], "indicators.parquet")
+    if os.path.exists(indicators_path) and gold_summary_path:
+        files[indicators_path] = gold_summary_path
+    serving_dir = params['serving_dir']
+    for root, _, names in os.walk(serving_dir):
+        for name in names:
+            if not name.startswith('.'):
+                local_path = os.path.join(root, name)
+                files[local_path] = os.path.join(serving_dir, os.path.relpath(local_path, serving_dir)).replace(os.sep, '/')
+    report = storage_adapter.upload_many(files)
+    if not report['failed']:
+        # Readers follow the manifest, so it only moves once every partition it lists is in place
+        manifest_report = storage_adapter.upload_many({os.path.join(base_dir, MANIFEST_FILE): MANIFEST_FILE})
+        for field in ('uploaded', 'skipped'):
+            report[field] += manifest_report[field]
+        report['failed'].update(manifest_report['failed'])
+    print(f"Uploaded {len(report['uploaded'])} files, skipped {len(report['skipped'])} unchanged")
+    if report['failed']:
+        raise RuntimeError(f"S3 upload failed for {len(report['failed'])} files: {report['failed']}")
+    return report['uploaded']
+
+
+MODEL_PARAMS = ['hex_resolution', 'rolling_window', 'model_features', 'contamination', 'n_estimators', 'max_samples', 'shard_resolution']
+
+
+def build_pipeline() -> list:
+    """
+    Stages ingest -> bronze -> silver -> features -> model -> (summarize | gold -> serving) -> upload.
+    The upload stage is never cached: it compares the local gold layer with the remote one on every run.
+    """
+    return [
+        Stage('ingest', lambda params: params['raw_df'], key=lambda params: frame_fingerprint(params['raw_df'])),
+        Stage('bronze', lambda params, ingest: to_bronze(ingest), deps=['ingest'], cache='parquet'),
+        # 1-3. Timestamp processing, spatial indexing and hourly aggregation
+        Stage('silver', lambda params, bronze: to_silver(bronze, hex_resolution=params['hex_resolution']),
+              deps=['bronze'], params=['hex_resolution'], cache='parquet'),
+        # 4. Feature engineering
+        Stage('features', lambda params, silver: engineer_features(silver, rolling_window=params['rolling_window']),
+              deps=['silver'], params=['rolling_window'], cache='parquet'),
+        Stage('model', _model_stage, deps=['features'], params=MODEL_PARAMS, cache='dir',
+              dump=_dump_model, restore=_restore_model),
+        # Sinks write shared files, so only the last fingerprint counts as cached
+        Stage('summarize', _summarize_stage, deps=['model'], params=['summary_path'], cache='pickle', keep=1),
+        Stage('gold', _gold_stage, deps=['model'], params=['base_dir'], cache='json', keep=1),
+        Stage('serving', _serving_stage, deps=['gold'], params=['serving_dir'], cache='json', keep=1),
+        Stage('upload', _upload_stage, deps=['gold', 'summarize', 'serving'], params=['upload_target', 'gold_summary_path'])
+    ]
+
+
+def run_pipeline(raw_df: pd.DataFrame, hex_resolution: int = 7, rolling_window: int = 168, model_features=None, contamination: float = 0.22, n_estimators: int = 50, max_samples: float = 0.25, parquet_layer: str = "gold", storage_adapter=None, shard_resolution: int = None, use_cache: bool = False, force_stages=(), ml_adapter=None, cache_dir: str = None):
+    """
+    Runs the pipeline as a stage DAG; with use_cache only stages whose inputs or
+    parameters changed are executed (force_stages reruns stages and their dependents).
+    Stage outputs are cached in cache_dir (default: stage_cache_dir from artifacts.yaml).
+    MLflow logging happens in the background; call ml_adapter.flush() to wait for it.
+    """
+    if model_features is None:
+        model_features = list(DEFAULT_MODEL_FEATURES)
+    if ml_adapter is None:
+        train_config = _load_yaml("train.yaml")
+        mlflow_experiment = train_config.get("mlflow_experiment", "Uber_Anomaly_Detection_NY_City_Trips")
+        mlflow_tracking_uri = train_config.get("mlflow_tracking_uri", None)
+        ml_adapter = MLflowAdapter(experiment_name=mlflow_experiment, tracking_uri=mlflow_tracking_uri)
     # 7. Parquet layering
-    config_path = os.path.join(os.path.dirname(__file__), "..", "configs", "parquet_layers.yaml")
-    with open(config_path, "r") as f:
-        layers_config = yaml.safe_load(f)
+    layers = _load_yaml("parquet_layers.yaml")["layers"]
     # Get base_dir for selected parquet_layer
-    layer_info = layers_config["layers"].get(parquet_layer, {})
+    layer_info = layers.get(parquet_layer, {})
     base_dir = layer_info.get("path", f"trips_uber_{parquet_layer}")
     # Get summary_dir and gold_summary_path from gold_summary config
-    gold_summary_cfg = layers_config["layers"].get("gold_summary", {})
+    gold_summary_cfg = layers.get("gold_summary", {})
     print("Gold Summary Config:", gold_summary_cfg)
     gold_summary_path = gold_summary_cfg.get("path", None)
     summary_dir = os.path.dirname(gold_summary_path) if gold_summary_path else f"{base_dir}_summarize"
-    ad.save_partitioned_parquet(
-        df_processed,
-        summarize_df,
-        base_dir=base_dir,
-        anomaly_col='is_anomaly',
-        time_col='timestamp',
-        summary_path=gold_summary_path
-    )
-    # 8. S3 upload (if adapter provided)
-    if storage_adapter:
-        for root, dirs, files in os.walk(base_dir):
-            for file in files:
-                local_path = os.path.join(root, file)
-                s3_key = os.path.relpath(local_path, base_dir)
-                storage_adapter.upload(local_path, s3_key)
-        # Also upload indicators.parquet (summary) to gold_summary path from config
-        indicators_path = os.path.join(summary_dir, "indicators.parquet")
-        if os.path.exists(indicators_path) and gold_summary_path:
-            storage_adapter.upload(indicators_path, gold_summary_path)
+    params = {
+        'raw_df': raw_df,
+        'hex_resolution': hex_resolution,
+        'rolling_window': rolling_window,
+        'model_features': model_features,
+        'contamination': contamination,
+        'n_estimators': n_estimators,
+        'max_samples': max_samples,
+        'shard_resolution': shard_resolution,
+        'ml_adapter': ml_adapter,
+        'base_dir': base_dir,
+        'summary_path': gold_summary_path or f"{base_dir}_summarize",
+        'summary_dir': summary_dir,
+        'gold_summary_path': gold_summary_path,
+        'serving_dir': layers.get("serving", {}).get("path", f"{base_dir}_serving"),
+        'storage_adapter': storage_adapter,
+        'upload_target': getattr(storage_adapter, 's3_bucket', None) if storage_adapter else None
+    }
+    if cache_dir is None:
+        cache_dir = load_config("artifacts.yaml").get("stage_cache_dir") or ".pipeline_cache"
+    executor = PipelineExecutor(build_pipeline(), cache=StageCache(cache_dir), use_cache=use_cache)
+    outputs = executor.run(params, force=force_stages, targets=['features', 'model', 'upload'])
+    df_feat = outputs['features']
+    df_processed, X_train, ad = outputs['model']['df_processed'], outputs['model']['X_train'], outputs['model']['ad']
     # 9. Visualization (optional)
     viz = Visualizer(df_feat.assign(is_anomaly=df_processed['is_anomaly']))
     return df_processed, X_train, viz, ad
@@ -0,0 +1,123 @@
+"""
+Per-date serving payloads for the trips web API.
+
+For every date the gold layer holds, the map endpoint returns
+``{type_code: {'time_index': [...], 'data': [[[lat, lon], ...], ...]}}``. That
+shape is fixed at write time, so it is materialized here as one gzip JSON file
+per date (``<serving path>/date_code=YYYY-MM-DD/trips.json.gz``) which the API
+serves without touching the parquet files. Next to it, ``cells.json.gz`` holds
+the H3 cells and trip counts of every hour, from which the API cuts the hour,
+viewport and zoom slices of the map. Only dates whose gold partitions changed
+are regenerated.
+"""
+import os
+import sys
+import gzip
+import json
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from pathlib import Path
+from anomaly_detector.kernel import ensure_dir
+from .parquet_writer import PART_FILE, load_layer_config, load_manifest
+
+TYPE_CODES = ('anomalous', 'non_anomalous')
+PAYLOAD_FILE = 'trips.json.gz'
+CELLS_FILE = 'cells.json.gz'
+PAYLOAD_COLUMNS = ['timestamp', 'h3_index', 'centroid_lat', 'centroid_lon', 'value']
+
+
+def _by_time(df: pd.DataFrame, time_col: str, arrays: dict) -> dict:
+    """{'time_index': [...], name: [values per time_index], ...} with the rows grouped by time, ascending."""
+    if df.empty:
+        return {'time_index': [], **{name: [] for name in arrays}}
+    times = pd.to_datetime(df[time_col]).values
+    order = np.argsort(times, kind='stable')
+    times = times[order]
+    starts = np.r_[0, np.flatnonzero(times[1:] != times[:-1]) + 1]
+    ends = np.r_[starts[1:], len(times)]
+    grouped = {'time_index': [pd.Timestamp(t).isoformat() for t in times[starts]]}
+    for name, values in arrays.items():
+        values = values[order]
+        grouped[name] = [values[start:end].tolist() for start, end in zip(starts, ends)]
+    return grouped
+
+
+def trips_payload(df: pd.DataFrame, time_col: str = 'timestamp', lat_col: str = 'centroid_lat',
+                  lon_col: str = 'centroid_lon') -> dict:
+    """{'time_index': [...], 'data': [[[lat, lon], ...] per time_index]} for one type and date, hours ascending."""
+    coords = np.column_stack([df[lat_col].to_numpy(dtype=np.float64), df[lon_col].to_numpy(dtype=np.float64)])
+    return _by_time(df, time_col, {'data': coords})
+
+
+def cells_payload(df: pd.DataFrame, time_col: str = 'timestamp', cell_col: str = 'h3_index',
+                  value_col: str = 'value') -> dict:
+    """{'time_index': [...], 'cells': [[h3, ...] per time_index], 'value': [[trips, ...] per time_index]}."""
+    return _by_time(df, time_col, {'cells': df[cell_col].to_numpy(dtype=object),
+                                   'value': df[value_col].to_numpy()})
+
+
+def dates_of(partitions) -> list:
+    """Distinct date codes in gold partition keys such as 'type_code=anomalous/date_code=2014-04-01'."""
+    dates = set()
+    for key in partitions:
+        for part in Path(key).parts:
+            if part.startswith('date_code='):
+                dates.add(part.split('=', 1)[1])
+    return sorted(dates)
+
+
+def payload_path(serving_dir, date_code: str, name: str = PAYLOAD_FILE) -> Path:
+    return Path(serving_dir) / f"date_code={date_code}" / name
+
+
+def write_payload(payload: dict, path) -> Path:
+    """Compact JSON, gzip with a fixed mtime so identical payloads give identical bytes (and ETags)."""
+    path = Path(path)
+    ensure_dir(path.parent)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    body = json.dumps(payload, separators=(',', ':')).encode()
+    with open(tmp_path, "wb") as f:
+        f.write(gzip.compress(body, compresslevel=6, mtime=0))
+    os.replace(tmp_path, path)
+    return path
+
+
+def publish_serving_payloads(gold_dir: str, serving_dir: str, partitions) -> list:
+    """
+    Regenerates the payloads (trips and cells) of the dates touched by the changed gold
+    `partitions` from the gold files themselves. Dates left without any partition lose
+    their payloads. Returns the paths of written payloads.
+    """
+    written, dates = [], 0
+    for date_code in dates_of(partitions):
+        payloads, found = {PAYLOAD_FILE: {}, CELLS_FILE: {}}, False
+        for type_code in TYPE_CODES:
+            part_file = Path(gold_dir) / f"type_code={type_code}" / f"date_code={date_code}" / PART_FILE
+            if part_file.exists():
+                found = True
+                df = pq.read_table(part_file, columns=PAYLOAD_COLUMNS, partitioning=None).to_pandas()
+            else:
+                df = pd.DataFrame(columns=PAYLOAD_COLUMNS)
+            payloads[PAYLOAD_FILE][type_code] = trips_payload(df)
+            payloads[CELLS_FILE][type_code] = cells_payload(df)
+        dates += found
+        for name, payload in payloads.items():
+            path = payload_path(serving_dir, date_code, name)
+            if found:
+                written.append(write_payload(payload, path))
+            elif path.exists():
+                path.unlink()
+    print(f"Serving payloads written for {dates} dates in {serving_dir}")
+    return [str(p) for p in written]
+
+
+def main():
+    """Backfills the payloads of every date in the gold manifest."""
+    gold_dir = sys.argv[1] if len(sys.argv) > 1 else load_layer_config('gold').get('path', 'trips_uber')
+    serving_dir = sys.argv[2] if len(sys.argv) > 2 else load_layer_config('serving').get('path', f"{gold_dir}_serving")
+    publish_serving_payloads(gold_dir, serving_dir, list(load_manifest(gold_dir)['partitions']))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Sharded per-region anomaly detection.
+
+Rows are partitioned by a coarse H3 parent cell (or an explicit zone column) and
+an independent AnomalyDetector is trained per shard in parallel worker processes.
+The composite routes every scoring row to the detector of its shard.
+"""
+import os
+import h3
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from .anomaly_detection import AnomalyDetector
+
+FALLBACK_SHARD = '__other__'
+
+
+def _fit_shard(shard_key: str, df_shard: pd.DataFrame, detector_kwargs: dict):
+    detector = AnomalyDetector(**detector_kwargs)
+    df_proc, X_scaled = detector.fit(df_shard, save_artifacts=False)
+    # Keep the returned detector small: the processed frame travels back separately
+    detector.df_proc_ = None
+    return shard_key, detector, df_proc, X_scaled
+
+
+class ShardedAnomalyDetector(AnomalyDetector):
+    """
+    Composite of per-region AnomalyDetectors.
+
+    Shards are H3 parents at ``shard_resolution`` of ``h3_index`` (or the values of
+    ``shard_col`` when given). Shards with fewer than ``min_shard_rows`` rows are
+    pooled into a fallback shard, which also scores rows from unseen regions.
+    """
+    def __init__(self, feature_cols: list, shard_resolution: int = 5, shard_col: str = None,
+                 min_shard_rows: int = 500, max_workers: int = None, **detector_kwargs):
+        super().__init__(feature_cols, **detector_kwargs)
+        self.shard_resolution = shard_resolution
+        self.shard_col = shard_col
+        self.min_shard_rows = min_shard_rows
+        self.max_workers = max_workers
+        self.detector_kwargs = {'feature_cols': feature_cols, **detector_kwargs, 'n_jobs': 1}
+        self.shards = {}
+        self.shard_rows = {}
+
+    def shard_keys(self, df: pd.DataFrame) -> pd.Series:
+        """Raw shard key per row (before small shards are pooled)."""
+        if self.shard_col:
+            return df[self.shard_col].astype(str)
+        # Parent lookup once per distinct cell, then broadcast through the category codes
+        cells = pd.Categorical(df['h3_index'])
+        parents = np.array([h3.cell_to_parent(cell, self.shard_resolution) for cell in cells.categories], dtype=object)
+        return pd.Series(parents[cells.codes], index=df.index)
+
+    def route(self, df: pd.DataFrame) -> pd.Series:
+        """Shard each row is scored by: its own shard if trained, else the fallback (or largest) shard."""
+        keys = self.shard_keys(df)
+        fallback = FALLBACK_SHARD if FALLBACK_SHARD in self.shards else max(self.shard_rows, key=self.shard_rows.get)
+        return keys.where(keys.isin(list(self.shards)), fallback)
+
+    def fit(self, df: pd.DataFrame, save_artifacts: bool = True):
+        keys = self.shard_keys(df)
+        counts = keys.value_counts()
+        small = counts.index[counts < self.min_shard_rows]
+        keys = keys.where(~keys.isin(small), FALLBACK_SHARD)
+        groups = list(df.groupby(keys, sort=True))
+        results = []
+        with ProcessPoolExecutor(max_workers=self.max_workers or min(len(groups), os.cpu_count() or 1)) as pool:
+            futures = [pool.submit(_fit_shard, key, df_shard, self.detector_kwargs) for key, df_shard in groups]
+            for future in futures:
+                results.append(future.result())
+        self.shards = {}
+        self.shard_rows = {}
+        curves = []
+        for shard_key, detector, df_proc, _ in results:
+            self.shards[shard_key] = detector
+            self.shard_rows[shard_key] = len(df_proc)
+            curves.append(detector.mv_em_df.assign(shard=shard_key))
+        df_proc = pd.concat([r[2].assign(shard=r[0]) for r in results]).loc[df.index]
+        X_scaled = pd.concat([r[3] for r in results]).loc[df.index]
+        # Row-weighted EM/MV over shards
+        weights = np.array([self.shard_rows[r[0]] for r in results], dtype=float)
+        self.mv_area = float(np.average([r[1].mv_area for r in results], weights=weights))
+        self.em_area = float(np.average([r[1].em_area for r in results], weights=weights))
+        self.mv_em_df = pd.concat(curves, ignore_index=True)
+        self.input_example = df.head(5)
+        self.signature = None
+        if save_artifacts:
+            self._save_shard_artifacts(df_proc)
+        self.df_proc_ = df_proc
+        return df_proc, X_scaled
+
+    def retrain_shard(self, shard_key: str, df: pd.DataFrame) -> pd.DataFrame:
+        """Refits one shard on the rows of df routed to it; the other shards are left untouched."""
+        df_shard = df[self.route(df) == shard_key]
+        if df_shard.empty:
+            raise ValueError(f"No rows for shard {shard_key}")
+        _, detector, df_proc, _ = _fit_shard(shard_key, df_shard, self.detector_kwargs)
+        self.shards[shard_key] = detector
+        self.shard_rows[shard_key] = len(df_proc)
+        return df_proc.assign(shard=shard_key)
+
+    def score(self, df: pd.DataFrame) -> pd.DataFrame:
+        if not self.shards:
+            raise ValueError("ShardedAnomalyDetector not fitted. Call fit first.")
+        routes = self.route(df)
+        scored = [self.shards[key].score(df_shard).assign(shard=key) for key, df_shard in df.groupby(routes, sort=False)]
+        return pd.concat(scored).loc[df.index]
+
+    def _save_shard_artifacts(self, df_proc: pd.DataFrame):
+        self.bundle_path = self.save_bundles(Path(self._new_artifact_dir()) / self.bundle_name)
+        self.mv_em_df.to_csv(self.curves_csv, index=False)
+        df_proc.head(100).to_csv(self.sample_csv, index=False)
+
+    def artifact_paths(self) -> list:
+        return [self.curves_csv, self.sample_csv, self.bundle_path]
+
+    def save_bundles(self, path: str) -> str:
+        """Writes one model bundle per shard into the folder `path` and returns it."""
+        for shard_key, detector in self.shards.items():
+            detector.to_bundle().save(str(Path(path) / shard_key))
+        return str(path)
+
+    @classmethod
+    def from_bundle(cls, path: str, mmap_mode: str = 'r', shard_resolution: int = 5, shard_col: str = None,
+                    shard_rows: dict = None) -> "ShardedAnomalyDetector":
+        """Scoring-only composite backed by the per-shard bundles in `path` (one folder per shard key)."""
+        shards = {p.name: AnomalyDetector.from_bundle(str(p), mmap_mode=mmap_mode)
+                  for p in sorted(Path(path).iterdir()) if p.is_dir() and not p.name.startswith('.')}
+        if not shards:
+            raise ValueError(f"No shard bundles in {path}")
+        first = next(iter(shards.values()))
+        detector = cls(feature_cols=first.feature_cols, shard_resolution=shard_resolution, shard_col=shard_col,
+                       contamination=first.contamination, use_density=first.use_density,
+                       density_neighbors=first.density_neighbors)
+        detector.shards = shards
+        detector.shard_rows = dict(shard_rows) if shard_rows else {key: 1 for key in shards}
+        detector.bundle_path = str(path)
+        return detector
@@ -0,0 +1,137 @@
+"""
+Vectorized summary engine for anomaly results.
+
+All indicators are derived from one grouped pass over the processed rows:
+per-day trip and anomaly sums, an hour-of-day count matrix (for the rush hour
+mode) and the per-day hot cell. Per-zone rows are kept per date so they can be
+upserted like the daily table; weekly and per-zone totals are rolled up from
+the per-date tables (see weekly_from_daily and zone_totals), so an incremental
+run can rebuild them over the full history.
+"""
+import h3
+import numpy as np
+import pandas as pd
+from .zone_lookup import load_zone_lookup
+
+DAILY_COLUMNS = ['date', 'sum_trips', 'sum_anomalies', 'rush_hour', 'hot_location', 'increased_demand_pct']
+WEEKLY_COLUMNS = ['week_start', 'sum_trips', 'sum_anomalies', 'rush_hour', 'hot_location', 'days']
+ZONE_DAILY_COLUMNS = ['date', 'zone', 'sum_trips', 'sum_anomalies', 'active_cells']
+ZONE_COLUMNS = ['zone', 'sum_trips', 'sum_anomalies', 'active_cells', 'anomaly_share']
+
+
+def add_demand_trend(daily: pd.DataFrame) -> pd.DataFrame:
+    """Week-over-week increase: current 7-row trip sum vs the previous row's 7-row sum."""
+    daily = daily.sort_values('date')
+    daily['trips_7d'] = daily['sum_trips'].rolling(window=7, min_periods=1).sum()
+    daily['trips_7d_prev'] = daily['trips_7d'].shift(1)
+    daily['increased_demand'] = daily['trips_7d'] - daily['trips_7d_prev']
+    daily['increased_demand_pct'] = np.where(
+        daily['trips_7d_prev'] == 0,
+        0,
+        (daily['increased_demand'] / daily['trips_7d_prev'] * 100).round(2)
+    )
+    return daily
+
+
+def weekly_from_daily(daily: pd.DataFrame) -> pd.DataFrame:
+    """
+    Weekly rollup of the daily indicators (weeks start on Monday): trip and anomaly sums,
+    number of days, the most frequent daily rush hour (earliest on ties) and the hot
+    location of the busiest day.
+    """
+    if daily.empty:
+        return pd.DataFrame(columns=WEEKLY_COLUMNS)
+    dates = pd.to_datetime(daily['date'])
+    df = daily.assign(week_start=(dates - pd.to_timedelta(dates.dt.weekday, unit='D')).dt.date)
+    grouped = df.groupby('week_start', sort=True)
+    weekly = grouped.agg(sum_trips=('sum_trips', 'sum'), sum_anomalies=('sum_anomalies', 'sum'), days=('date', 'size'))
+    weekly['rush_hour'] = grouped['rush_hour'].agg(lambda hours: hours.value_counts().sort_index().idxmax())
+    weekly['hot_location'] = df.loc[grouped['sum_trips'].idxmax()].set_index('week_start')['hot_location']
+    weekly['sum_anomalies'] = weekly['sum_anomalies'].astype(np.int64)
+    weekly['rush_hour'] = weekly['rush_hour'].astype(np.int64)
+    return weekly.reset_index()[WEEKLY_COLUMNS]
+
+
+def zone_totals(zone_daily: pd.DataFrame) -> pd.DataFrame:
+    """Per-zone totals over every date of zone_daily; active_cells is the most cells the zone had active on one day."""
+    if zone_daily.empty:
+        return pd.DataFrame(columns=ZONE_COLUMNS)
+    zone = zone_daily.groupby('zone', sort=False).agg(
+        sum_trips=('sum_trips', 'sum'), sum_anomalies=('sum_anomalies', 'sum'), active_cells=('active_cells', 'max')
+    ).reset_index()
+    zone['anomaly_share'] = np.where(zone['sum_trips'] > 0, zone['sum_anomalies'] / zone['sum_trips'].clip(lower=1), 0.0)
+    return zone.sort_values('sum_trips', ascending=False).reset_index(drop=True)[ZONE_COLUMNS]
+
+
+def _first_max_per_group(group_idx: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Position of the first maximum of `values` within each group (groups 0..n-1, all non-empty)."""
+    order = np.lexsort((-values, group_idx))
+    starts = np.r_[0, np.flatnonzero(np.diff(group_idx[order])) + 1]
+    return order[starts]
+
+
+class SummaryEngine:
+    """Builds daily, weekly, per-zone and per-date zone indicators in a single aggregation pass."""
+    def __init__(self, zone_lookup: dict = None, time_col: str = 'timestamp', value_col: str = 'value',
+                 anomaly_col: str = 'is_anomaly', hour_col: str = 'Hour', h3_col: str = 'h3_index'):
+        self.zone_lookup = zone_lookup
+        self.time_col = time_col
+        self.value_col = value_col
+        self.anomaly_col = anomaly_col
+        self.hour_col = hour_col
+        self.h3_col = h3_col
+
+    def _zones_for(self, cells: pd.Categorical) -> np.ndarray:
+        lookup = self.zone_lookup
+        if lookup is None:
+            lookup = load_zone_lookup(h3.get_resolution(cells.categories[0])) if len(cells.categories) else {}
+        return np.array([lookup.get(cell) for cell in cells.categories], dtype=object)
+
+    def build(self, df: pd.DataFrame) -> dict:
+        """Returns {'daily', 'weekly', 'zone', 'zone_daily'} summary DataFrames."""
+        if df.empty:
+            return {'daily': pd.DataFrame(columns=DAILY_COLUMNS), 'weekly': pd.DataFrame(columns=WEEKLY_COLUMNS),
+                    'zone': pd.DataFrame(columns=ZONE_COLUMNS), 'zone_daily': pd.DataFrame(columns=ZONE_DAILY_COLUMNS)}
+        # Single pass: encode rows once, then aggregate with bincount
+        ts = pd.to_datetime(df[self.time_col])
+        days, date_idx = np.unique(ts.values.astype('datetime64[D]'), return_inverse=True)
+        n_dates = len(days)
+        hours = (df[self.hour_col] if self.hour_col in df.columns else ts.dt.hour).to_numpy(dtype=np.int64)
+        values = df[self.value_col].to_numpy(dtype=np.float64)
+        anomalies = df[self.anomaly_col].to_numpy(dtype=np.int64)
+        cells = pd.Categorical(df[self.h3_col])
+        cell_zones = self._zones_for(cells)
+
+        sum_trips = np.bincount(date_idx, weights=values, minlength=n_dates)
+        sum_anomalies = np.bincount(date_idx, weights=anomalies, minlength=n_dates).astype(np.int64)
+        # Mode of hour per day from grouped counts (ties resolve to the earliest hour)
+        hour_counts = np.bincount(date_idx * 24 + hours, minlength=n_dates * 24).reshape(n_dates, 24)
+        hot_pos = _first_max_per_group(date_idx, values)
+        hot_zone = cell_zones[cells.codes[hot_pos]]
+
+        daily = pd.DataFrame({
+            'date': days.astype(object),
+            'sum_trips': sum_trips,
+            'sum_anomalies': sum_anomalies,
+            'rush_hour': hour_counts.argmax(axis=1).astype(np.int64),
+            'hot_location': hot_zone
+        })
+        daily = add_demand_trend(daily)[DAILY_COLUMNS].reset_index(drop=True)
+
+        # Per date and zone, for rows whose cell maps to a zone
+        zone_codes, zone_names = pd.factorize(cell_zones[cells.codes], use_na_sentinel=True)
+        mapped = zone_codes >= 0
+        n_zones, n_cells = len(zone_names), len(cells.categories)
+        n_keys = n_dates * n_zones
+        date_zone = date_idx[mapped].astype(np.int64) * n_zones + zone_codes[mapped]
+        # Distinct (date, zone, cell) triples give the number of active cells per date and zone
+        date_zone_cells = np.unique(date_zone * n_cells + cells.codes[mapped])
+        keys = np.flatnonzero(np.bincount(date_zone, minlength=n_keys))
+        zone_daily = pd.DataFrame({
+            'date': days.astype(object)[keys // max(n_zones, 1)],
+            'zone': np.asarray(zone_names, dtype=object)[keys % max(n_zones, 1)],
+            'sum_trips': np.bincount(date_zone, weights=values[mapped], minlength=n_keys)[keys],
+            'sum_anomalies': np.bincount(date_zone, weights=anomalies[mapped], minlength=n_keys).astype(np.int64)[keys],
+            'active_cells': np.bincount(date_zone_cells // n_cells, minlength=n_keys)[keys]
+        })
+        return {'daily': daily, 'weekly': weekly_from_daily(daily), 'zone': zone_totals(zone_daily), 'zone_daily': zone_daily}
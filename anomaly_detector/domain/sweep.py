@@ -0,0 +1,189 @@
+"""
+Parallel hyperparameter sweep ranked by Excess-Mass / Mass-Volume areas.
+
+Features are computed once per (hex_resolution, rolling_window) and cached;
+the scaled feature matrix is published in shared memory so model trials can
+fan out over a process pool without copying it into every worker.
+
+EM and MV measure the scoring function, not the decision threshold, so they
+cannot rank contamination: it only moves the offset of an already fitted
+forest, and every contamination value would get the same areas. Trials are
+therefore forests (features and forest parameters) and contamination is left
+out of the ranking. For each value of the contamination grid a trial only
+reports how many rows it would flag (``num_anomalies_<value>``); the value
+itself is chosen from the expected anomaly share, not by the sweep.
+"""
+import os
+import sys
+import time
+import itertools
+import numpy as np
+import pandas as pd
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from sklearn.ensemble import IsolationForest
+from .anomaly_detection import AnomalyDetector, Evaluator
+from .scoring import ScoringEngine
+from .services import index_and_aggregate, engineer_features, DEFAULT_MODEL_FEATURES
+from anomaly_detector.kernel import ensure_dir, load_config
+
+SWEEP_PARAMS = ['hex_resolution', 'rolling_window', 'contamination', 'n_estimators', 'max_samples']
+# Contamination is not a ranked trial parameter (see the module docstring)
+TRIAL_PARAMS = ['hex_resolution', 'rolling_window', 'n_estimators', 'max_samples']
+TRIAL_METRICS = ['em_area', 'mv_area', 'fit_seconds']
+
+# Worker-side view of the shared feature matrix (set by the pool initializer)
+_shared = {}
+
+
+def _attach_shared_matrix(name: str, shape: tuple, dtype: str):
+    # Workers only attach; the parent owns the segment and unlinks it
+    shm = shared_memory.SharedMemory(name=name)
+    _shared['shm'] = shm
+    _shared['X'] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+def anomaly_count_key(contamination: float) -> str:
+    return f"num_anomalies_{contamination:g}"
+
+
+def _run_trial(n_estimators: int, max_samples, contaminations: list, random_state: int) -> dict:
+    """
+    Fits one forest on the shared matrix and computes its EM/MV areas, plus the
+    number of training rows each contamination value would flag (a percentile
+    of the training scores, no refit).
+    """
+    X = _shared['X']
+    start = time.time()
+    model = IsolationForest(
+        n_estimators=n_estimators,
+        max_samples=max_samples,
+        random_state=random_state,
+        n_jobs=1
+    ).fit(X)
+    fit_seconds = time.time() - start
+    engine = ScoringEngine(model, n_jobs=1)
+    raw_scores = engine.score_samples(X)
+    _, mv_area, em_area = Evaluator().evaluate(engine, X, raw_scores - np.float32(model.offset_), random_state=random_state)
+    result = {
+        'n_estimators': n_estimators,
+        'max_samples': max_samples,
+        'em_area': float(em_area),
+        'mv_area': float(mv_area),
+        'fit_seconds': fit_seconds
+    }
+    for contamination in contaminations:
+        offset = np.percentile(raw_scores, 100.0 * contamination)
+        result[anomaly_count_key(contamination)] = int((raw_scores < offset).sum())
+    return result
+
+
+class FeatureCache:
+    """Feature frames keyed by (hex_resolution, rolling_window), optionally persisted as parquet."""
+    def __init__(self, raw_df: pd.DataFrame, cache_dir: str = None):
+        self.raw_df = raw_df
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self._aggregated = {}
+        self._features = {}
+
+    def get(self, hex_resolution: int, rolling_window: int) -> pd.DataFrame:
+        key = (hex_resolution, rolling_window)
+        if key in self._features:
+            return self._features[key]
+        path = self.cache_dir / f"features_r{hex_resolution}_w{rolling_window}.parquet" if self.cache_dir else None
+        if path is not None and path.exists():
+            df_feat = pd.read_parquet(path)
+        else:
+            # Ingestion + H3 indexing are shared by every window at the same resolution
+            if hex_resolution not in self._aggregated:
+                self._aggregated[hex_resolution] = index_and_aggregate(self.raw_df, hex_resolution=hex_resolution)
+            df_feat = engineer_features(self._aggregated[hex_resolution], rolling_window=rolling_window)
+            if path is not None:
+                ensure_dir(path)
+                df_feat.to_parquet(path, index=False)
+        self._features[key] = df_feat
+        return df_feat
+
+
+def load_sweep_grid(config_path: str = None) -> dict:
+    """Reads the `sweep` grid from train.yaml, falling back to the single `model` values."""
+    train_config = load_config("train.yaml", config_path)
+    model_cfg = train_config.get("model", {})
+    grid = train_config.get("sweep", {})
+    defaults = {'hex_resolution': 7, 'rolling_window': 168, 'contamination': 0.22, 'n_estimators': 50, 'max_samples': 0.25}
+    return {p: list(grid.get(p, [model_cfg.get(p, defaults[p])])) for p in SWEEP_PARAMS}
+
+
+def rank_trials(trials: pd.DataFrame) -> pd.DataFrame:
+    """Best forests first: highest EM area, then lowest MV area."""
+    ranked = trials.sort_values(['em_area', 'mv_area'], ascending=[False, True]).reset_index(drop=True)
+    ranked.insert(0, 'rank', np.arange(1, len(ranked) + 1))
+    return ranked
+
+
+def run_sweep(raw_df: pd.DataFrame, grid: dict = None, model_features=None, max_workers: int = None,
+              cache_dir: str = None, random_state: int = 42, ml_adapter=None, log_to_mlflow: bool = True) -> pd.DataFrame:
+    """
+    Runs the full grid and returns one ranked row per forest (contamination is not ranked,
+    only its anomaly counts are reported). Trials are logged as nested MLflow runs under a single sweep run unless log_to_mlflow is False.
+    """
+    grid = {**load_sweep_grid(), **{k: v if isinstance(v, (list, tuple)) else [v] for k, v in (grid or {}).items()}}
+    if model_features is None:
+        model_features = list(DEFAULT_MODEL_FEATURES)
+    cache = FeatureCache(raw_df, cache_dir=cache_dir)
+    model_grid = list(itertools.product(grid['n_estimators'], grid['max_samples']))
+    trials = []
+    for hex_resolution, rolling_window in itertools.product(grid['hex_resolution'], grid['rolling_window']):
+        df_feat = cache.get(hex_resolution, rolling_window)
+        ad = AnomalyDetector(feature_cols=model_features, random_state=random_state)
+        _, X_scaled = ad.prepare_features(df_feat)
+        X = np.ascontiguousarray(X_scaled.to_numpy(dtype=np.float64))
+        shm = shared_memory.SharedMemory(create=True, size=max(X.nbytes, 1))
+        try:
+            np.ndarray(X.shape, dtype=X.dtype, buffer=shm.buf)[:] = X
+            with ProcessPoolExecutor(
+                max_workers=max_workers or min(len(model_grid), os.cpu_count() or 1),
+                initializer=_attach_shared_matrix,
+                initargs=(shm.name, X.shape, X.dtype.str)
+            ) as pool:
+                futures = [
+                    pool.submit(_run_trial, n_estimators, max_samples, list(grid['contamination']), random_state)
+                    for n_estimators, max_samples in model_grid
+                ]
+                for future in futures:
+                    trials.append({'hex_resolution': hex_resolution, 'rolling_window': rolling_window, **future.result()})
+        finally:
+            shm.close()
+            shm.unlink()
+    count_keys = [anomaly_count_key(c) for c in grid['contamination']]
+    ranked = rank_trials(pd.DataFrame(trials, columns=TRIAL_PARAMS + TRIAL_METRICS + count_keys))
+    if log_to_mlflow:
+        ml_adapter = ml_adapter or _default_ml_adapter()
+        ml_adapter.log_sweep(ranked.to_dict(orient='records'), params={'model_features': model_features, **grid},
+                             metric_keys=['rank'] + TRIAL_METRICS + count_keys)
+    return ranked
+
+
+def _default_ml_adapter():
+    from anomaly_detector.adapters.ml_adapter import MLflowAdapter
+    train_config = load_config("train.yaml")
+    return MLflowAdapter(
+        experiment_name=train_config.get("mlflow_experiment", "Uber_Anomaly_Detection_NY_City_Trips"),
+        tracking_uri=train_config.get("mlflow_tracking_uri", None)
+    )
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python -m anomaly_detector.domain.sweep <data_dir>")
+        sys.exit(1)
+    from .data_loader import extract_and_concat_uber_csvs
+    df = extract_and_concat_uber_csvs(sys.argv[1])
+    print(f"Loaded {len(df)} rows. Running hyperparameter sweep...")
+    ranked = run_sweep(df)
+    print(ranked.head(10).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
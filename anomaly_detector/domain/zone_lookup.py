@@ -0,0 +1,92 @@
+"""
+Precomputed H3 cell -> NYC taxi zone lookup.
+
+Built once from a local taxi zones GeoJSON: every H3 cell whose centroid falls
+inside a zone polygon is mapped to that zone (the same rule as a spatial
+``within`` join of cell centroids). The table is persisted as a small parquet
+file and loaded once per process.
+"""
+import sys
+import json
+import h3
+import pandas as pd
+import requests
+from functools import lru_cache
+from pathlib import Path
+from anomaly_detector.kernel import ensure_dir
+
+TAXI_ZONES_URL = "https://data.cityofnewyork.us/resource/8meu-9t5y.geojson"
+DEFAULT_ZONES_PATH = Path("resources") / "taxi_zones.geojson"
+
+
+def default_lookup_path(resolution: int) -> Path:
+    return Path("resources") / f"h3_zone_lookup_r{resolution}.parquet"
+
+
+def ensure_taxi_zones(geojson_path=DEFAULT_ZONES_PATH) -> Path:
+    """Downloads NYC Taxi Zones GeoJSON if missing, empty or corrupt."""
+    geojson_path = Path(geojson_path)
+    ensure_dir(geojson_path)
+    need_download = not geojson_path.exists() or geojson_path.stat().st_size < 1000
+    if not need_download:
+        try:
+            with open(geojson_path, "r") as f:
+                need_download = not json.load(f).get("features")
+        except Exception:
+            need_download = True
+    if need_download:
+        print(f"Downloading {TAXI_ZONES_URL} to {geojson_path} ...")
+        resp = requests.get(TAXI_ZONES_URL)
+        resp.raise_for_status()
+        with open(geojson_path, "wb") as f:
+            f.write(resp.content)
+        print("Download complete.")
+    return geojson_path
+
+
+def build_zone_lookup(resolution: int, zones_path=DEFAULT_ZONES_PATH, out_path=None) -> pd.DataFrame:
+    """Maps every H3 cell at `resolution` with its centroid inside a taxi zone to that zone and saves it."""
+    zones_path = ensure_taxi_zones(zones_path)
+    with open(zones_path, "r") as f:
+        features = json.load(f)["features"]
+    cells, zones = [], []
+    for feature in features:
+        geometry = feature.get("geometry")
+        zone = (feature.get("properties") or {}).get("zone")
+        if not geometry or zone is None:
+            continue
+        for cell in h3.geo_to_cells(geometry, resolution):
+            cells.append(cell)
+            zones.append(zone)
+    lookup = pd.DataFrame({'h3_index': cells, 'zone': zones}).drop_duplicates('h3_index')
+    lookup['zone'] = lookup['zone'].astype('category')
+    out_path = Path(out_path) if out_path else default_lookup_path(resolution)
+    ensure_dir(out_path)
+    lookup.to_parquet(out_path, index=False, compression='zstd')
+    print(f"Zone lookup with {len(lookup)} cells saved to {out_path}")
+    return lookup
+
+
+@lru_cache(maxsize=None)
+def load_zone_lookup(resolution: int, lookup_path: str = None, zones_path: str = None) -> dict:
+    """Returns {h3_index: zone}, building the parquet lookup first if it does not exist yet."""
+    path = Path(lookup_path) if lookup_path else default_lookup_path(resolution)
+    if path.exists():
+        lookup = pd.read_parquet(path)
+    else:
+        lookup = build_zone_lookup(resolution, zones_path=zones_path or DEFAULT_ZONES_PATH, out_path=path)
+    return dict(zip(lookup['h3_index'], lookup['zone'].astype(str)))
+
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python -m anomaly_detector.domain.zone_lookup <resolution> [zones_geojson] [out_parquet]")
+        sys.exit(1)
+    resolution = int(sys.argv[1])
+    zones_path = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_ZONES_PATH
+    out_path = sys.argv[3] if len(sys.argv) > 3 else None
+    build_zone_lookup(resolution, zones_path=zones_path, out_path=out_path)
+
+
+if __name__ == "__main__":
+    main()
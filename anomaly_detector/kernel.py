@@ -1,5 +1,10 @@
+import yaml
+import logging
 from pathlib import Path
 
+CONFIG_DIR = Path(__file__).parent / "config"
+logger = logging.getLogger(__name__)
+
 
 def ensure_dir(path: Path):
     """Ensure a directory exists. If path is a file, ensure its parent exists."""
@@ -7,3 +12,19 @@ def ensure_dir(path: Path):
         path = path.parent
     if path and not path.exists():
         path.mkdir(parents=True, exist_ok=True)
+
+
+def load_config(name: str, config_path: str = None, required: bool = False) -> dict:
+    """
+    Reads a YAML file from the tracked config/ folder (or config_path).
+    A missing file raises with required=True; otherwise it is logged and {} is returned
+    so the built-in defaults apply.
+    """
+    path = Path(config_path) if config_path else CONFIG_DIR / name
+    if not path.exists():
+        if required:
+            raise FileNotFoundError(f"Config file not found: {path}")
+        logger.warning("Config file %s not found, using built-in defaults", path)
+        return {}
+    with open(path, "r") as f:
+        return yaml.safe_load(f) or {}
@@ -0,0 +1,36 @@
+"""
+Shared fixtures: small synthetic inputs so the suite runs offline in seconds.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import IsolationForest
+
+
+@pytest.fixture
+def features() -> pd.DataFrame:
+    """Scaled-looking feature matrix with a few obvious outliers."""
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(3000, 4))
+    X[:30] += 6
+    return pd.DataFrame(X, columns=['value', 'Lag', 'hour_sin', 'hour_cos'])
+
+
+@pytest.fixture
+def forest(features) -> IsolationForest:
+    return IsolationForest(n_estimators=25, max_samples=256, contamination=0.05, random_state=0).fit(features)
+
+
+def raw_trips(n: int = 20000, days: int = 7, seed: int = 0) -> pd.DataFrame:
+    """Uber-style raw pickups ('Date/Time', 'Lat', 'Lon') around Manhattan."""
+    rng = np.random.default_rng(seed)
+    ts = pd.Timestamp('2014-04-01') + pd.to_timedelta(rng.integers(0, days * 24 * 3600, n), unit='s')
+    return pd.DataFrame({'Date/Time': ts, 'Lat': 40.75 + rng.normal(0, 0.03, n),
+                         'Lon': -73.98 + rng.normal(0, 0.03, n), 'Base': 'B02512'})
+
+
+@pytest.fixture
+def hourly_features() -> pd.DataFrame:
+    """Feature-engineered hourly H3 aggregates, as the model stage receives them."""
+    from anomaly_detector.domain.services import index_and_aggregate, engineer_features
+    return engineer_features(index_and_aggregate(raw_trips()), rolling_window=24)
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from anomaly_detector.domain.compiled_forest import CompiledForest, average_path_length
+
+
+def test_scores_match_sklearn(features, forest):
+    compiled = CompiledForest.from_isolation_forest(forest, feature_names=list(features.columns))
+    np.testing.assert_allclose(compiled.score_samples(features), forest.score_samples(features), rtol=1e-10)
+    np.testing.assert_allclose(compiled.decision_function(features), forest.decision_function(features), rtol=1e-10, atol=1e-12)
+    np.testing.assert_array_equal(compiled.predict(features), forest.predict(features))
+
+
+def test_depths_match_the_trees(forest):
+    compiled = CompiledForest.from_isolation_forest(forest)
+    assert compiled.max_depth == max(estimator.get_depth() for estimator in forest.estimators_)
+    tree = forest.estimators_[0].tree_
+    leaves = np.flatnonzero(tree.children_left == -1)
+    # Leaf path length minus the c(n) correction is the leaf depth
+    depths = compiled.path_length[leaves] - average_path_length(tree.n_node_samples[leaves])
+    node_depths = {}
+    stack = [(0, 0)]
+    while stack:
+        node, depth = stack.pop()
+        node_depths[node] = depth
+        if tree.children_left[node] != -1:
+            stack += [(tree.children_left[node], depth + 1), (tree.children_right[node], depth + 1)]
+    np.testing.assert_allclose(depths, [node_depths[leaf] for leaf in leaves])
+
+
+def test_columns_are_selected_by_name(features, forest):
+    compiled = CompiledForest.from_isolation_forest(forest, feature_names=list(features.columns))
+    shuffled = features[list(reversed(features.columns))]
+    np.testing.assert_array_equal(compiled.score_samples(shuffled), compiled.score_samples(features))
+
+
+def test_save_and_memory_mapped_load(tmp_path, features, forest):
+    compiled = CompiledForest.from_isolation_forest(forest, feature_names=list(features.columns))
+    loaded = CompiledForest.load(compiled.save(str(tmp_path / "forest")))
+    assert isinstance(loaded.feature, np.memmap)
+    np.testing.assert_array_equal(loaded.score_samples(features), compiled.score_samples(features))
+
+
+def test_concat_averages_over_all_trees(features, forest):
+    compiled = CompiledForest.from_isolation_forest(forest, feature_names=list(features.columns))
+    merged = CompiledForest.concat([compiled, compiled])
+    assert merged.n_trees == 2 * compiled.n_trees
+    np.testing.assert_allclose(merged.score_samples(features), compiled.score_samples(features), rtol=1e-12)
+
+
+def test_rejects_wrong_feature_count(forest):
+    compiled = CompiledForest.from_isolation_forest(forest)
+    with pytest.raises(ValueError):
+        compiled.score_samples(np.zeros((2, 3)))
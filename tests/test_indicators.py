@@ -0,0 +1,64 @@
+import datetime
+import numpy as np
+import pandas as pd
+from anomaly_detector.domain.indicators import (
+    update_indicators_file, upsert_indicators, verify_indicators, update_table_file, load_indicators
+)
+from anomaly_detector.domain.summary import add_demand_trend, weekly_from_daily, DAILY_COLUMNS
+
+
+def daily_rows(start: int, n: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'date': [datetime.date(2014, 4, 1) + datetime.timedelta(days=start + i) for i in range(n)],
+        'sum_trips': rng.integers(1000, 5000, n).astype(float),
+        'sum_anomalies': rng.integers(0, 300, n),
+        'rush_hour': rng.integers(0, 24, n),
+        'hot_location': [f"Zone {i % 4}" for i in range(start, start + n)]
+    })
+
+
+def full_recompute(daily: pd.DataFrame) -> pd.DataFrame:
+    return add_demand_trend(daily.sort_values('date').reset_index(drop=True))[DAILY_COLUMNS]
+
+
+def test_incremental_batches_equal_a_full_recompute(tmp_path):
+    path = tmp_path / "indicators.parquet"
+    first, second = daily_rows(0, 20), daily_rows(15, 20, seed=1)
+    update_indicators_file(path, first)
+    indicators, changed = update_indicators_file(path, second)
+    # The overlap is replaced by the newer batch
+    expected = full_recompute(pd.concat([first[~first['date'].isin(second['date'])], second]))
+    pd.testing.assert_frame_equal(indicators.reset_index(drop=True), expected, check_dtype=False)
+    pd.testing.assert_frame_equal(load_indicators(path).reset_index(drop=True), expected, check_dtype=False)
+    assert verify_indicators(indicators)
+    assert len(changed) == len(second)
+
+
+def test_unchanged_rows_do_not_rewrite_the_file(tmp_path):
+    path = tmp_path / "indicators.parquet"
+    update_indicators_file(path, daily_rows(0, 10))
+    mtime = path.stat().st_mtime_ns
+    _, changed = update_indicators_file(path, daily_rows(0, 10).iloc[3:6])
+    assert changed.empty
+    assert path.stat().st_mtime_ns == mtime
+
+
+def test_one_changed_date_only_touches_its_trend_window():
+    existing, _ = upsert_indicators(pd.DataFrame(), daily_rows(0, 30))
+    edited = existing.iloc[[10]].copy()
+    edited['sum_trips'] += 500
+    updated, changed = upsert_indicators(existing, edited)
+    assert list(changed) == [existing['date'][10]]
+    moved = ~np.isclose(updated['increased_demand_pct'], existing['increased_demand_pct'], equal_nan=True)
+    assert set(np.flatnonzero(moved)) <= set(range(10, 18))
+    assert verify_indicators(updated)
+
+
+def test_weekly_table_follows_the_full_daily_table(tmp_path):
+    path = tmp_path / "indicators_weekly.parquet"
+    daily = full_recompute(daily_rows(0, 28))
+    update_table_file(path, weekly_from_daily(daily.iloc[:14]), list(weekly_from_daily(daily).columns), key='week_start')
+    table = update_table_file(path, weekly_from_daily(daily), list(weekly_from_daily(daily).columns), key='week_start')
+    pd.testing.assert_frame_equal(table, weekly_from_daily(daily).reset_index(drop=True), check_dtype=False)
+    assert not any(p.name.endswith('.tmp') for p in tmp_path.iterdir())
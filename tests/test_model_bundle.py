@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+from anomaly_detector.domain.anomaly_detection import AnomalyDetector
+from anomaly_detector.domain.model_bundle import ModelBundle
+from anomaly_detector.domain.services import DEFAULT_MODEL_FEATURES
+from anomaly_detector.domain.sharding import ShardedAnomalyDetector
+
+
+def assert_same_scores(left: pd.DataFrame, right: pd.DataFrame):
+    np.testing.assert_allclose(left['anomaly_score'].to_numpy(), right['anomaly_score'].to_numpy(), rtol=1e-12)
+    assert (left['is_anomaly'].to_numpy() == right['is_anomaly'].to_numpy()).all()
+
+
+def test_bundle_round_trip_scores_like_the_fitted_detector(hourly_features, tmp_path):
+    ad = AnomalyDetector(feature_cols=DEFAULT_MODEL_FEATURES, n_estimators=30, max_samples=0.5)
+    ad.fit(hourly_features, save_artifacts=False)
+    path = ad.save_bundle(str(tmp_path / "model_bundle"))
+
+    restored = AnomalyDetector.from_bundle(path)
+    assert restored.model is None
+    assert isinstance(restored.compiled_forest.feature, np.memmap)
+    assert restored.features_ == ad.features_
+    assert_same_scores(restored.score(hourly_features), ad.score(hourly_features))
+
+
+def test_bundle_keeps_the_preprocessing_state(hourly_features, tmp_path):
+    ad = AnomalyDetector(feature_cols=DEFAULT_MODEL_FEATURES, n_estimators=10, use_density=False)
+    ad.fit(hourly_features, save_artifacts=False)
+    bundle = ModelBundle.load(ad.save_bundle(str(tmp_path / "model_bundle")), mmap_mode=None)
+    np.testing.assert_array_equal(bundle.scaler.mean_, ad.scaler.mean_)
+    np.testing.assert_array_equal(bundle.scaler.scale_, ad.scaler.scale_)
+    assert bundle.params['use_density'] is False
+    assert bundle.spatial_preprocessor().mean_lat == ad.spatial_preprocessor.mean_lat
+
+
+def test_sharded_bundles_round_trip(hourly_features, tmp_path):
+    ad = ShardedAnomalyDetector(DEFAULT_MODEL_FEATURES, shard_resolution=6, min_shard_rows=200, max_workers=2,
+                                n_estimators=10, max_samples=0.5)
+    ad.fit(hourly_features, save_artifacts=False)
+    path = ad.save_bundles(str(tmp_path / "model_bundle"))
+
+    restored = ShardedAnomalyDetector.from_bundle(path, shard_resolution=6, shard_rows=ad.shard_rows)
+    assert sorted(restored.shards) == sorted(ad.shards)
+    scored, expected = restored.score(hourly_features), ad.score(hourly_features)
+    assert (scored['shard'] == expected['shard']).all()
+    assert_same_scores(scored, expected)
+
+
+def test_sharded_bundle_folder_must_not_be_empty(tmp_path):
+    with pytest.raises(ValueError):
+        ShardedAnomalyDetector.from_bundle(str(tmp_path))
@@ -0,0 +1,111 @@
+import os
+import json
+import shutil
+import numpy as np
+import mlflow
+import mlflow.pyfunc
+import mlflow.sklearn
+import pytest
+from sklearn.ensemble import IsolationForest
+from anomaly_detector.adapters import model_cache
+from anomaly_detector.adapters.ml_adapter import BundleModelWrapper
+from anomaly_detector.adapters.model_cache import CHECKSUMS_FILE, MODEL_DIR, ModelCache
+from anomaly_detector.domain.anomaly_detection import AnomalyDetector
+from anomaly_detector.domain.services import DEFAULT_MODEL_FEATURES
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    """
+    Stubbed tracking store: download_artifacts copies the model folder saved at
+    registry['source'] and counts its calls in registry['downloads'].
+    """
+    registry = {'source': tmp_path / "registry" / "model", 'downloads': []}
+    # Keep MLflow's default file store out of the working directory
+    monkeypatch.setenv("MLFLOW_TRACKING_URI", (tmp_path / "mlruns").as_uri())
+
+    def download_artifacts(artifact_uri, dst_path):
+        registry['downloads'].append(artifact_uri)
+        return shutil.copytree(registry['source'], f"{dst_path}/model")
+
+    monkeypatch.setattr(mlflow.artifacts, "download_artifacts", download_artifacts)
+    return registry
+
+
+@pytest.fixture
+def sklearn_model(registry, features):
+    mlflow.sklearn.save_model(IsolationForest(n_estimators=5, random_state=0).fit(features), str(registry['source']),
+                              pip_requirements=[])
+    return registry
+
+
+def test_second_process_loads_from_disk(sklearn_model, tmp_path):
+    ModelCache(tmp_path / "cache").get("detector", 1, run_id="abc")
+    loaded = ModelCache(tmp_path / "cache").get("detector", 1, run_id="abc")
+    assert sklearn_model['downloads'] == ["runs:/abc/model"]
+    assert isinstance(loaded['model'], IsolationForest)
+    assert loaded['compiled_forest'] is None
+
+
+def test_unchanged_files_are_not_rehashed_on_load(sklearn_model, tmp_path, monkeypatch):
+    ModelCache(tmp_path / "cache").get("detector", 1, run_id="abc")
+    hashed = []
+    sha256 = model_cache._sha256
+    monkeypatch.setattr(model_cache, "_sha256", lambda path: hashed.append(path) or sha256(path))
+    ModelCache(tmp_path / "cache").get("detector", 1, run_id="abc")
+    assert hashed == []
+
+    # Touched but identical: hashed once, then trusted again
+    cache = ModelCache(tmp_path / "cache")
+    os.utime(cache.entry_dir("detector", 1) / MODEL_DIR / "model.pkl")
+    assert cache._verify(cache.entry_dir("detector", 1))
+    assert cache._verify(cache.entry_dir("detector", 1))
+    assert [path.name for path in hashed] == ["model.pkl"]
+
+
+def test_corrupted_file_is_refetched(sklearn_model, tmp_path):
+    cache = ModelCache(tmp_path / "cache")
+    entry = cache.entry_dir("detector", 1)
+    cache.get("detector", 1, run_id="abc")
+    checksums = json.loads((entry / CHECKSUMS_FILE).read_text())
+    assert set(checksums[f"{MODEL_DIR}/model.pkl"]) == {'sha256', 'size', 'mtime_ns'}
+
+    path = entry / MODEL_DIR / "model.pkl"
+    mtime_ns = path.stat().st_mtime_ns
+    with open(path, "r+b") as f:
+        f.write(b"\0\0\0\0")
+    # Same size; the write moves the mtime (forced here, the clock may not have ticked)
+    os.utime(path, ns=(mtime_ns + 10**9, mtime_ns + 10**9))
+    assert not cache._verify(entry)
+    loaded = ModelCache(tmp_path / "cache").get("detector", 1, run_id="abc")
+    assert len(sklearn_model['downloads']) == 2
+    assert cache._verify(entry)
+    assert isinstance(loaded['model'], IsolationForest)
+
+
+def test_bundle_models_load_memory_mapped(registry, hourly_features, tmp_path):
+    ad = AnomalyDetector(feature_cols=DEFAULT_MODEL_FEATURES, n_estimators=10)
+    ad.fit(hourly_features, save_artifacts=False)
+    bundle_path = ad.save_bundle(str(tmp_path / "model_bundle"))
+    mlflow.pyfunc.save_model(str(registry['source']), python_model=BundleModelWrapper(), artifacts={'bundle': bundle_path},
+                             pip_requirements=[])
+
+    ModelCache(tmp_path / "cache").get("detector", 1, run_id="abc")
+    loaded = ModelCache(tmp_path / "cache").get("detector", 1, run_id="abc")
+    assert len(registry['downloads']) == 1
+    assert isinstance(loaded['compiled_forest'].feature, np.memmap)
+    assert str(tmp_path / "cache") in str(loaded['compiled_forest'].feature.filename)
+    np.testing.assert_array_equal(loaded['scaler'].mean_, ad.scaler.mean_)
+    np.testing.assert_array_equal(loaded['scaler'].scale_, ad.scaler.scale_)
+    assert loaded['spatial_preprocessor'].mean_lat == ad.spatial_preprocessor.mean_lat
+    np.testing.assert_array_equal(loaded['spatial_preprocessor'].scaler.mean_, ad.spatial_preprocessor.scaler.mean_)
+    X = ad.prepare_features(hourly_features.head(100), fit=False)[1]
+    np.testing.assert_allclose(loaded['compiled_forest'].score_samples(X), ad.compiled_forest.score_samples(X))
+
+
+def test_least_recently_used_version_is_evicted(sklearn_model, tmp_path):
+    cache = ModelCache(tmp_path / "cache", max_bytes=1)
+    cache.get("detector", 1, run_id="abc")
+    cache.get("detector", 2, run_id="def")
+    assert not cache.entry_dir("detector", 1).exists()
+    assert cache.entry_dir("detector", 2).exists()
@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+from anomaly_detector.domain.parquet_writer import (
+    PartitionedParquetWriter, load_layer_config, load_manifest, partition_codes, MANIFEST_FILE, PART_FILE
+)
+
+
+def scored_rows(days: int = 3, cells: int = 50, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    hours = pd.date_range('2014-04-01', periods=days * 24, freq='h')
+    df = pd.DataFrame({
+        'timestamp': np.repeat(hours, cells),
+        'h3_index': np.tile([f"882a1072{i:07x}" for i in range(cells)], len(hours)),
+        'value': rng.integers(1, 50, len(hours) * cells),
+        'anomaly_score': rng.normal(size=len(hours) * cells)
+    })
+    df['is_anomaly'] = (df['anomaly_score'] < -1.5).astype(int)
+    # Shuffled like the scored frame, the writer sorts
+    return df.sample(frac=1.0, random_state=seed).reset_index(drop=True)
+
+
+def write(writer: PartitionedParquetWriter, df: pd.DataFrame, base_dir) -> list:
+    return writer.write(df, str(base_dir), codes=partition_codes(df))
+
+
+def test_partitions_are_sorted_with_statistics(tmp_path):
+    writer = PartitionedParquetWriter(row_group_size=1000)
+    write(writer, scored_rows(), tmp_path)
+    path = tmp_path / "type_code=non_anomalous" / "date_code=2014-04-02" / PART_FILE
+    table = pq.read_table(path, partitioning=None).to_pandas()
+    assert table.equals(table.sort_values(['timestamp', 'h3_index']).reset_index(drop=True))
+    metadata = pq.ParquetFile(path).metadata
+    assert metadata.num_row_groups > 1
+    assert all(metadata.row_group(i).num_rows <= 1000 for i in range(metadata.num_row_groups))
+    column = metadata.row_group(0).column(table.columns.get_loc('timestamp'))
+    assert column.is_stats_set and column.compression == 'ZSTD'
+
+
+def test_compaction_merges_files_into_one_sorted_part(tmp_path):
+    writer = PartitionedParquetWriter()
+    part_dir = tmp_path / "type_code=anomalous" / "date_code=2014-04-01"
+    df = scored_rows(days=1).drop(columns='is_anomaly')
+    part_dir.mkdir(parents=True)
+    for i, start in enumerate(range(0, len(df), len(df) // 3 + 1)):
+        df.iloc[start:start + len(df) // 3 + 1].to_parquet(part_dir / f"part-{i + 10}.parquet", index=False)
+    assert writer.compact(str(tmp_path)) == [part_dir]
+    assert [p.name for p in part_dir.glob("*.parquet")] == [PART_FILE]
+    assert load_manifest(tmp_path)['partitions']["type_code=anomalous/date_code=2014-04-01"]['rows'] == len(df)
+
+
+def test_layer_config_comes_from_the_tracked_config():
+    gold = load_layer_config('gold')
+    assert gold['partition_cols'] == ['type_code', 'date_code']
+    assert gold['writer']['compression'] == 'zstd'
+
+
+def test_missing_layer_config_file_raises(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        load_layer_config('gold', config_path=str(tmp_path / "missing.yaml"))
+
+
+def file_states(base_dir) -> dict:
+    return {p.relative_to(base_dir).as_posix(): p.stat().st_mtime_ns for p in base_dir.rglob("*.parquet")}
+
+
+def test_upsert_rewrites_only_changed_partitions_and_the_manifest(tmp_path):
+    writer = PartitionedParquetWriter()
+    df = scored_rows()
+    assert len(write(writer, df, tmp_path)) == 6
+    before, manifest_before = file_states(tmp_path), load_manifest(tmp_path)
+
+    # Same rows again: nothing is rewritten
+    assert write(writer, df.sample(frac=1.0, random_state=1), tmp_path) == []
+    assert file_states(tmp_path) == before
+
+    # One value changes on April 2nd
+    changed_day = df.copy()
+    row = changed_day.index[(changed_day['timestamp'].dt.day == 2) & (changed_day['is_anomaly'] == 0)][0]
+    changed_day.loc[row, 'value'] += 1000
+    assert write(writer, changed_day, tmp_path) == ["type_code=non_anomalous/date_code=2014-04-02"]
+    after, manifest_after = file_states(tmp_path), load_manifest(tmp_path)
+    assert [k for k in after if after[k] != before[k]] == ["type_code=non_anomalous/date_code=2014-04-02/part-0.parquet"]
+    moved = [k for k in manifest_after['partitions']
+             if manifest_after['partitions'][k] != manifest_before['partitions'][k]]
+    assert moved == ["type_code=non_anomalous/date_code=2014-04-02"]
+
+
+def test_partitions_dropped_from_a_rewritten_date_are_removed(tmp_path):
+    writer = PartitionedParquetWriter()
+    df = scored_rows()
+    write(writer, df, tmp_path)
+    # April 3rd comes back without anomalies
+    day3 = df[df['timestamp'].dt.day == 3].assign(is_anomaly=0)
+    changed = write(writer, day3, tmp_path)
+    assert "type_code=anomalous/date_code=2014-04-03" in changed
+    assert not (tmp_path / "type_code=anomalous" / "date_code=2014-04-03").exists()
+    partitions = load_manifest(tmp_path)['partitions']
+    assert "type_code=anomalous/date_code=2014-04-03" not in partitions
+    assert "type_code=anomalous/date_code=2014-04-01" in partitions
+    assert (tmp_path / MANIFEST_FILE).exists()
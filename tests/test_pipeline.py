@@ -0,0 +1,97 @@
+import json
+import pandas as pd
+import pytest
+from anomaly_detector.domain.pipeline import Stage, StageCache, PipelineExecutor
+
+
+def counting_stages(calls: list) -> list:
+    """source -> (scaled -> report) and source -> total; 'factor' only feeds scaled."""
+    def run(name, func):
+        def stage(params, **inputs):
+            calls.append(name)
+            return func(params, **inputs)
+        return stage
+    return [
+        Stage('source', run('source', lambda params: pd.DataFrame({'x': range(params['n'])})),
+              params=['n'], cache='parquet'),
+        Stage('scaled', run('scaled', lambda params, source: source.assign(x=source['x'] * params['factor'])),
+              deps=['source'], params=['factor'], cache='parquet'),
+        Stage('report', run('report', lambda params, scaled: {'sum': int(scaled['x'].sum())}),
+              deps=['scaled'], cache='json'),
+        Stage('total', run('total', lambda params, source: {'rows': len(source)}), deps=['source'], cache='json')
+    ]
+
+
+def run(tmp_path, params, calls, **kwargs) -> dict:
+    executor = PipelineExecutor(counting_stages(calls), cache=StageCache(tmp_path / "cache"), **kwargs)
+    return executor.run(params)
+
+
+def test_parameter_change_only_reruns_downstream_stages(tmp_path):
+    calls = []
+    assert run(tmp_path, {'n': 10, 'factor': 2}, calls)['report'] == {'sum': 90}
+    assert sorted(calls) == ['report', 'scaled', 'source', 'total']
+
+    calls.clear()
+    outputs = run(tmp_path, {'n': 10, 'factor': 3}, calls)
+    assert sorted(calls) == ['report', 'scaled']
+    assert outputs['report'] == {'sum': 135}
+    assert outputs['total'] == {'rows': 10}
+
+    calls.clear()
+    run(tmp_path, {'n': 10, 'factor': 3}, calls)
+    assert calls == []
+
+
+def test_upstream_change_invalidates_every_dependent(tmp_path):
+    calls = []
+    run(tmp_path, {'n': 10, 'factor': 2}, calls)
+    calls.clear()
+    run(tmp_path, {'n': 11, 'factor': 2}, calls)
+    assert sorted(calls) == ['report', 'scaled', 'source', 'total']
+
+
+def test_forced_stage_reruns_with_its_dependents(tmp_path):
+    calls = []
+    run(tmp_path, {'n': 10, 'factor': 2}, calls)
+    calls.clear()
+    executor = PipelineExecutor(counting_stages(calls), cache=StageCache(tmp_path / "cache"))
+    executor.run({'n': 10, 'factor': 2}, force=['scaled'])
+    assert sorted(calls) == ['report', 'scaled']
+
+
+def test_without_cache_everything_runs_and_nothing_is_written(tmp_path):
+    calls = []
+    run(tmp_path, {'n': 10, 'factor': 2}, calls, use_cache=False)
+    run(tmp_path, {'n': 10, 'factor': 2}, calls, use_cache=False)
+    assert len(calls) == 8
+    assert not (tmp_path / "cache").exists()
+
+
+def test_folder_cache_uses_dump_and_restore(tmp_path):
+    def dump(value, folder):
+        (folder / "value.json").write_text(json.dumps(value))
+
+    def restore(folder):
+        return {**json.loads((folder / "value.json").read_text()), 'restored_from': folder.name}
+
+    stages = [Stage('model', lambda params: {'n': params['n']}, params=['n'], cache='dir', dump=dump, restore=restore),
+              Stage('use', lambda params, model: model, deps=['model'], params=['tag'])]
+    cache = StageCache(tmp_path / "cache")
+    first = PipelineExecutor(stages, cache=cache).run({'n': 3, 'tag': 1})
+    second = PipelineExecutor(stages, cache=cache).run({'n': 3, 'tag': 2})
+    assert first['use'] == {'n': 3}
+    assert second['use']['n'] == 3 and (tmp_path / "cache" / "model" / second['use']['restored_from']).is_dir()
+
+
+def test_folder_cache_needs_dump_and_restore():
+    with pytest.raises(ValueError):
+        Stage('model', lambda params: None, cache='dir')
+
+
+def test_only_the_latest_fingerprints_are_kept(tmp_path):
+    stages = [Stage('source', lambda params: pd.DataFrame({'x': [params['n']]}), params=['n'], cache='parquet', keep=2)]
+    cache = StageCache(tmp_path / "cache")
+    for n in range(4):
+        PipelineExecutor(stages, cache=cache).run({'n': n})
+    assert len(list((tmp_path / "cache" / "source").iterdir())) == 2
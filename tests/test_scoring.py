@@ -0,0 +1,46 @@
+import numpy as np
+from anomaly_detector.domain.anomaly_detection import AnomalyDetector
+from anomaly_detector.domain.compiled_forest import CompiledForest
+from anomaly_detector.domain.scoring import ScoringEngine
+from anomaly_detector.domain.services import DEFAULT_MODEL_FEATURES
+
+
+def test_scores_match_the_model(features, forest):
+    is_anomaly, anomaly_score = ScoringEngine(forest, chunk_size=700, n_jobs=4).score(features)
+    np.testing.assert_allclose(anomaly_score, forest.decision_function(features), rtol=1e-6, atol=1e-6)
+    np.testing.assert_array_equal(is_anomaly, (forest.predict(features) == -1).astype(np.int64))
+
+
+def test_chunking_does_not_change_scores(features, forest):
+    single = ScoringEngine(forest, chunk_size=len(features), n_jobs=1).score_samples(features)
+    chunked = ScoringEngine(forest, chunk_size=128, n_jobs=4).score_samples(features)
+    np.testing.assert_array_equal(single, chunked)
+
+
+def test_model_n_jobs_is_restored(features, forest):
+    forest.n_jobs = -1
+    ScoringEngine(forest, chunk_size=500, n_jobs=4).score(features)
+    assert forest.n_jobs == -1
+
+
+def test_empty_input(features, forest):
+    is_anomaly, anomaly_score = ScoringEngine(forest).score(features.head(0))
+    assert len(is_anomaly) == 0 and len(anomaly_score) == 0
+
+
+def test_compiled_forest_is_chunked_across_threads(features, forest):
+    compiled = CompiledForest.from_isolation_forest(forest, feature_names=list(features.columns))
+    single = ScoringEngine(compiled, chunk_size=len(features), n_jobs=1).score_samples(features)
+    chunked = ScoringEngine(compiled, chunk_size=256, n_jobs=4).score_samples(features)
+    np.testing.assert_array_equal(single, chunked)
+
+
+def test_detector_scores_only_small_batches_with_the_compiled_forest(hourly_features, monkeypatch):
+    ad = AnomalyDetector(feature_cols=DEFAULT_MODEL_FEATURES, n_estimators=10, compiled_max_rows=50)
+    ad.fit(hourly_features, save_artifacts=False)
+    calls = []
+    score_samples = CompiledForest.score_samples
+    monkeypatch.setattr(CompiledForest, "score_samples", lambda self, X: calls.append(len(X)) or score_samples(self, X))
+    small, large = ad.score(hourly_features.head(50)), ad.score(hourly_features)
+    assert calls == [50]
+    np.testing.assert_allclose(small['anomaly_score'], large['anomaly_score'].head(50), rtol=1e-5, atol=1e-6)
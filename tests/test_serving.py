@@ -0,0 +1,79 @@
+import gzip
+import json
+import numpy as np
+import pandas as pd
+from anomaly_detector.domain.parquet_writer import PartitionedParquetWriter, partition_codes
+from anomaly_detector.domain.serving import (CELLS_FILE, cells_payload, payload_path, publish_serving_payloads,
+                                             trips_payload)
+
+
+def gold_rows(days: int = 2, cells: int = 20, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    hours = pd.date_range('2014-04-01', periods=days * 24, freq='h')
+    n = len(hours) * cells
+    df = pd.DataFrame({
+        'timestamp': np.repeat(hours, cells),
+        'h3_index': np.tile([f"882a1072{i:07x}" for i in range(cells)], len(hours)),
+        'centroid_lat': 40.7 + rng.random(n) / 10,
+        'centroid_lon': -74.0 + rng.random(n) / 10,
+        'value': rng.integers(1, 50, n),
+        'anomaly_score': rng.normal(size=n)
+    })
+    df['is_anomaly'] = (df['anomaly_score'] < -1.5).astype(int)
+    return df.sample(frac=1.0, random_state=seed).reset_index(drop=True)
+
+
+def read_payload(path) -> dict:
+    with open(path, "rb") as f:
+        return json.loads(gzip.decompress(f.read()))
+
+
+def test_payload_groups_points_by_hour():
+    df = gold_rows(days=1)
+    payload = trips_payload(df)
+    assert payload['time_index'] == [t.isoformat() for t in sorted(df['timestamp'].unique())]
+    assert [len(points) for points in payload['data']] == df.groupby('timestamp').size().sort_index().tolist()
+    first = df[df['timestamp'] == df['timestamp'].min()]
+    assert sorted(map(tuple, payload['data'][0])) == sorted(zip(first['centroid_lat'], first['centroid_lon']))
+    assert trips_payload(df.iloc[:0]) == {'time_index': [], 'data': []}
+
+
+def test_cells_payload_keeps_the_trips_of_each_cell():
+    df = gold_rows(days=1)
+    payload = cells_payload(df)
+    assert payload['time_index'] == trips_payload(df)['time_index']
+    assert [sum(values) for values in payload['value']] == df.groupby('timestamp')['value'].sum().sort_index().tolist()
+    first = df[df['timestamp'] == df['timestamp'].min()]
+    assert sorted(zip(payload['cells'][0], payload['value'][0])) == sorted(zip(first['h3_index'], first['value']))
+
+
+def test_only_changed_dates_are_published(tmp_path):
+    df = gold_rows()
+    gold, serving = tmp_path / "gold", tmp_path / "serving"
+    written = PartitionedParquetWriter().write(df, str(gold), codes=partition_codes(df))
+    assert len(publish_serving_payloads(str(gold), str(serving), written)) == 4
+
+    payload = read_payload(payload_path(serving, '2014-04-01'))
+    day = df[df['timestamp'] < '2014-04-02']
+    for type_code, flag in (('anomalous', 1), ('non_anomalous', 0)):
+        assert sum(map(len, payload[type_code]['data'])) == (day['is_anomaly'] == flag).sum()
+
+    untouched = payload_path(serving, '2014-04-02').stat().st_mtime_ns
+    body = payload_path(serving, '2014-04-01').read_bytes()
+    assert publish_serving_payloads(str(gold), str(serving), ['type_code=anomalous/date_code=2014-04-01']) \
+        == [str(payload_path(serving, '2014-04-01')), str(payload_path(serving, '2014-04-01', CELLS_FILE))]
+    # Identical payloads give identical bytes, so the upload dedup skips them
+    assert payload_path(serving, '2014-04-01').read_bytes() == body
+    assert payload_path(serving, '2014-04-02').stat().st_mtime_ns == untouched
+
+
+def test_dates_without_partitions_lose_their_payload(tmp_path):
+    df = gold_rows(days=1)
+    gold, serving = tmp_path / "gold", tmp_path / "serving"
+    written = PartitionedParquetWriter().write(df, str(gold), codes=partition_codes(df))
+    publish_serving_payloads(str(gold), str(serving), written)
+    for part in gold.rglob("part-*.parquet"):
+        part.unlink()
+    assert publish_serving_payloads(str(gold), str(serving), written) == []
+    assert not payload_path(serving, '2014-04-01').exists()
+    assert not payload_path(serving, '2014-04-01', CELLS_FILE).exists()
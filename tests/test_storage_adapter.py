@@ -0,0 +1,79 @@
+import os
+import boto3
+import pytest
+from moto import mock_aws
+from anomaly_detector.adapters.storage_adapter import MB, StorageAdapter, local_etag
+
+BUCKET = "bkt-test"
+
+
+@pytest.fixture
+def storage():
+    with mock_aws():
+        boto3.client('s3', region_name='us-east-1').create_bucket(Bucket=BUCKET)
+        # 5 MB is the smallest part S3 accepts
+        yield StorageAdapter(BUCKET, 'key', 'secret', region_name='us-east-1', max_workers=4,
+                             multipart_threshold=5 * MB, multipart_chunksize=5 * MB)
+
+
+def write_files(base_dir, contents: dict) -> dict:
+    files = {}
+    for name, body in contents.items():
+        path = base_dir / name
+        path.write_bytes(body)
+        files[str(path)] = f"gold/{name}"
+    return files
+
+
+def test_upload_many_skips_files_with_the_same_etag(storage, tmp_path):
+    files = write_files(tmp_path, {'a.parquet': b'a' * 100, 'b.parquet': b'b' * 100, 'c.parquet': b'c' * 100})
+    assert sorted(storage.upload_many(files)['uploaded']) == sorted(files.values())
+
+    (tmp_path / 'b.parquet').write_bytes(b'changed')
+    report = storage.upload_many(files)
+    assert report['uploaded'] == ['gold/b.parquet']
+    assert sorted(report['skipped']) == ['gold/a.parquet', 'gold/c.parquet']
+    assert report['failed'] == {}
+
+    assert len(storage.upload_many(files, skip_unchanged=False)['uploaded']) == 3
+
+
+def test_local_etag_matches_multipart_uploads(storage, tmp_path):
+    big = tmp_path / 'big.parquet'
+    big.write_bytes(os.urandom(11 * MB))
+    storage.upload(str(big), 'gold/big.parquet')
+    etag = local_etag(str(big), 5 * MB, 5 * MB)
+    assert etag.endswith('-3')
+    assert storage.remote_etags('gold/') == {'gold/big.parquet': etag}
+    assert storage.upload_many({str(big): 'gold/big.parquet'})['skipped'] == ['gold/big.parquet']
+
+
+def test_download_json_of_a_missing_key_is_none(storage, tmp_path):
+    assert storage.download_json('gold/manifest.json') is None
+    (tmp_path / 'manifest.json').write_text('{"partitions": {}}')
+    storage.upload(str(tmp_path / 'manifest.json'), 'gold/manifest.json')
+    assert storage.download_json('gold/manifest.json') == {'partitions': {}}
+
+
+def test_unconfigured_client_raises():
+    with pytest.raises(RuntimeError):
+        StorageAdapter().upload_many({})
+
+
+def test_only_the_prefixes_of_the_keys_are_listed(storage, tmp_path):
+    prefixes = []
+    storage.s3.meta.events.register('provide-client-params.s3.ListObjectsV2',
+                                    lambda params, **kwargs: prefixes.append(params.get('Prefix')))
+    files = write_files(tmp_path, {'a.parquet': b'a', 'b.parquet': b'b'})
+    (tmp_path / 'trips.json.gz').write_bytes(b'payload')
+    files[str(tmp_path / 'trips.json.gz')] = 'trips_uber_serving/date_code=2014-04-01/trips.json.gz'
+    (tmp_path / 'indicators.parquet').write_bytes(b'indicators')
+    files[str(tmp_path / 'indicators.parquet')] = 'trips_uber_summary/indicators.parquet'
+    storage.upload_many(files)
+    assert sorted(prefixes) == ['gold/', 'trips_uber_serving/date_code=2014-04-01/trips.json.gz',
+                                'trips_uber_summary/indicators.parquet']
+
+    prefixes.clear()
+    report = storage.upload_many(files)
+    assert sorted(report['skipped']) == sorted(files.values())
+    assert '' not in prefixes
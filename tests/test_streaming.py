@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+from anomaly_detector.domain.anomaly_detection import AnomalyDetector
+from anomaly_detector.domain.compiled_forest import CompiledForest
+from anomaly_detector.domain.services import DEFAULT_MODEL_FEATURES
+
+
+def detector(**kwargs) -> AnomalyDetector:
+    return AnomalyDetector(feature_cols=DEFAULT_MODEL_FEATURES, n_estimators=20, max_samples=0.5,
+                           trees_per_window=5, max_windows=3, **kwargs)
+
+
+def days(df: pd.DataFrame) -> list:
+    return [group for _, group in df.groupby(df['timestamp'].dt.floor('D'), sort=True)]
+
+
+def test_only_the_latest_windows_stay_live(hourly_features):
+    ad = detector()
+    scored = ad.fit_windows(hourly_features, save_artifacts=False)
+    assert len(scored) == len(hourly_features)
+    assert ad.live_windows == sorted(hourly_features['timestamp'].dt.floor('D').unique())[-3:]
+    assert isinstance(ad.model, CompiledForest) and ad.model is ad.compiled_forest
+    assert ad.compiled_forest.n_trees == 3 * 5
+
+
+def test_fitted_forest_seeds_the_window_deque(hourly_features):
+    history, *new_days = days(hourly_features)
+    ad = detector()
+    ad.fit(history, save_artifacts=False)
+    fitted = ad.compiled_forest
+    ad.partial_fit(new_days[0], window_key='day-1')
+    assert ad.live_windows == ['fit', 'day-1']
+    assert ad.compiled_forest.n_trees == fitted.n_trees + 5
+    # The live ensemble is what scores new rows
+    np.testing.assert_array_equal(ad.score(new_days[1])['anomaly_score'],
+                                  (ad.compiled_forest.score_samples(ad.prepare_features(new_days[1], fit=False)[1])
+                                   - ad.compiled_forest.offset_).astype(np.float32))
+
+
+def test_fit_windows_saves_the_bundle_once(hourly_features, monkeypatch):
+    ad = detector()
+    saved = []
+    monkeypatch.setattr(ad, 'save_bundle', lambda path=None: saved.append(path))
+    ad.fit_windows(hourly_features)
+    assert saved == [None]
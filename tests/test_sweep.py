@@ -0,0 +1,29 @@
+import pytest
+from anomaly_detector.domain.sweep import TRIAL_METRICS, TRIAL_PARAMS, anomaly_count_key, rank_trials, run_sweep
+from .conftest import raw_trips
+
+GRID = {'hex_resolution': [7], 'rolling_window': [24], 'contamination': [0.05, 0.2],
+        'n_estimators': [10, 20], 'max_samples': [0.5]}
+
+
+@pytest.fixture(scope="module")
+def ranked():
+    return run_sweep(raw_trips(n=8000, days=3), grid=GRID, max_workers=2, log_to_mlflow=False)
+
+
+def test_one_ranked_row_per_forest(ranked):
+    assert len(ranked) == 2
+    assert 'contamination' not in ranked.columns
+    assert list(ranked.columns) == ['rank'] + TRIAL_PARAMS + TRIAL_METRICS + [anomaly_count_key(c) for c in GRID['contamination']]
+    assert ranked['rank'].tolist() == [1, 2]
+    assert ranked['em_area'].is_monotonic_decreasing
+
+
+def test_contamination_only_reports_anomaly_counts(ranked):
+    low, high = ranked[anomaly_count_key(0.05)], ranked[anomaly_count_key(0.2)]
+    assert ((low > 0) & (low < high)).all()
+
+
+def test_ties_on_em_are_broken_by_mv(ranked):
+    trials = ranked.drop(columns='rank').assign(em_area=1.0)
+    assert rank_trials(trials)['mv_area'].is_monotonic_increasing
@@ -0,0 +1,66 @@
+import json
+import h3
+import numpy as np
+import pandas as pd
+import pytest
+from anomaly_detector.domain.zone_lookup import build_zone_lookup, load_zone_lookup
+from anomaly_detector.domain.summary import SummaryEngine
+
+RESOLUTION = 8
+# Two side by side squares, [min_lon, min_lat, max_lon, max_lat]
+ZONES = {'Midtown': [-74.00, 40.74, -73.97, 40.77], 'Upper East Side': [-73.97, 40.74, -73.94, 40.77]}
+
+
+def square(min_lon, min_lat, max_lon, max_lat) -> dict:
+    ring = [[min_lon, min_lat], [max_lon, min_lat], [max_lon, max_lat], [min_lon, max_lat], [min_lon, min_lat]]
+    return {'type': 'Polygon', 'coordinates': [ring]}
+
+
+@pytest.fixture
+def zones_path(tmp_path):
+    # Padded past 1 kB so ensure_taxi_zones accepts the file instead of downloading the real one
+    features = [{'type': 'Feature', 'properties': {'zone': zone, 'padding': 'x' * 600}, 'geometry': square(*box)}
+                for zone, box in ZONES.items()]
+    path = tmp_path / "taxi_zones.geojson"
+    path.write_text(json.dumps({'type': 'FeatureCollection', 'features': features}))
+    return path
+
+
+def test_cells_map_to_the_zone_holding_their_centroid(tmp_path, zones_path):
+    lookup = build_zone_lookup(RESOLUTION, zones_path=zones_path, out_path=tmp_path / "lookup.parquet")
+    assert set(lookup['zone'].astype(str)) == set(ZONES)
+    assert lookup['h3_index'].is_unique
+    for cell, zone in zip(lookup['h3_index'], lookup['zone'].astype(str)):
+        lat, lon = h3.cell_to_latlng(cell)
+        min_lon, min_lat, max_lon, max_lat = ZONES[zone]
+        assert min_lon <= lon <= max_lon and min_lat <= lat <= max_lat
+
+
+def test_lookup_is_persisted_and_reloaded(tmp_path, zones_path):
+    out_path = tmp_path / "lookup.parquet"
+    built = build_zone_lookup(RESOLUTION, zones_path=zones_path, out_path=out_path)
+    load_zone_lookup.cache_clear()
+    loaded = load_zone_lookup(RESOLUTION, lookup_path=str(out_path))
+    assert loaded == dict(zip(built['h3_index'], built['zone'].astype(str)))
+
+
+def test_summary_uses_the_lookup_for_hot_locations(tmp_path, zones_path):
+    lookup = build_zone_lookup(RESOLUTION, zones_path=zones_path, out_path=tmp_path / "lookup.parquet")
+    zone_of = dict(zip(lookup['h3_index'], lookup['zone'].astype(str)))
+    midtown = next(c for c, z in zone_of.items() if z == 'Midtown')
+    ues = next(c for c, z in zone_of.items() if z == 'Upper East Side')
+    outside = h3.latlng_to_cell(40.60, -74.20, RESOLUTION)
+    df = pd.DataFrame({
+        'timestamp': pd.to_datetime(['2014-04-01 08:00', '2014-04-01 09:00', '2014-04-01 09:00', '2014-04-02 18:00']),
+        'h3_index': [midtown, ues, outside, ues],
+        'value': [5, 40, 100, 7],
+        'is_anomaly': [0, 1, 1, 0]
+    })
+    summaries = SummaryEngine(zone_lookup=zone_of).build(df)
+    daily = summaries['daily'].set_index('date')
+    # The busiest row of April 1st is outside every zone
+    assert daily['hot_location'].tolist() == [None, 'Upper East Side']
+    assert daily['sum_trips'].tolist() == [145, 7]
+    zone_daily = summaries['zone_daily'].sort_values(['date', 'zone']).reset_index(drop=True)
+    assert zone_daily['zone'].tolist() == ['Midtown', 'Upper East Side', 'Upper East Side']
+    np.testing.assert_array_equal(zone_daily['sum_trips'], [5, 40, 7])
@@ -0,0 +1,64 @@
+"""
+Web API fixtures: the backend app against a moto S3 server holding a synthetic gold layer
+(the same generator as the load benchmark).
+"""
+import sys
+import pytest
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[2] / "webapp" / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from benchmarks.datagen import write_dataset
+from benchmarks.local_s3 import BUCKET, backend_env, local_s3, s3_client
+
+DAYS = 10
+
+
+@pytest.fixture(scope="session")
+def s3_endpoint():
+    with local_s3() as endpoint:
+        write_dataset(s3_client(endpoint), BUCKET, days=DAYS, cells=60)
+        yield endpoint
+
+
+@pytest.fixture(scope="session")
+def dataset(s3_endpoint):
+    """{(type_code, date_code): polars frame} of every gold partition in the bucket."""
+    import io
+    import polars as pl
+    s3, frames = s3_client(s3_endpoint), {}
+    for page in s3.get_paginator("list_objects_v2").paginate(Bucket=BUCKET, Prefix="trips_uber/type_code="):
+        for item in page["Contents"]:
+            _, type_part, date_part, _ = item["Key"].split("/")
+            body = s3.get_object(Bucket=BUCKET, Key=item["Key"])["Body"].read()
+            frames[(type_part.split("=")[1], date_part.split("=")[1])] = pl.read_parquet(io.BytesIO(body))
+    return frames
+
+
+def reset_singletons():
+    from app.application.api import trips_api
+    from app.application.services import trips_service
+    from app.infrastructure.connectors import buckets3_connector
+    from app.infrastructure.repositories import trips_repository
+    trips_api._service = None
+    trips_repository._repository = None
+    buckets3_connector._connectors.clear()
+    trips_service._payloads.clear()
+
+
+@pytest.fixture
+def client(s3_endpoint, monkeypatch):
+    """TestClient of a cold container: no cached connector, repository or payloads."""
+    from fastapi.testclient import TestClient
+    for name, value in backend_env(s3_endpoint).items():
+        monkeypatch.setenv(name, value)
+    from app.main import app
+    reset_singletons()
+    yield TestClient(app)
+    reset_singletons()
+
+
+@pytest.fixture
+def s3(s3_endpoint):
+    return s3_client(s3_endpoint)
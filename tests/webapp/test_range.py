@@ -0,0 +1,73 @@
+import polars as pl
+from benchmarks.local_s3 import BUCKET
+
+RANGE = "/api/uber-trips/range"
+WEEK = {"date_from": "2014-04-03", "date_to": "2014-04-09"}
+
+
+def expected_totals(dataset: dict, date_from: str, date_to: str, type_codes=None, min_value=None) -> list:
+    rows = []
+    for (type_code, date_code), df in sorted(dataset.items(), key=lambda item: (item[0][1], item[0][0])):
+        if date_from <= date_code <= date_to and (type_codes is None or type_code in type_codes):
+            if min_value is not None:
+                df = df.filter(pl.col("value") >= min_value)
+            rows.append({"date_code": date_code, "type_code": type_code, "trips": int(df["value"].sum()),
+                         "cells": df["h3_index"].n_unique()})
+    return rows
+
+
+def test_range_totals_match_the_gold_rows(client, dataset):
+    response = client.get(RANGE, params=WEEK)
+    assert response.status_code == 200
+    assert response.json()["result"] == expected_totals(dataset, **WEEK)
+
+    filtered = client.get(RANGE, params={**WEEK, "type_code": "anomalous", "min_value": 25})
+    assert filtered.json()["result"] == expected_totals(dataset, **WEEK, type_codes=["anomalous"], min_value=25)
+
+
+def test_warm_range_skips_the_scan_and_revalidates(client, monkeypatch):
+    from app.infrastructure import get_trips_repository
+    first = client.get(RANGE, params=WEEK)
+    repository, scans = get_trips_repository(), []
+    collect_range = repository.collect_range
+    monkeypatch.setattr(repository, "collect_range", lambda *args, **kwargs: scans.append(args) or collect_range(*args, **kwargs))
+
+    assert client.get(RANGE, params=WEEK).json() == first.json()
+    assert scans == []
+    cached = client.get(RANGE, params=WEEK, headers={"If-None-Match": first.headers["etag"]})
+    assert cached.status_code == 304
+
+
+def test_changed_partition_changes_the_etag(client, s3):
+    first = client.get(RANGE, params=WEEK)
+    key = "trips_uber/type_code=anomalous/date_code=2014-04-05/part-0.parquet"
+    body = s3.get_object(Bucket=BUCKET, Key=key)["Body"].read()
+    s3.put_object(Bucket=BUCKET, Key=f"{key[:-len('part-0.parquet')]}part-1.parquet", Body=body)
+    try:
+        second = client.get(RANGE, params=WEEK, headers={"If-None-Match": first.headers["etag"]})
+        assert second.status_code == 200
+        day = [row for row in second.json()["result"] if row["date_code"] == "2014-04-05" and row["type_code"] == "anomalous"]
+        before = [row for row in first.json()["result"] if row["date_code"] == "2014-04-05" and row["type_code"] == "anomalous"]
+        assert day[0]["trips"] == 2 * before[0]["trips"]
+    finally:
+        s3.delete_object(Bucket=BUCKET, Key=f"{key[:-len('part-0.parquet')]}part-1.parquet")
+
+
+def test_listing_starts_at_date_from_and_stops_at_date_to(client, monkeypatch):
+    from app.infrastructure import get_trips_repository
+    connector, calls = get_trips_repository().bucket, []
+    list_objects = connector.list_objects
+    monkeypatch.setattr(connector, "list_objects", lambda *args: calls.append(args) or list_objects(*args))
+    client.get(RANGE, params=WEEK)
+    prefix = "trips_uber/type_code=anomalous/"
+    assert (prefix, ".parquet", f"{prefix}date_code=2014-04-03", f"{prefix}date_code=2014-04-10") in calls
+
+    keys = list_objects(prefix, ".parquet", f"{prefix}date_code=2014-04-03", f"{prefix}date_code=2014-04-05")
+    assert [key.split("date_code=")[1][:10] for key in keys] == ["2014-04-03", "2014-04-04"]
+
+
+def test_invalid_ranges_are_rejected(client):
+    assert client.get(RANGE, params={"date_from": "2014-04-09", "date_to": "2014-04-03"}).status_code == 400
+    assert client.get(RANGE, params={"date_from": "2014-01-01", "date_to": "2014-06-01"}).status_code == 400
+    assert client.get(RANGE, params={**WEEK, "type_code": "unknown"}).status_code == 400
+    assert client.get(RANGE, params={"date_from": "2015-01-01", "date_to": "2015-01-07"}).json()["result"] == []
@@ -0,0 +1,76 @@
+import h3
+import polars as pl
+import pytest
+from anomaly_detector.domain.serving import TYPE_CODES, cells_payload, write_payload
+from benchmarks.local_s3 import BUCKET
+from .conftest import reset_singletons
+
+DATE = "2014-04-02"
+SLICE = "/api/uber-trips/values/slice"
+
+
+def hourly_totals(df: pl.DataFrame) -> dict:
+    totals = df.group_by(pl.col("timestamp").dt.hour().alias("hour")).agg(pl.col("value").sum(), pl.col("value").count().alias("rows"))
+    return {row["hour"]: (row["value"], row["rows"]) for row in totals.to_dicts()}
+
+
+def slice_totals(result: dict) -> dict:
+    return {int(t[11:13]): (sum(point[2] for point in data), rows)
+            for t, data, rows in zip(result["time_index"], result["data"], result["rows"])}
+
+
+def test_hour_totals_match_the_gold_rows(client, dataset):
+    response = client.get(SLICE, params={"date_code": DATE, "hour_from": 7, "hour_to": 9})
+    assert response.status_code == 200
+    for type_code in TYPE_CODES:
+        expected = {hour: totals for hour, totals in hourly_totals(dataset[(type_code, DATE)]).items() if 7 <= hour <= 9}
+        assert slice_totals(response.json()["result"][type_code]) == expected
+
+
+def test_zoom_aggregates_to_coarser_cells(client):
+    params = {"date_code": DATE, "hour_from": 16, "hour_to": 20}
+    full = client.get(SLICE, params=params).json()["result"]
+    coarse = client.get(SLICE, params={**params, "zoom": 9}).json()["result"]
+    for type_code in TYPE_CODES:
+        assert slice_totals(coarse[type_code]) == slice_totals(full[type_code])
+        points = [point for hour in coarse[type_code]["data"] for point in hour]
+        assert len(points) < sum(map(len, full[type_code]["data"]))
+        # zoom 9 aggregates to resolution 5: every point is the centroid of its own cell
+        for lat, lon, _ in points:
+            assert h3.cell_to_latlng(h3.latlng_to_cell(lat, lon, 5)) == (lat, lon)
+
+
+def test_bbox_keeps_only_points_inside(client, dataset):
+    bbox = (-73.99, 40.75, -73.98, 40.765)
+    response = client.get(SLICE, params={"date_code": DATE, "bbox": ",".join(map(str, bbox))})
+    df = dataset[("non_anomalous", DATE)].filter(pl.col("centroid_lon").is_between(bbox[0], bbox[2])
+                                                 & pl.col("centroid_lat").is_between(bbox[1], bbox[3]))
+    result = response.json()["result"]["non_anomalous"]
+    assert sum(result["rows"]) == df.height > 0
+    assert all(bbox[1] <= lat <= bbox[3] and bbox[0] <= lon <= bbox[2] for hour in result["data"] for lat, lon, _ in hour)
+
+
+def test_invalid_slices_are_rejected(client):
+    assert client.get(SLICE, params={"date_code": DATE, "hour_from": 10, "hour_to": 9}).status_code == 400
+    assert client.get(SLICE, params={"date_code": DATE, "bbox": "1,2,3"}).status_code == 400
+    assert client.get(SLICE, params={"date_code": DATE, "bbox": "a,b,c,d"}).status_code == 400
+
+
+def test_published_cells_are_sliced_without_reading_the_gold_layer(client, dataset, s3, tmp_path, monkeypatch):
+    from app.infrastructure import get_trips_repository
+    views = [{"date_code": DATE, "hour_from": 6, "hour_to": 20, "zoom": 10},
+             {"date_code": DATE, "bbox": "-73.99,40.75,-73.98,40.765"}]
+    from_gold = [client.get(SLICE, params=params).json()["result"] for params in views]
+
+    payload = {t: cells_payload(dataset[(t, DATE)].to_pandas()) for t in TYPE_CODES}
+    key = f"trips_uber_serving/date_code={DATE}/cells.json.gz"
+    s3.put_object(Bucket=BUCKET, Key=key, Body=write_payload(payload, tmp_path / "cells.json.gz").read_bytes())
+    try:
+        reset_singletons()
+        monkeypatch.setattr(get_trips_repository(), "get_trips", lambda *args: pytest.fail("gold layer read"))
+        for params, expected in zip(views, from_gold):
+            response = client.get(SLICE, params=params)
+            assert response.status_code == 200
+            assert response.json()["result"] == expected
+    finally:
+        s3.delete_object(Bucket=BUCKET, Key=key)
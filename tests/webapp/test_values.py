@@ -0,0 +1,40 @@
+import pytest
+from anomaly_detector.domain.serving import TYPE_CODES, trips_payload, write_payload
+from benchmarks.local_s3 import BUCKET
+
+PUBLISHED_DATE = "2014-04-03"
+GOLD_DATE = "2014-04-04"
+
+
+@pytest.fixture
+def published(s3, dataset, tmp_path):
+    """
+    Payload of PUBLISHED_DATE in the serving prefix, removed afterwards. It only holds
+    the first hours, so a response rebuilt from the gold rows would not match it.
+    """
+    payload = {t: trips_payload(dataset[(t, PUBLISHED_DATE)].to_pandas().query("timestamp.dt.hour < 3"))
+               for t in TYPE_CODES}
+    key = f"trips_uber_serving/date_code={PUBLISHED_DATE}/trips.json.gz"
+    s3.put_object(Bucket=BUCKET, Key=key, Body=write_payload(payload, tmp_path / "trips.json.gz").read_bytes())
+    yield payload
+    s3.delete_object(Bucket=BUCKET, Key=key)
+
+
+def test_published_payload_is_served_as_is(client, published):
+    response = client.get("/api/uber-trips/values", params={"date_code": PUBLISHED_DATE})
+    assert response.status_code == 200
+    assert response.json()["result"] == published
+
+    cached = client.get("/api/uber-trips/values", params={"date_code": PUBLISHED_DATE},
+                        headers={"If-None-Match": response.headers["etag"]})
+    assert cached.status_code == 304 and cached.content == b""
+
+
+def test_unpublished_dates_fall_back_to_the_gold_layer(client, dataset):
+    response = client.get("/api/uber-trips/values", params={"date_code": GOLD_DATE})
+    assert response.status_code == 200
+    result = response.json()["result"]
+    for type_code in TYPE_CODES:
+        df = dataset[(type_code, GOLD_DATE)]
+        assert sorted(result[type_code]["time_index"]) == sorted(t.isoformat() for t in df["timestamp"].unique())
+        assert sum(map(len, result[type_code]["data"])) == df.height
@@ -1,8 +1,11 @@
 import traceback
-from fastapi import APIRouter, HTTPException
-from ..services.trips_service import TripsService
+from datetime import date
+from os import environ
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Request
+from fastapi import Response as HttpResponse
 from ..dto.base_dto import Response
-from ..dto.trips_dto import TripsRequest
+from ..dto.trips_dto import TripsRequest, TripsSliceRequest, TripsRangeRequest
 
 router = APIRouter(
     prefix="/api/uber-trips",
@@ -10,49 +13,128 @@ router = APIRouter(
     responses={404: {"description": "Not found"}}
 )
 
+# Browsers and CDNs may reuse past dates for this long; the current date is always revalidated
+CACHE_MAX_AGE_SECONDS = int(environ.get("CACHE_MAX_AGE_SECONDS", "3600"))
 
-@router.post("/values")
-async def get_trips(request:TripsRequest) -> Response:
-    print("post trips")
+_service = None
+
+
+def trips_service():
+    '''
+        TripsService of the container. The service module (polars, boto3, h3) is imported
+        and the S3 connector built on the first request instead of at Lambda init,
+        then reused by the warm invocations
+    '''
+    global _service
+    if _service is None:
+        from ..services.trips_service import TripsService
+        _service = TripsService()
+    return _service
+
+
+def cache_headers(etag:str, date_code:str) -> dict:
+    if date_code < date.today().isoformat():
+        cache_control = f"public, max-age={CACHE_MAX_AGE_SECONDS}, stale-while-revalidate={CACHE_MAX_AGE_SECONDS}"
+    else:
+        cache_control = "public, no-cache"
+    return {"ETag": f'"{etag}"', "Cache-Control": cache_control}
+
+
+def not_modified(http_request:Request, etag:str) -> bool:
+    if_none_match = http_request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/").strip('"') for tag in if_none_match.split(",")]
+    return etag in tags or "*" in tags
+
+
+async def cached_response(loader, date_code:str, http_request:Request, http_response:HttpResponse, cache_date:str=None):
+    '''
+        runs a service loader returning (result, etag), result being data or JSON bytes,
+        and answers 304 when the client already has it
+    '''
     try:
-        
-        result = await TripsService().get_trips(request.date_code)
-        response = Response(status_code=200, status_name="OK", message="Complete", result=result)
+        result, etag = await loader(date_code)
     except ValueError as ve:
         raise HTTPException(status_code=400, detail=str(ve))
     except Exception as e:      
         traceback.print_exc()
         raise HTTPException(status_code=501, detail=str(e))
 
-    return response
+    # Cache lifetime follows the latest date the response covers
+    headers = cache_headers(etag, cache_date or date_code)
+    if not_modified(http_request, etag):
+        return HttpResponse(status_code=304, headers=headers)
+    if isinstance(result, bytes):
+        # Pre-serialized JSON payload: spliced into the envelope without decoding it
+        content = b'{"status_code":200,"status_name":"OK","message":"Complete","result":' + result + b'}'
+        return HttpResponse(content=content, media_type="application/json", headers=headers)
+    http_response.headers.update(headers)
+
+    return Response(status_code=200, status_name="OK", message="Complete", result=result)
+
+
+@router.post("/values")
+async def get_trips(request:TripsRequest, http_request:Request, http_response:HttpResponse) -> Response:
+    print("post trips")
+    return await cached_response(trips_service().get_trips, request.date_code, http_request, http_response)
+
+
+@router.get("/values")
+async def get_trips_cached(date_code:str, http_request:Request, http_response:HttpResponse) -> Response:
+    return await cached_response(trips_service().get_trips, date_code, http_request, http_response)
+
+
+@router.post("/values/slice")
+async def get_trips_slice(request:TripsSliceRequest, http_request:Request, http_response:HttpResponse) -> Response:
+    loader = lambda date_code: trips_service().get_trips_slice(date_code, request.hour_from, request.hour_to, request.bbox, request.zoom)
+    return await cached_response(loader, request.date_code, http_request, http_response)
+
+
+@router.get("/values/slice")
+async def get_trips_slice_cached(date_code:str, http_request:Request, http_response:HttpResponse, hour_from:int=0,
+                                 hour_to:int=23, bbox:Optional[str]=None, zoom:Optional[int]=None) -> Response:
+    '''
+        bbox as "min_lon,min_lat,max_lon,max_lat"
+    '''
+    try:
+        bbox_values = [float(v) for v in bbox.split(",")] if bbox else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox must be min_lon,min_lat,max_lon,max_lat")
+    loader = lambda date_code: trips_service().get_trips_slice(date_code, hour_from, hour_to, bbox_values, zoom)
+    return await cached_response(loader, date_code, http_request, http_response)
+
+
+@router.post("/range")
+async def get_trips_range(request:TripsRangeRequest, http_request:Request, http_response:HttpResponse) -> Response:
+    loader = lambda date_from: trips_service().get_trips_range(date_from, request.date_to, request.type_code, request.min_value)
+    return await cached_response(loader, request.date_from, http_request, http_response, cache_date=request.date_to)
+
+
+@router.get("/range")
+async def get_trips_range_cached(date_from:str, date_to:str, http_request:Request, http_response:HttpResponse,
+                                 type_code:Optional[str]=None, min_value:Optional[float]=None) -> Response:
+    loader = lambda date_from: trips_service().get_trips_range(date_from, date_to, type_code, min_value)
+    return await cached_response(loader, date_from, http_request, http_response, cache_date=date_to)
 
 
 @router.post("/indicators")
-async def get_trips(request:TripsRequest) -> Response:
+async def get_trips(request:TripsRequest, http_request:Request, http_response:HttpResponse) -> Response:
     print("post indicators")
-    try:
-        
-        result = await TripsService().get_indicators(request.date_code)
-        response = Response(status_code=200, status_name="OK", message="Complete", result=result)
-    except ValueError as ve:
-        raise HTTPException(status_code=400, detail=str(ve))
-    except Exception as e:      
-        traceback.print_exc()
-        raise HTTPException(status_code=501, detail=str(e))
+    return await cached_response(trips_service().get_indicators, request.date_code, http_request, http_response)
+
+
+@router.get("/indicators")
+async def get_indicators_cached(date_code:str, http_request:Request, http_response:HttpResponse) -> Response:
+    return await cached_response(trips_service().get_indicators, date_code, http_request, http_response)
 
-    return response
 
 @router.post("/history_events")
-async def get_trips(request:TripsRequest) -> Response:
+async def get_trips(request:TripsRequest, http_request:Request, http_response:HttpResponse) -> Response:
     print("post indicators")
-    try:
-        
-        result = await TripsService().get_summary_trips(request.date_code)
-        response = Response(status_code=200, status_name="OK", message="Complete", result=result)
-    except ValueError as ve:
-        raise HTTPException(status_code=400, detail=str(ve))
-    except Exception as e:      
-        traceback.print_exc()
-        raise HTTPException(status_code=501, detail=str(e))
+    return await cached_response(trips_service().get_summary_trips, request.date_code, http_request, http_response)
+
 
-    return response
\ No newline at end of file
+@router.get("/history_events")
+async def get_history_events_cached(date_code:str, http_request:Request, http_response:HttpResponse) -> Response:
+    return await cached_response(trips_service().get_summary_trips, date_code, http_request, http_response)
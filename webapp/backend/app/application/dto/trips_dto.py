@@ -1,6 +1,21 @@
-from typing import TypeVar
+from typing import TypeVar, List, Optional
 from pydantic import BaseModel
 
 class TripsRequest(BaseModel):
     date_code: str
 
+
+class TripsSliceRequest(BaseModel):
+    date_code: str
+    hour_from: int = 0
+    hour_to: int = 23
+    # [min_lon, min_lat, max_lon, max_lat]
+    bbox: Optional[List[float]] = None
+    zoom: Optional[int] = None
+
+
+class TripsRangeRequest(BaseModel):
+    date_from: str
+    date_to: str
+    type_code: Optional[str] = None
+    min_value: Optional[float] = None
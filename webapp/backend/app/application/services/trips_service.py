@@ -1,36 +1,86 @@
 
 import json
-from polars import DataFrame, Date, col, concat_list, lit, Utf8
-from ...infrastructure import TripsRepository
+import gzip
+import asyncio
+import hashlib
+from datetime import date
+from typing import Sequence
+from polars import DataFrame, Float64, Int64, List, col, concat, concat_list, lit, Utf8
+from ...infrastructure import TripsRepository, get_trips_repository
 from ...utils import enum
+from ...utils.lru_cache import LRUCache
+from ...utils.h3_cells import cell_center, resolution_for_zoom, parent_cells
+
+MAX_RANGE_DAYS = 92
+
+# Response payloads keyed by (endpoint, date_code), tagged with the ETag of their sources
+_payloads = LRUCache()
+
+
+def payload_etag(*parts) -> str:
+    return hashlib.md5("|".join(map(str, parts)).encode()).hexdigest()
+
 
 class TripsService:
 
+    def __init__(self, repository:TripsRepository=None) -> None:
+        self.repository = repository or get_trips_repository()
+
+    def _cached_payload(self, name:str, date_code:str, etag:str, build):
+        '''
+            returns (payload, etag); payloads are rebuilt only when their sources changed
+        '''
+        entry = _payloads.get((name, date_code))
+        if entry is not None and entry.etag == etag:
+            return entry.value, etag
+        data_js = build()
+        _payloads.put((name, date_code), data_js, etag, len(json.dumps(data_js, default=str)))
+        return data_js, etag
+
     async def get_trips(self, date_code:str):
 
+        # Payload published by the pipeline: served as is, no polars work
+        entry = _payloads.get(("values", date_code))
+        if _payloads.is_fresh(entry):
+            return entry.value, payload_etag("values", date_code, entry.etag)
+
+        published = await self.repository.get_trips_payload(date_code, entry.etag if entry else None)
+        if published is not None:
+            body, etag = published
+            if body is None:
+                _payloads.revalidated(entry)
+                return entry.value, payload_etag("values", date_code, etag)
+            raw = gzip.decompress(body)
+            _payloads.put(("values", date_code), raw, etag, len(raw))
+            return raw, payload_etag("values", date_code, etag)
+
+        return await self._get_trips_from_gold(date_code)
+
+    async def _get_trips_from_gold(self, date_code:str):
+
         cols = ["timestamp","centroid_lat","centroid_lon","type_code","value"]
-        df_anomalous = await TripsRepository().get_trips(enum.TYPE_TRIP.Anomalous.value, date_code)
-        df_anomalous = df_anomalous.with_columns( type_code = lit(enum.TYPE_TRIP.Anomalous.value, Utf8))
-        df_anomalous = df_anomalous.select(cols)
-        df_anomalous = df_anomalous.rename({
-            "timestamp":"time_index",
-            "centroid_lat": "latitud",
-            "centroid_lon": "longitud",
-            "value":"data"
-        })
+        # type_code is the partition value, not a stored column
+        read_cols = [c for c in cols if c != "type_code"]
+        types = [enum.TYPE_TRIP.Anomalous.value, enum.TYPE_TRIP.NoAnomalous.value]
+
+        # Both partition types are fetched at the same time
+        fetched = await asyncio.gather(*[self.repository.get_trips(type_code, date_code, read_cols) for type_code in types])
+        frames = [df for df, _ in fetched]
+        etag = payload_etag("values", date_code, *[etag for _, etag in fetched])
+
+        return self._cached_payload("values_gold", date_code, etag, lambda: self._build_trips(types, frames, cols))
+
+    def _build_trips(self, types:list, frames:list, cols:list) -> dict:
 
-        df_non_anomalous = await TripsRepository().get_trips(enum.TYPE_TRIP.NoAnomalous.value, date_code)
-        df_non_anomalous = df_non_anomalous.with_columns( type_code = lit(enum.TYPE_TRIP.NoAnomalous.value, Utf8))
-        df_non_anomalous = df_non_anomalous.select(cols)
-        df_non_anomalous = df_non_anomalous.rename({
+        df_data:DataFrame = concat([
+            df.with_columns( type_code = lit(type_code, Utf8)).select(cols) for type_code, df in zip(types, frames)
+        ], how="vertical_relaxed")
+        df_data = df_data.rename({
             "timestamp":"time_index",
             "centroid_lat": "latitud",
             "centroid_lon": "longitud",
             "value":"data"
         })
-
-       
-        df_data:DataFrame = df_anomalous.extend(df_non_anomalous)
         df_data = df_data.with_columns( data = concat_list(["latitud","longitud"]))
         df_data = df_data.group_by("type_code","time_index").agg("data")
 
@@ -47,67 +97,157 @@ class TripsService:
         return data_js
     
 
-    async def get_indicators(self, date_code:str):
+    async def get_trips_slice(self, date_code:str, hour_from:int=0, hour_to:int=23, bbox:Sequence[float]=None, zoom:int=None):
+        '''
+            trips of date_code between hour_from and hour_to (inclusive), optionally inside
+            bbox [min_lon, min_lat, max_lon, max_lat], aggregated to the H3 resolution of zoom.
+            Per type: time_index, data [[lat, lon, trips], ...] and rows (source rows) per hour.
+        '''
+        if not (0 <= hour_from <= hour_to <= 23):
+            raise ValueError("hour_from and hour_to must satisfy 0 <= hour_from <= hour_to <= 23")
+        if bbox is not None:
+            bbox = [float(v) for v in bbox]
+            if len(bbox) != 4 or bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+                raise ValueError("bbox must be [min_lon, min_lat, max_lon, max_lat]")
+        resolution = resolution_for_zoom(zoom)
+
+        types = [enum.TYPE_TRIP.Anomalous.value, enum.TYPE_TRIP.NoAnomalous.value]
+        frames, sources_etag = await self._slice_sources(date_code, types)
+
+        name = f"slice:{hour_from}:{hour_to}:{bbox}:{resolution}"
+        etag = payload_etag(name, date_code, sources_etag)
+
+        return self._cached_payload(name, date_code, etag,
+                                    lambda: {type_code: self._build_slice(df, hour_from, hour_to, bbox, resolution)
+                                             for type_code, df in zip(types, frames)})
+
+    async def _slice_sources(self, date_code:str, types:list) -> tuple:
+        '''
+            ([frame per type], ETag) the slices of date_code are cut from: the cells payload
+            published by the pipeline, decoded once per version, else the gold partitions
+        '''
+        entry = _payloads.get(("cells", date_code))
+        if _payloads.is_fresh(entry):
+            return entry.value, entry.etag
+
+        published = await self.repository.get_cells_payload(date_code, entry.etag if entry else None)
+        if published is not None:
+            body, etag = published
+            if body is None:
+                _payloads.revalidated(entry)
+                return entry.value, etag
+            payload = json.loads(gzip.decompress(body))
+            frames = [self._cells_frame(payload.get(type_code, {})) for type_code in types]
+            _payloads.put(("cells", date_code), frames, etag, sum(df.estimated_size() for df in frames))
+            return frames, etag
+
+        cols = ["timestamp","h3_index","centroid_lat","centroid_lon","value"]
+        fetched = await asyncio.gather(*[self.repository.get_trips(type_code, date_code, cols) for type_code in types])
+        return [df for df, _ in fetched], payload_etag(*[etag for _, etag in fetched])
+
+    @staticmethod
+    def _cells_frame(payload:dict) -> DataFrame:
+        '''
+            gold-like rows (timestamp, h3_index, centroid_lat, centroid_lon, value) of one type
+            of a cells payload {time_index, cells, value}
+        '''
+        df = DataFrame({
+            "timestamp": payload.get("time_index", []),
+            "h3_index": payload.get("cells", []),
+            "value": payload.get("value", [])
+        }, schema={"timestamp": Utf8, "h3_index": List(Utf8), "value": List(Int64)})
+        df = df.explode("h3_index","value").drop_nulls("h3_index").with_columns(
+            col("timestamp").str.to_datetime(time_unit="us"))
+
+        # Centroids are looked up once per distinct cell
+        cells = df["h3_index"].unique().to_list()
+        centers = [cell_center(cell) for cell in cells]
+        df_cells = DataFrame({
+            "h3_index": cells,
+            "centroid_lat": [c[0] for c in centers],
+            "centroid_lon": [c[1] for c in centers]
+        }, schema={"h3_index": Utf8, "centroid_lat": Float64, "centroid_lon": Float64})
+
+        return df.join(df_cells, on="h3_index", how="left")
+
+    def _build_slice(self, df:DataFrame, hour_from:int, hour_to:int, bbox:Sequence[float], resolution:int) -> dict:
+
+        df = df.filter(col("timestamp").dt.hour().is_between(hour_from, hour_to))
+        if bbox is not None:
+            df = df.filter(col("centroid_lon").is_between(bbox[0], bbox[2]) & col("centroid_lat").is_between(bbox[1], bbox[3]))
+
+        if resolution is not None and df.height > 0:
+            # Parents are looked up once per distinct cell
+            cells = df["h3_index"].unique().to_list()
+            parents = parent_cells(cells, resolution)
+            df_cells = DataFrame({
+                "h3_index": cells,
+                "cell": [p[0] for p in parents],
+                "lat": [p[1] for p in parents],
+                "lon": [p[2] for p in parents]
+            })
+            df = df.join(df_cells, on="h3_index", how="left")
+        else:
+            df = df.with_columns(cell = col("h3_index"), lat = col("centroid_lat"), lon = col("centroid_lon"))
+
+        df = df.group_by("timestamp","cell").agg(
+            col("lat").first(),
+            col("lon").first(),
+            col("value").sum().cast(Float64).alias("trips"),
+            col("value").len().alias("rows")
+        )
+        df = df.sort("timestamp","cell").group_by("timestamp", maintain_order=True).agg(
+            concat_list(["lat","lon","trips"]).alias("data"),
+            col("rows").sum()
+        )
+
+        return {
+            "time_index": [t.isoformat() for t in df["timestamp"].to_list()],
+            "data": df["data"].to_list(),
+            "rows": df["rows"].to_list()
+        }
+
+    async def get_trips_range(self, date_from:str, date_to:str, type_code:str=None, min_value:float=None):
+        '''
+            per date and type totals over [date_from, date_to] for weekly and monthly views:
+            [{date_code, type_code, trips, cells}]. The ETag comes from the partition listing,
+            so the pruned, lazy scan only runs when the cached payload is stale
+        '''
+        days = (date.fromisoformat(date_to) - date.fromisoformat(date_from)).days
+        if not (0 <= days < MAX_RANGE_DAYS):
+            raise ValueError(f"date_to must be on or after date_from and at most {MAX_RANGE_DAYS} days later")
+        type_codes = None
+        if type_code is not None:
+            type_codes = [enum.TYPE_TRIP(type_code).value]
+
+        files, etag = await self.repository.list_range(date_from, date_to, type_codes)
+        if etag is None:
+            return [], payload_etag("range", date_from, date_to, type_code, min_value)
+
+        name = f"range:{date_to}:{type_code}:{min_value}"
+        build = lambda: self._build_range(self.repository.collect_range(files, ["h3_index","value"], min_value))
+        return await asyncio.to_thread(self._cached_payload, name, date_from, payload_etag(name, date_from, etag), build)
+
+    def _build_range(self, df:DataFrame) -> list:
+
+        df = df.group_by("date_code","type_code").agg(
+            col("value").sum().alias("trips"),
+            col("h3_index").n_unique().alias("cells")
+        )
+
+        return df.sort("date_code","type_code").to_dicts()
 
-        df_indicators = await TripsRepository().get_indicators()
- 
-        df_indicators = df_indicators.sort(["date"], descending=[True])
-        df_indicators = df_indicators.filter(col("date") <= lit(date_code).str.strptime(Date))
+    async def get_indicators(self, date_code:str):
 
-        data_js = {}
-        data_js["date"] = date_code
-        data_js["total_trips"] = None
-        data_js["total_anomalies"] = None
-        data_js["increased_demand_pct"] = None
-        data_js["hot_location"] = None
-        data_js["rush_hour"] = None
-
-        if df_indicators.height > 0:
-            df_indicators = df_indicators.head(7)
-        
-            df_indicators_sum = df_indicators.select([
-                            col("sum_trips").sum().alias("total_trips")
-                            ,col("sum_anomalies").sum().alias("total_anomalies")
-                            ,col("increased_demand_pct").mean().alias("increased_demand_pct")
-                        ])
-
-            df_indicators_max = df_indicators.sort(["sum_trips"], descending=[True])
-            df_indicators_max = df_indicators_max.head(1)
-            df_indicators_max = df_indicators_max.select("hot_location","rush_hour")
-                    
-
-            data_js["total_trips"] = df_indicators_sum[0]["total_trips"].item()
-            data_js["total_anomalies"] = df_indicators_sum[0]["total_anomalies"].item()
-            data_js["increased_demand_pct"] = df_indicators_sum[0]["increased_demand_pct"].item()
-            data_js["hot_location"] = df_indicators_max[0]["hot_location"].item()
-            data_js["rush_hour"] = df_indicators_max[0]["rush_hour"].item()
+        indicators = await self.repository.get_indicators_index()
+        etag = payload_etag("indicators", date_code, indicators.etag)
 
-        return data_js
+        return indicators.get_indicators(date_code), etag
     
 
     async def get_summary_trips(self, date_code:str):
 
-        df_indicators = await TripsRepository().get_indicators()
- 
-        df_indicators = df_indicators.sort(["date"], descending=[True])
-        df_indicators = df_indicators.filter(col("date") <= lit(date_code).str.strptime(Date))
-
-        data_js = []
-        if df_indicators.height > 0:
-            df_indicators = df_indicators.head(7)
-        
-            df_indicators = df_indicators.with_columns(
-                total_normal = col("sum_trips") - col("sum_anomalies")
-            )
-
-            df_indicators = df_indicators.rename({
-                "sum_anomalies": "total_anomalies"
-            })
+        indicators = await self.repository.get_indicators_index()
+        etag = payload_etag("history_events", date_code, indicators.etag)
 
-            df_indicators = df_indicators.select("date","total_normal","total_anomalies")
-
-            data_js = df_indicators.to_dicts()
-            
-
-        return data_js
-    
\ No newline at end of file
+        return indicators.get_summary_trips(date_code), etag
@@ -1,22 +1,64 @@
 import boto3
 import json
+import hashlib
 from os import environ
-from polars import DataFrame,read_parquet,read_csv
+from polars import DataFrame,LazyFrame,read_parquet,read_csv,concat,scan_parquet
 from typing import Sequence
+from threading import Lock
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor
 from .parse_connector import *
+from ...utils.lru_cache import LRUCache
 import io
 
+MAX_FETCH_WORKERS = 16
+MAX_POOL_CONNECTIONS = 32
+
+
+def objects_etag(objects:dict) -> str:
+    '''
+        version of a set of objects: their own ETag for a single object, else a hash of every (key, ETag)
+    '''
+    if len(objects) == 1:
+        return next(iter(objects.values()))
+    digest = hashlib.md5()
+    for key in sorted(objects):
+        digest.update(f"{key}:{objects[key]}\n".encode())
+    return digest.hexdigest()
+
+
 class BucketS3Connector:
     def __init__(self, envBucket):
         
         parse = ParseConnector(envBucket)
         parsecnx = parse.get_cnx()
+        '''
+            one client per process: boto3 clients are thread safe, and the pool
+            is sized for the concurrent fetches of a request
+        '''
         self.conn = boto3.client(parsecnx["host"]
                         ,region_name=parsecnx["port"]
                         ,aws_access_key_id=parsecnx["user"]
                         ,aws_secret_access_key=parsecnx["password"]
+                        # local S3 stand-ins (benchmarks); unset on Lambda
+                        ,endpoint_url=environ.get("AWS_ENDPOINT_URL")
+                        ,config=Config(max_pool_connections=MAX_POOL_CONNECTIONS
+                                       ,retries={"max_attempts": 3, "mode": "standard"}
+                                       ,tcp_keepalive=True)
                         )
         self.bucketName = parsecnx["database"]
+        # Same credentials for polars' own object store reader (lazy scans)
+        self.storage_options = {
+            "aws_access_key_id": parsecnx["user"],
+            "aws_secret_access_key": parsecnx["password"],
+            "aws_region": parsecnx["port"]
+        }
+        if environ.get("AWS_ENDPOINT_URL"):
+            self.storage_options["aws_endpoint_url"] = environ["AWS_ENDPOINT_URL"]
+            self.storage_options["aws_allow_http"] = "true"
+        # Decoded frames keyed by (s3_key, columns), tagged with the source ETag
+        self.cache = LRUCache()
 
     def get_text_object(self,s3_key):            
         response = self.conn.get_object(Bucket=self.bucketName, Key=s3_key)
@@ -28,31 +70,123 @@ class BucketS3Connector:
         data_json = json.load(response['Body'])
         return data_json
 
-    def get_df_parquet_object(self,s3_key):
-        s3_keys = [s3_key]
+    def list_objects(self, prefix, suffix="", start_after:str=None, end_before:str=None) -> dict:
+        '''
+            {key: ETag} of every object under prefix (paginated, no 1000 keys cap).
+            Keys come back in lexicographic order: listing starts after start_after
+            and stops at the first key >= end_before
+        '''
+        paginator = self.conn.get_paginator("list_objects_v2")
+        request = {"Bucket": self.bucketName, "Prefix": prefix}
+        if start_after:
+            request["StartAfter"] = start_after
+        objects = {}
+        for page in paginator.paginate(**request):
+            for item in page.get('Contents', []):
+                if end_before is not None and item['Key'] >= end_before:
+                    return objects
+                if item['Key'].endswith(suffix):
+                    objects[item['Key']] = item['ETag'].strip('"')
+        return objects
+
+    def list_keys(self, prefix, suffix=""):
+        return list(self.list_objects(prefix, suffix))
+
+    def get_object_etag(self, s3_key) -> str:
+        response = self.conn.head_object(Bucket=self.bucketName, Key=s3_key)
+        return response['ETag'].strip('"')
+
+    def get_parquet_objects(self, s3_key) -> dict:
+        '''
+            {key: ETag} of the parquet files behind s3_key (a file, or a prefix ending in "/")
+        '''
         if(s3_key.endswith("/")):
-            '''
-                filer parquet files from s3_key        
-            '''
-            objects  = self.conn.list_objects_v2(Bucket=self.bucketName, Prefix=s3_key)
-            s3_keys = [item['Key'] for item in objects ['Contents'] if item['Key'].endswith('.parquet')]
-            if not s3_keys:
+            objects = self.list_objects(s3_key, ".parquet")
+            if not objects:
                 raise Exception('No parquet found in'+ s3_key)
-            
+            return objects
+        return {s3_key: self.get_object_etag(s3_key)}
+
+    def get_object_if_changed(self, s3_key, etag:str=None) -> tuple:
         '''
-            read parquet files from s3_keys
+            (body, ETag) of s3_key; body is None when the object still has `etag`.
+            Returns None when the object does not exist.
         '''
-        
-        df:DataFrame = None
+        request = {"Bucket": self.bucketName, "Key": s3_key}
+        if etag:
+            request["IfNoneMatch"] = f'"{etag}"'
+        try:
+            response = self.conn.get_object(**request)
+        except ClientError as e:
+            code = e.response.get("Error", {}).get("Code")
+            if code in ("304", "NotModified"):
+                return None, etag
+            if code in ("NoSuchKey", "404"):
+                return None
+            raise
+        return response['Body'].read(), response['ETag'].strip('"')
 
-        for s3_key in s3_keys:
-            response = self.conn.get_object(Bucket=self.bucketName, Key=s3_key)
-            response = io.BytesIO(response['Body'].read())
+    def read_parquet_object(self, s3_key, columns:Sequence[str]=None) -> DataFrame:
+        response = self.conn.get_object(Bucket=self.bucketName, Key=s3_key)
+        return read_parquet(io.BytesIO(response['Body'].read()), columns=columns)
+
+    def read_parquet_objects(self, s3_keys:Sequence[str], columns:Sequence[str]=None, max_workers:int=MAX_FETCH_WORKERS) -> DataFrame:
+        '''
+            read parquet files from s3_keys concurrently (only the requested columns)
+            and concatenate them once
+        '''
+        if len(s3_keys) == 1:
+            return self.read_parquet_object(s3_keys[0], columns)
 
-            if(df is None):
-                df = read_parquet(response)
-            else:
-                df = df.vstack(read_parquet(response))
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(s3_keys))) as pool:
+            frames = list(pool.map(lambda key: self.read_parquet_object(key, columns), s3_keys))
+
+        return concat(frames, how="vertical", rechunk=True)
+
+    def scan_parquet_object(self, s3_key) -> LazyFrame:
+        '''
+            lazy scan: projections and predicates are pushed down to the parquet
+            row groups, so only matching column chunks are downloaded
+        '''
+        return scan_parquet(f"s3://{self.bucketName}/{s3_key}", storage_options=self.storage_options)
 
+    def get_df_parquet_versioned(self, s3_key, columns:Sequence[str]=None, max_workers:int=MAX_FETCH_WORKERS) -> tuple:
+        '''
+            (DataFrame, ETag) for s3_key. Frames come from the in-process cache; entries
+            older than the cache TTL are revalidated with one HEAD (file) or listing (prefix)
+            and only downloaded again when the ETag changed.
+        '''
+        columns = list(columns) if columns is not None else None
+        cache_key = (s3_key, tuple(columns) if columns is not None else None)
+        entry = self.cache.get(cache_key)
+        if self.cache.is_fresh(entry):
+            return entry.value, entry.etag
+
+        objects = self.get_parquet_objects(s3_key)
+        etag = objects_etag(objects)
+        if entry is not None and entry.etag == etag:
+            self.cache.revalidated(entry)
+            return entry.value, etag
+
+        df = self.read_parquet_objects(list(objects), columns, max_workers)
+        self.cache.put(cache_key, df, etag, df.estimated_size())
+        return df, etag
+
+    def get_df_parquet_object(self, s3_key, columns:Sequence[str]=None, max_workers:int=MAX_FETCH_WORKERS) -> DataFrame:
+        df, _ = self.get_df_parquet_versioned(s3_key, columns, max_workers)
         return df
-    
\ No newline at end of file
+
+_connectors = {}
+_connectors_lock = Lock()
+
+def get_bucket_connector(envBucket) -> BucketS3Connector:
+    '''
+        lazily built connector shared across requests and warm Lambda invocations
+    '''
+    connector = _connectors.get(envBucket)
+    if connector is None:
+        with _connectors_lock:
+            connector = _connectors.get(envBucket)
+            if connector is None:
+                connector = _connectors[envBucket] = BucketS3Connector(envBucket)
+    return connector
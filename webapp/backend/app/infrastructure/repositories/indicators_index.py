@@ -0,0 +1,92 @@
+'''
+    date sorted, in-memory view of trips_uber_summary/indicators.parquet.
+    Trailing WINDOW row sums, means and the row with the most trips are precomputed
+    once, so every lookup is a binary search on the dates.
+'''
+import numpy as np
+from datetime import date
+from polars import DataFrame, Date, col
+from numpy.lib.stride_tricks import sliding_window_view
+
+WINDOW = 7
+
+
+def _trailing_sum(values:np.ndarray, window:int) -> np.ndarray:
+    prefix = np.concatenate([[0], np.cumsum(values)])
+    idx = np.arange(len(values))
+    return prefix[idx + 1] - prefix[np.maximum(idx + 1 - window, 0)]
+
+
+def _trailing_argmax(values:np.ndarray, window:int) -> np.ndarray:
+    '''
+        position of the max in each trailing window, the latest one on ties
+    '''
+    padded = np.concatenate([np.full(window - 1, -np.inf), values.astype(np.float64)])
+    windows = sliding_window_view(padded, window)[:, ::-1]
+    return np.arange(len(values)) - np.argmax(windows, axis=1)
+
+
+class IndicatorsIndex:
+
+    def __init__(self, df_indicators:DataFrame, etag:str=None, window:int=WINDOW) -> None:
+        df_indicators = df_indicators.with_columns(col("date").cast(Date)).sort("date")
+        self.etag = etag
+        self.window = window
+        self.dates = df_indicators["date"].to_numpy().astype("datetime64[D]")
+
+        sum_trips = df_indicators["sum_trips"].fill_null(0).to_numpy()
+        sum_anomalies = df_indicators["sum_anomalies"].fill_null(0).to_numpy()
+        demand = df_indicators["increased_demand_pct"].cast(float).to_numpy()
+        demand_valid = ~np.isnan(demand)
+
+        self.sum_trips = sum_trips
+        self.sum_anomalies = sum_anomalies
+        self.total_trips = _trailing_sum(sum_trips, window)
+        self.total_anomalies = _trailing_sum(sum_anomalies, window)
+        self.demand_sum = _trailing_sum(np.where(demand_valid, demand, 0.0), window)
+        self.demand_count = _trailing_sum(demand_valid.astype(np.int64), window)
+        self.max_position = _trailing_argmax(sum_trips, window)
+        self.hot_location = df_indicators["hot_location"].to_list()
+        self.rush_hour = df_indicators["rush_hour"].to_list()
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def position(self, date_code:str) -> int:
+        '''
+            last row dated on or before date_code, -1 when there is none
+        '''
+        return int(np.searchsorted(self.dates, np.datetime64(date.fromisoformat(date_code), "D"), side="right")) - 1
+
+    def get_indicators(self, date_code:str) -> dict:
+        data_js = {}
+        data_js["date"] = date_code
+        data_js["total_trips"] = None
+        data_js["total_anomalies"] = None
+        data_js["increased_demand_pct"] = None
+        data_js["hot_location"] = None
+        data_js["rush_hour"] = None
+
+        pos = self.position(date_code)
+        if pos >= 0:
+            top = self.max_position[pos]
+            demand_count = self.demand_count[pos]
+            data_js["total_trips"] = self.total_trips[pos].item()
+            data_js["total_anomalies"] = self.total_anomalies[pos].item()
+            data_js["increased_demand_pct"] = (self.demand_sum[pos] / demand_count).item() if demand_count else None
+            data_js["hot_location"] = self.hot_location[top]
+            data_js["rush_hour"] = self.rush_hour[top]
+
+        return data_js
+
+    def get_summary_trips(self, date_code:str) -> list:
+        '''
+            the trailing rows, latest first
+        '''
+        pos = self.position(date_code)
+        rows = range(pos, max(pos - self.window, -1), -1)
+        return [{
+            "date": self.dates[i].item(),
+            "total_normal": (self.sum_trips[i] - self.sum_anomalies[i]).item(),
+            "total_anomalies": self.sum_anomalies[i].item()
+        } for i in rows]
@@ -1,17 +1,153 @@
-from ..connectors.buckets3_connector import BucketS3Connector
-from polars import DataFrame
+import time
+import asyncio
+from datetime import date, timedelta
+from threading import Lock, Thread
+from ..connectors.buckets3_connector import BucketS3Connector, get_bucket_connector, objects_etag
+from ...utils.lru_cache import CACHE_TTL_SECONDS
+from .indicators_index import IndicatorsIndex
+from polars import DataFrame, col, concat, lit, Utf8
+from typing import Sequence
+from ...utils import enum
 
 class TripsRepository:
 
-    def __init__(self) -> None:
-        self.bucket = BucketS3Connector("BUCKET_UBER")
+    INDICATORS_KEY = "trips_uber_summary/indicators.parquet"
 
-    async def get_trips(self, type_code:str, date_code:str) -> DataFrame:
-        data = self.bucket.get_df_parquet_object(f"trips_uber/type_code={type_code}/date_code={date_code}/")
+    def __init__(self, bucket:BucketS3Connector=None, refresh_seconds:float=CACHE_TTL_SECONDS) -> None:
+        self.bucket = bucket or get_bucket_connector("BUCKET_UBER")
+        self.refresh_seconds = refresh_seconds
+        self._indicators:IndicatorsIndex = None
+        self._indicators_checked = 0.0
+        self._indicators_lock = Lock()
+        self._refresh_lock = Lock()
+        self._indicators_refreshing = False
+
+    '''
+        boto3 calls block, so they run in worker threads and never stall the event loop.
+        Every read returns (DataFrame, ETag of the source objects).
+    '''
+    async def get_trips(self, type_code:str, date_code:str, columns:Sequence[str]=None) -> tuple:
+        data = await asyncio.to_thread(self.bucket.get_df_parquet_versioned
+                                       ,f"trips_uber/type_code={type_code}/date_code={date_code}/"
+                                       ,columns=columns)
         
         return data
     
-    async def get_indicators(self) -> DataFrame:
-        data = self.bucket.get_df_parquet_object(f"trips_uber_summary/indicators.parquet")
+    async def get_trips_payload(self, date_code:str, etag:str=None) -> tuple:
+        '''
+            pre-built gzip JSON payload published by the pipeline for date_code:
+            (body, ETag), body None when unchanged since `etag`; None when not published
+        '''
+        data = await asyncio.to_thread(self.bucket.get_object_if_changed
+                                       ,f"trips_uber_serving/date_code={date_code}/trips.json.gz"
+                                       ,etag)
         
-        return data
\ No newline at end of file
+        return data
+
+    async def get_cells_payload(self, date_code:str, etag:str=None) -> tuple:
+        '''
+            gzip JSON cells and trips per hour published next to the trips payload,
+            same contract as get_trips_payload
+        '''
+        data = await asyncio.to_thread(self.bucket.get_object_if_changed
+                                       ,f"trips_uber_serving/date_code={date_code}/cells.json.gz"
+                                       ,etag)
+        
+        return data
+
+    async def list_range(self, date_from:str, date_to:str, type_codes:Sequence[str]=None) -> tuple:
+        '''
+            gold files of every date in [date_from, date_to] and type in type_codes (default both):
+            ([(key, type_code, date_code)], ETag of the files), ETag None when nothing matches.
+            One listing per type, starting at date_from and stopping after date_to.
+        '''
+        date_from, date_to = date.fromisoformat(date_from), date.fromisoformat(date_to)
+        type_codes = list(type_codes or [t.value for t in enum.TYPE_TRIP])
+        prefixes = [f"trips_uber/type_code={type_code}/" for type_code in type_codes]
+        listings = await asyncio.gather(*[
+            asyncio.to_thread(self.bucket.list_objects, prefix, ".parquet"
+                              ,f"{prefix}date_code={date_from.isoformat()}"
+                              ,f"{prefix}date_code={(date_to + timedelta(days=1)).isoformat()}")
+            for prefix in prefixes
+        ])
+
+        files, objects = [], {}
+        for type_code, listing in zip(type_codes, listings):
+            for key, etag in listing.items():
+                date_code = self._partition_value(key, "date_code")
+                if date_code is not None and date_from.isoformat() <= date_code <= date_to.isoformat():
+                    files.append((key, type_code, date_code))
+                    objects[key] = etag
+
+        return files, objects_etag(objects) if objects else None
+
+    def collect_range(self, files:Sequence[tuple], columns:Sequence[str]=None, min_value:float=None) -> DataFrame:
+        '''
+            rows of the files from list_range with type_code and date_code columns. Files are
+            scanned lazily with the column projection and the min_value predicate pushed down
+            to the row groups. Blocking: call it from a worker thread.
+        '''
+        frames = []
+        for key, type_code, date_code in files:
+            lf = self.bucket.scan_parquet_object(key)
+            if min_value is not None:
+                lf = lf.filter(col("value") >= min_value)
+            if columns is not None:
+                lf = lf.select(list(columns))
+            frames.append(lf.with_columns(type_code = lit(type_code, Utf8), date_code = lit(date_code, Utf8)))
+        # The concatenated scans run in parallel inside polars
+        return concat(frames, how="vertical_relaxed").collect()
+
+    @staticmethod
+    def _partition_value(key:str, name:str) -> str:
+        for part in key.split("/"):
+            if part.startswith(name + "="):
+                return part[len(name) + 1:]
+        return None
+
+    async def get_indicators(self) -> tuple:
+        data = await asyncio.to_thread(self.bucket.get_df_parquet_versioned, self.INDICATORS_KEY)
+        
+        return data
+
+    async def get_indicators_index(self) -> IndicatorsIndex:
+        '''
+            indexed indicators, loaded once per container. Once older than refresh_seconds
+            the current index keeps being served while a background thread rebuilds it
+            if the object's ETag changed.
+        '''
+        if self._indicators is None:
+            await asyncio.to_thread(self._refresh_indicators)
+        elif time.monotonic() - self._indicators_checked >= self.refresh_seconds:
+            with self._indicators_lock:
+                start = not self._indicators_refreshing
+                self._indicators_refreshing = True
+            if start:
+                Thread(target=self._refresh_indicators, daemon=True).start()
+
+        return self._indicators
+
+    def _refresh_indicators(self) -> None:
+        try:
+            with self._refresh_lock:
+                if self._indicators is not None and time.monotonic() - self._indicators_checked < self.refresh_seconds:
+                    return
+                etag = self.bucket.get_object_etag(self.INDICATORS_KEY)
+                if self._indicators is None or self._indicators.etag != etag:
+                    self._indicators = IndicatorsIndex(self.bucket.read_parquet_object(self.INDICATORS_KEY), etag)
+                self._indicators_checked = time.monotonic()
+        finally:
+            with self._indicators_lock:
+                self._indicators_refreshing = False
+
+
+_repository:TripsRepository = None
+
+def get_trips_repository() -> TripsRepository:
+    '''
+        module level repository, reused across warm Lambda invocations
+    '''
+    global _repository
+    if _repository is None:
+        _repository = TripsRepository()
+    return _repository
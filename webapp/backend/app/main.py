@@ -1,10 +1,19 @@
 from fastapi import FastAPI
-from mangum import Mangum
 from .application import trips_api
 
 app = FastAPI(title="Api Trips Uber")
 
 app.include_router(trips_api)
-handler = Mangum(app)
 
+'''
+    Lambda entry point. The Mangum adapter is built by the first invocation and
+    reused by the warm ones, so the init phase only pays for FastAPI and the routes.
+'''
+_handler = None
 
+def handler(event, context):
+    global _handler
+    if _handler is None:
+        from mangum import Mangum
+        _handler = Mangum(app)
+    return _handler(event, context)
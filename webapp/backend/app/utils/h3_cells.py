@@ -0,0 +1,42 @@
+'''
+    H3 helpers for map slices: the map zoom level picks the H3 resolution the
+    trips are aggregated to, so zoomed out views ship a few coarse cells.
+'''
+import h3
+from functools import lru_cache
+from typing import Sequence
+
+# (max zoom, resolution): zoom <= 9 -> 5, 10 -> 6, 11 -> 7, ... (None = source resolution)
+ZOOM_RESOLUTIONS = [(9, 5), (10, 6), (11, 7), (12, 8)]
+
+
+def resolution_for_zoom(zoom:int) -> int:
+    if zoom is None:
+        return None
+    for max_zoom, resolution in ZOOM_RESOLUTIONS:
+        if zoom <= max_zoom:
+            return resolution
+    return None
+
+
+@lru_cache(maxsize=65536)
+def parent_cell(cell:str, resolution:int) -> tuple:
+    '''
+        (parent cell, lat, lon) of cell at resolution (the cell itself when it is not finer)
+    '''
+    if h3.get_resolution(cell) > resolution:
+        cell = h3.cell_to_parent(cell, resolution)
+    lat, lon = h3.cell_to_latlng(cell)
+    return cell, lat, lon
+
+
+def parent_cells(cells:Sequence[str], resolution:int) -> list:
+    return [parent_cell(cell, resolution) for cell in cells]
+
+
+@lru_cache(maxsize=65536)
+def cell_center(cell:str) -> tuple:
+    '''
+        (lat, lon) of the center of cell, the centroid the pipeline stores with it
+    '''
+    return h3.cell_to_latlng(cell)
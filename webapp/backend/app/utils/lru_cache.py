@@ -0,0 +1,66 @@
+'''
+    size bounded LRU cache shared by the requests of a warm Lambda container.
+    Entries remember the ETag they were built from and when it was last checked
+    against S3, so callers only revalidate entries older than ttl_seconds.
+'''
+import time
+from os import environ
+from threading import Lock
+from collections import OrderedDict
+
+CACHE_MAX_MB = int(environ.get("CACHE_MAX_MB", "256"))
+CACHE_TTL_SECONDS = float(environ.get("CACHE_TTL_SECONDS", "60"))
+
+
+class CacheEntry:
+    def __init__(self, value, etag:str, size:int) -> None:
+        self.value = value
+        self.etag = etag
+        self.size = size
+        self.validated_at = time.monotonic()
+
+    def age(self) -> float:
+        return time.monotonic() - self.validated_at
+
+
+class LRUCache:
+
+    def __init__(self, max_bytes:int=CACHE_MAX_MB * 1024 * 1024, ttl_seconds:float=CACHE_TTL_SECONDS) -> None:
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key) -> CacheEntry:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def is_fresh(self, entry:CacheEntry) -> bool:
+        return entry is not None and entry.age() < self.ttl_seconds
+
+    def revalidated(self, entry:CacheEntry) -> None:
+        entry.validated_at = time.monotonic()
+
+    def put(self, key, value, etag:str, size:int) -> CacheEntry:
+        entry = CacheEntry(value, etag, size)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= previous.size
+            # Values larger than the whole budget are returned but not kept
+            if size <= self.max_bytes:
+                self._entries[key] = entry
+                self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.total_bytes -= evicted.size
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
@@ -0,0 +1,178 @@
+'''
+    End-to-end load benchmark of the trips API, runnable offline.
+
+    Generates a synthetic gold layer (days x cells x hours) into a local S3 stand-in,
+    starts the backend with uvicorn in its own process and drives /values, /indicators
+    and /history_events at the given concurrency. Reports latency percentiles,
+    response bytes and the peak memory of the backend process per endpoint.
+
+    From webapp/backend:
+        python -m benchmarks.api_load --days 30 --cells 500 --concurrency 8 --requests 200
+        python -m benchmarks.api_load --serving --endpoints values --concurrency 32
+        python -m benchmarks.api_load --json results.json
+'''
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import subprocess
+import numpy as np
+from pathlib import Path
+from .local_s3 import BUCKET, backend_env, free_port, local_s3, s3_client
+from .datagen import write_dataset
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+ENDPOINTS = {
+    "values": "/api/uber-trips/values",
+    "indicators": "/api/uber-trips/indicators",
+    "history_events": "/api/uber-trips/history_events"
+}
+PERCENTILES = [50, 90, 95, 99]
+
+
+def process_tree(pid:int) -> list:
+    '''
+        pid and its descendants (Linux /proc), the uvicorn workers when there are several
+    '''
+    pids = [pid]
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            for child in f.read().split():
+                pids.extend(process_tree(int(child)))
+    except OSError:
+        pass
+    return pids
+
+
+def peak_rss_mb(pid:int) -> float:
+    '''
+        largest resident memory high water mark among the backend processes, None off Linux
+    '''
+    peaks = []
+    for process in process_tree(pid):
+        try:
+            with open(f"/proc/{process}/status") as f:
+                peaks.extend(int(line.split()[1]) / 1024 for line in f if line.startswith("VmHWM:"))
+        except OSError:
+            pass
+    return max(peaks) if peaks else None
+
+
+def start_backend(env:dict, port:int, workers:int) -> subprocess.Popen:
+    command = [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+               "--workers", str(workers), "--log-level", "warning", "--no-access-log"]
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+
+
+async def wait_ready(client, timeout:float=30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            await client.get("/docs")
+            return
+        except Exception:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("backend did not start")
+
+
+async def drive(client, path:str, dates:list, n_requests:int, concurrency:int, seed:int) -> dict:
+    '''
+        n_requests GETs of path over random dates, at most `concurrency` in flight
+    '''
+    rng = random.Random(seed)
+    queue = [rng.choice(dates) for _ in range(n_requests)]
+    latencies, sizes, errors = [], [], 0
+
+    async def worker():
+        nonlocal errors
+        while queue:
+            date_code = queue.pop()
+            started = time.perf_counter()
+            response = await client.get(path, params={"date_code": date_code})
+            latencies.append(time.perf_counter() - started)
+            sizes.append(len(response.content))
+            if response.status_code != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "requests": n_requests,
+        "errors": errors,
+        "rps": n_requests / elapsed,
+        **{f"p{p}_ms": float(np.percentile(latencies_ms, p)) for p in PERCENTILES},
+        "max_ms": float(latencies_ms.max()),
+        "bytes": int(sum(sizes)),
+        "mean_bytes": float(np.mean(sizes))
+    }
+
+
+async def run(args, base_url:str, dates:list, backend:subprocess.Popen) -> dict:
+    import httpx
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = {}
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        await wait_ready(client)
+        for endpoint in args.endpoints:
+            results[endpoint] = await drive(client, ENDPOINTS[endpoint], dates, args.requests, args.concurrency, args.seed)
+            results[endpoint]["peak_rss_mb"] = peak_rss_mb(backend.pid)
+    return results
+
+
+def report(results:dict) -> None:
+    header = f"{'endpoint':<15}{'req':>6}{'err':>5}{'rps':>8}" + "".join(f"{f'p{p}':>9}" for p in PERCENTILES) \
+        + f"{'max':>9}{'MB out':>9}{'KB/req':>9}{'peak MB':>9}"
+    print(header)
+    for endpoint, r in results.items():
+        peak = f"{r['peak_rss_mb']:>9.1f}" if r["peak_rss_mb"] is not None else f"{'-':>9}"
+        print(f"{endpoint:<15}{r['requests']:>6}{r['errors']:>5}{r['rps']:>8.1f}"
+              + "".join(f"{r[f'p{p}_ms']:>9.1f}" for p in PERCENTILES)
+              + f"{r['max_ms']:>9.1f}{r['bytes'] / 2**20:>9.2f}{r['mean_bytes'] / 1024:>9.1f}{peak}")
+    print("latencies in ms; peak MB is the backend resident memory high water mark after each endpoint")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--cells", type=int, default=500)
+    parser.add_argument("--hours", type=int, default=24)
+    parser.add_argument("--serving", action="store_true", help="also publish the per-date serving payloads")
+    parser.add_argument("--endpoints", nargs="+", default=list(ENDPOINTS), choices=list(ENDPOINTS))
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    parser.add_argument("--dates", type=int, default=None, help="distinct dates requested (default: all)")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    with local_s3() as endpoint:
+        started = time.perf_counter()
+        dataset = write_dataset(s3_client(endpoint), BUCKET, days=args.days, cells=args.cells, hours=args.hours,
+                                seed=args.seed, serving=args.serving)
+        print(f"{dataset['rows']} rows, {dataset['bytes'] / 2**20:.1f} MB in {len(dataset['dates'])} days "
+              f"({time.perf_counter() - started:.1f} s to generate)")
+        dates = dataset["dates"][-args.dates:] if args.dates else dataset["dates"]
+
+        port = free_port()
+        backend = start_backend({**os.environ, **backend_env(endpoint)}, port, args.workers)
+        try:
+            results = asyncio.run(run(args, f"http://127.0.0.1:{port}", dates, backend))
+        finally:
+            backend.terminate()
+            backend.wait()
+
+    report(results)
+    if args.json:
+        Path(args.json).write_text(json.dumps({"args": vars(args), "dataset": {k: v for k, v in dataset.items() if k != "dates"},
+                                               "results": results}, indent=2))
+    return 1 if any(r["errors"] for r in results.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
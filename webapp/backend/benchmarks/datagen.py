@@ -0,0 +1,152 @@
+'''
+    synthetic gold layer for the benchmarks, laid out like the pipeline uploads it:
+    trips_uber/type_code=.../date_code=YYYY-MM-DD/part-0.parquet per type and date
+    and trips_uber_summary/indicators.parquet, optionally with the per-date serving
+    payloads (trips_uber_serving/date_code=YYYY-MM-DD/trips.json.gz and cells.json.gz)
+    the pipeline publishes. Scale is days x cells x hours rows.
+'''
+import io
+import gzip
+import json
+import h3
+import numpy as np
+from datetime import date, timedelta
+from polars import DataFrame, col
+
+GOLD_PREFIX = "trips_uber"
+INDICATORS_KEY = "trips_uber_summary/indicators.parquet"
+SERVING_PREFIX = "trips_uber_serving"
+START_DATE = date(2014, 4, 1)
+# Manhattan, at the resolution the pipeline aggregates to
+CENTER = (40.758, -73.9855)
+RESOLUTION = 8
+ANOMALY_RATE = 0.05
+
+
+def city_cells(n_cells:int, center:tuple=CENTER, resolution:int=RESOLUTION) -> list:
+    '''
+        n_cells H3 cells in rings around center, nearest first
+    '''
+    origin = h3.latlng_to_cell(center[0], center[1], resolution)
+    cells, k = [origin], 0
+    while len(cells) < n_cells:
+        k += 1
+        cells.extend(sorted(h3.grid_ring(origin, k)))
+    return cells[:n_cells]
+
+
+def hour_profile(hours:int) -> np.ndarray:
+    '''
+        relative demand per hour: quiet nights, morning and evening peaks
+    '''
+    hour = np.arange(hours) % 24
+    return 0.2 + np.exp(-((hour - 8) ** 2) / 6) + 1.3 * np.exp(-((hour - 18) ** 2) / 8)
+
+
+def day_frame(day:date, cells:list, hours:int, rng:np.random.Generator) -> DataFrame:
+    '''
+        one row per (hour, cell) with trips, anomaly score and flag; busier cells near the center
+    '''
+    n_cells = len(cells)
+    lat_lon = np.array([h3.cell_to_latlng(cell) for cell in cells])
+    cell_weight = 1.0 / (1.0 + np.arange(n_cells) / 20)
+    expected = 40 * np.outer(hour_profile(hours), cell_weight) * (1.15 if day.weekday() >= 4 else 1.0)
+    value = rng.poisson(expected).ravel()
+    score = rng.normal(0.0, 0.1, value.size)
+    is_anomaly = rng.random(value.size) < ANOMALY_RATE
+    score[is_anomaly] -= 0.3
+    hour_starts = (np.datetime64(day, "h") + np.arange(hours)).astype("datetime64[us]")
+    return DataFrame({
+        "timestamp": np.repeat(hour_starts, n_cells),
+        "h3_index": np.tile(cells, hours),
+        "centroid_lat": np.tile(lat_lon[:, 0], hours),
+        "centroid_lon": np.tile(lat_lon[:, 1], hours),
+        "value": value.astype(np.int64),
+        "anomaly_score": score,
+        "is_anomaly": is_anomaly
+    }).filter(col("value") > 0)
+
+
+def parquet_bytes(df:DataFrame) -> bytes:
+    buffer = io.BytesIO()
+    df.write_parquet(buffer, compression="zstd", statistics=True)
+    return buffer.getvalue()
+
+
+def serving_payload(df:DataFrame) -> bytes:
+    '''
+        {type_code: {'time_index': [...], 'data': [[[lat, lon], ...] per hour]}}, gzip JSON
+        with a fixed mtime, as anomaly_detector.domain.serving writes it
+    '''
+    payload = {}
+    for type_code, is_anomaly in (("anomalous", True), ("non_anomalous", False)):
+        hours = df.filter(col("is_anomaly") == is_anomaly).group_by("timestamp", maintain_order=True).agg(
+            col("centroid_lat"), col("centroid_lon")).sort("timestamp")
+        payload[type_code] = {
+            "time_index": [t.isoformat() for t in hours["timestamp"]],
+            "data": [[[lat, lon] for lat, lon in zip(lats, lons)] for lats, lons in zip(hours["centroid_lat"], hours["centroid_lon"])]
+        }
+    return gzip.compress(json.dumps(payload, separators=(",", ":")).encode(), compresslevel=6, mtime=0)
+
+
+def cells_payload(df:DataFrame) -> bytes:
+    '''
+        {type_code: {'time_index': [...], 'cells': [[h3, ...] per hour], 'value': [[trips, ...] per hour]}},
+        gzip JSON, the source of the map slices
+    '''
+    payload = {}
+    for type_code, is_anomaly in (("anomalous", True), ("non_anomalous", False)):
+        hours = df.filter(col("is_anomaly") == is_anomaly).group_by("timestamp", maintain_order=True).agg(
+            col("h3_index"), col("value")).sort("timestamp")
+        payload[type_code] = {
+            "time_index": [t.isoformat() for t in hours["timestamp"]],
+            "cells": hours["h3_index"].to_list(),
+            "value": hours["value"].to_list()
+        }
+    return gzip.compress(json.dumps(payload, separators=(",", ":")).encode(), compresslevel=6, mtime=0)
+
+
+def write_dataset(s3, bucket:str, days:int=30, cells:int=500, hours:int=24, seed:int=0,
+                  start:date=START_DATE, serving:bool=False) -> dict:
+    '''
+        creates the bucket and uploads the gold partitions and the indicators file
+        (and the serving payloads when serving is set).
+        Returns the dates written, row count and uploaded bytes
+    '''
+    rng = np.random.default_rng(seed)
+    cell_ids = city_cells(cells)
+    s3.create_bucket(Bucket=bucket)
+    rows, uploaded, daily = 0, 0, []
+    for d in range(days):
+        day = start + timedelta(days=d)
+        df = day_frame(day, cell_ids, hours, rng)
+        for type_code, is_anomaly in (("anomalous", True), ("non_anomalous", False)):
+            body = parquet_bytes(df.filter(col("is_anomaly") == is_anomaly).sort("timestamp", "h3_index"))
+            s3.put_object(Bucket=bucket, Key=f"{GOLD_PREFIX}/type_code={type_code}/date_code={day}/part-0.parquet", Body=body)
+            uploaded += len(body)
+        if serving:
+            for name, body in (("trips.json.gz", serving_payload(df)), ("cells.json.gz", cells_payload(df))):
+                s3.put_object(Bucket=bucket, Key=f"{SERVING_PREFIX}/date_code={day}/{name}", Body=body)
+                uploaded += len(body)
+        rows += df.height
+        by_hour = df.group_by(df["timestamp"].dt.hour().alias("hour")).agg(col("value").sum()).sort("value")
+        by_cell = df.group_by("h3_index").agg(col("value").sum()).sort("value")
+        daily.append({
+            "date": day,
+            "sum_trips": int(df["value"].sum()),
+            "sum_anomalies": int(df.filter(col("is_anomaly"))["value"].sum()),
+            "rush_hour": int(by_hour["hour"][-1]),
+            "hot_location": by_cell["h3_index"][-1]
+        })
+
+    # Demand change against the mean of the previous 7 days (null on the first one)
+    trips = np.array([row["sum_trips"] for row in daily], dtype=np.float64)
+    for i, row in enumerate(daily):
+        previous = trips[max(i - 7, 0):i]
+        row["increased_demand_pct"] = float((trips[i] / previous.mean() - 1) * 100) if len(previous) else None
+    indicators = DataFrame(daily)
+    body = parquet_bytes(indicators)
+    s3.put_object(Bucket=bucket, Key=INDICATORS_KEY, Body=body)
+    uploaded += len(body)
+
+    return {"dates": [str(row["date"]) for row in daily], "rows": rows, "bytes": uploaded}
@@ -0,0 +1,54 @@
+'''
+    local S3 stand-in for the benchmarks: a moto server on 127.0.0.1 and the
+    environment the backend needs to talk to it (BUCKET_UBER + AWS_ENDPOINT_URL).
+'''
+import socket
+import logging
+from contextlib import contextmanager
+
+BUCKET = "uber-trips-bench"
+REGION = "us-east-1"
+ACCESS_KEY = "bench"
+SECRET_KEY = "bench"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def backend_env(endpoint:str, bucket:str=BUCKET) -> dict:
+    '''
+        variables of a backend process pointed at the local bucket
+    '''
+    return {
+        "BUCKET_UBER": f"{ACCESS_KEY}:{SECRET_KEY}@s3/{REGION}/{bucket}",
+        "AWS_ENDPOINT_URL": endpoint,
+        "AWS_ACCESS_KEY_ID": ACCESS_KEY,
+        "AWS_SECRET_ACCESS_KEY": SECRET_KEY,
+        "AWS_DEFAULT_REGION": REGION
+    }
+
+
+def s3_client(endpoint:str):
+    import boto3
+    return boto3.client("s3", region_name=REGION, endpoint_url=endpoint,
+                        aws_access_key_id=ACCESS_KEY, aws_secret_access_key=SECRET_KEY)
+
+
+@contextmanager
+def local_s3(port:int=None):
+    '''
+        runs a moto S3 server for the duration of the block and yields its endpoint URL
+    '''
+    from moto.server import ThreadedMotoServer
+    # one access log line per S3 call would drown the results
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    port = port or free_port()
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=port, verbose=False)
+    server.start()
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.stop()
@@ -0,0 +1,153 @@
+'''
+    Lambda cold start benchmark, runnable offline.
+
+    Every run starts a fresh interpreter (a new container) against a local S3 stand-in
+    and records the time to import app.main, the first invocation of the handler
+    (lazy imports, connector, first S3 reads) and the following warm invocations.
+
+    From webapp/backend:
+        python -m benchmarks.startup --runs 5
+        python -m benchmarks.startup --save startup_baseline.json
+        python -m benchmarks.startup --baseline startup_baseline.json --max-regression 0.25
+'''
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+ROUTES = {
+    "values": "/api/uber-trips/values",
+    "indicators": "/api/uber-trips/indicators",
+    "history_events": "/api/uber-trips/history_events"
+}
+METRICS = ["import_ms", "first_request_ms", "cold_start_ms", "warm_request_ms"]
+
+
+class LambdaContext:
+    function_name = "api-trips-uber-bench"
+    aws_request_id = "bench"
+
+
+def http_event(path:str, query:str) -> dict:
+    '''
+        API Gateway HTTP API (payload 2.0) GET event, as Lambda hands it to Mangum
+    '''
+    return {
+        "version": "2.0",
+        "routeKey": "$default",
+        "rawPath": path,
+        "rawQueryString": query,
+        "headers": {"host": "localhost", "accept": "application/json"},
+        "requestContext": {
+            "http": {"method": "GET", "path": path, "protocol": "HTTP/1.1", "sourceIp": "127.0.0.1", "userAgent": "bench"},
+            "stage": "$default"
+        },
+        "isBase64Encoded": False
+    }
+
+
+def probe(route:str, date_code:str, warm_requests:int) -> dict:
+    '''
+        runs inside the fresh interpreter: one cold invocation, then warm_requests warm ones
+    '''
+    started = time.perf_counter()
+    from app.main import handler
+    imported = time.perf_counter()
+    event = http_event(ROUTES[route], f"date_code={date_code}")
+    response = handler(event, LambdaContext())
+    first = time.perf_counter()
+    if response["statusCode"] != 200:
+        raise RuntimeError(f"{route} answered {response['statusCode']}: {response['body'][:200]}")
+    warm = []
+    for _ in range(warm_requests):
+        t0 = time.perf_counter()
+        handler(event, LambdaContext())
+        warm.append(time.perf_counter() - t0)
+    return {
+        "import_ms": (imported - started) * 1000,
+        "first_request_ms": (first - imported) * 1000,
+        "cold_start_ms": (first - started) * 1000,
+        "warm_request_ms": statistics.median(warm) * 1000 if warm else None,
+        "modules": sorted(m for m in ("polars", "boto3", "h3", "mangum") if m in sys.modules)
+    }
+
+
+def run_probe(route:str, date_code:str, warm_requests:int, env:dict) -> dict:
+    command = [sys.executable, "-m", "benchmarks.startup", "--probe", route, "--date-code", date_code,
+               "--warm", str(warm_requests)]
+    done = subprocess.run(command, cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+    if done.returncode != 0:
+        raise RuntimeError(f"probe {route} failed:\n{done.stderr}")
+    return json.loads(done.stdout.strip().splitlines()[-1])
+
+
+def summarize(samples:list) -> dict:
+    summary = {}
+    for metric in METRICS:
+        values = sorted(s[metric] for s in samples if s[metric] is not None)
+        summary[metric] = {"median": statistics.median(values), "max": values[-1]}
+    return summary
+
+
+def regressions(results:dict, baseline:dict, max_regression:float) -> list:
+    found = []
+    for route, summary in results.items():
+        for metric in METRICS:
+            before = baseline.get(route, {}).get(metric, {}).get("median")
+            now = summary[metric]["median"]
+            if before and now > before * (1 + max_regression):
+                found.append(f"{route}.{metric}: {before:.1f} ms -> {now:.1f} ms")
+    return found
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--routes", nargs="+", default=list(ROUTES), choices=list(ROUTES))
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per route")
+    parser.add_argument("--warm", type=int, default=20, help="warm invocations per run")
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--cells", type=int, default=300)
+    parser.add_argument("--save", help="write the results as JSON (a baseline for later runs)")
+    parser.add_argument("--baseline", help="fail when a median is slower than this saved run")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="allowed slowdown vs the baseline")
+    parser.add_argument("--probe", choices=list(ROUTES), help=argparse.SUPPRESS)
+    parser.add_argument("--date-code", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.probe:
+        print(json.dumps(probe(args.probe, args.date_code, args.warm)))
+        return 0
+
+    from .local_s3 import BUCKET, backend_env, local_s3, s3_client
+    from .datagen import write_dataset
+
+    with local_s3() as endpoint:
+        dataset = write_dataset(s3_client(endpoint), BUCKET, days=args.days, cells=args.cells)
+        env = {**os.environ, **backend_env(endpoint)}
+        date_code = dataset["dates"][-1]
+        print(f"{dataset['rows']} rows over {args.days} days in {endpoint}, date_code={date_code}")
+
+        results = {}
+        for route in args.routes:
+            samples = [run_probe(route, date_code, args.warm, env) for _ in range(args.runs)]
+            results[route] = summarize(samples)
+            row = "  ".join(f"{m} {results[route][m]['median']:8.1f}" for m in METRICS)
+            print(f"{route:<15} {row}   (median ms of {args.runs}, loaded: {', '.join(samples[-1]['modules'])})")
+
+    if args.save:
+        Path(args.save).write_text(json.dumps(results, indent=2))
+    if args.baseline:
+        found = regressions(results, json.loads(Path(args.baseline).read_text()), args.max_regression)
+        for line in found:
+            print(f"REGRESSION {line}")
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,9 +10,11 @@
     }).addTo(map);
 
     // Global variables to store data and control state
-    let allData = []; // Stores all loaded anomaly data
-    let filteredData = []; // Stores data after applying filters (date, etc.)
-    let timeAxis = []; // Array of unique sorted timestamps for the date slider
+    let filteredData = []; // Points of the selected hour
+    let currentDate = null; // Date whose hours are being shown
+    const sliceCache = new Map(); // Hour slices by request, as promises (shared by prefetch and display)
+    const DETAIL_ZOOM = 12; // From this zoom on only the visible area is requested
+    const PREFETCH_CONCURRENCY = 4;
     let heatLayer; // heatmap puro
     let anomalyTooltipLayer; // Capa para markers de tooltips
     let heatmapAnomalousLayer;
@@ -40,69 +42,136 @@ document.addEventListener("DOMContentLoaded", () => {
 
   rangeHour.addEventListener("input", () => {
     rangeHourValue.textContent = rangeHour.value+':00';
-    applyFilters();
+    showHour(parseInt(rangeHour.value));
   });
-});
-
-
-
-
-    async function loadJSONData(dateStr) {
-  try {
-    const response = await fetch(`${window.env.API_URL}/api/uber-trips/values`, {
-      method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
-      body: JSON.stringify({ date_code: dateStr })
-    });
-
-    if (!response.ok) {
-      throw new Error('Error al obtener datos.');
-    }
 
-    const apiData = await response.json();
-const anomalousRaw = apiData.result?.anomalous?.data ?? [];
-const anomalousTime = apiData.result?.anomalous?.time_index ?? [];
-const normalRaw = apiData.result?.non_anomalous?.data ?? [];
-const normalTime = apiData.result?.non_anomalous?.time_index ?? [];
+  // Zooming changes the aggregation level and, when zoomed in, the requested area
+  map.on("moveend", () => {
+    if (currentDate) showHour(parseInt(rangeHour.value));
+  });
+});
 
 
 
-const anomalous = extractPoints(anomalousRaw).map(([lat, lng], i) => ({
-  lat, lng,
-  value: 10,
-  type: 'Anomalía',
-  level: 'critical',
-  timestamp: new Date(anomalousTime[i % anomalousTime.length] ?? Date.now()),
-  message: `Anomalía detectada el ${anomalousTime[i % anomalousTime.length] ?? 'desconocido'}`
-}));
 
-const normal = extractPoints(normalRaw).map(([lat, lng], i) => ({
-  lat, lng,
-  value: 2,
-  type: 'Normal',
-  level: 'info',
-  timestamp: new Date(normalTime[i % normalTime.length] ?? Date.now()),
-  message: `Dato normal detectado el ${normalTime[i % normalTime.length] ?? 'desconocido'}`
-}));
+    /**
+     * Query parameters describing the current view: the zoom (aggregation level)
+     * and, when zoomed in, the padded visible area rounded so small pans reuse the cache.
+     */
+function sliceParams() {
+  const zoom = map.getZoom();
+  const params = { zoom };
+  if (zoom >= DETAIL_ZOOM) {
+    const b = map.getBounds().pad(0.5);
+    params.bbox = [b.getWest(), b.getSouth(), b.getEast(), b.getNorth()].map(v => v.toFixed(2)).join(',');
+  }
+  return params;
+}
 
+    /**
+     * Fetches (once) the slice of trips between hourFrom and hourTo for the given view.
+     * @returns {Promise<Object>} The API result: {anomalous, non_anomalous}.
+     */
+function loadSlice(dateStr, hourFrom, hourTo, params) {
+  const query = new URLSearchParams({ date_code: dateStr, hour_from: hourFrom, hour_to: hourTo, ...params }).toString();
+  if (!sliceCache.has(query)) {
+    const request = fetch(`${window.env.API_URL}/api/uber-trips/values/slice?${query}`)
+      .then(response => {
+        if (!response.ok) {
+          throw new Error('Error al obtener datos.');
+        }
+        return response.json();
+      })
+      .then(apiData => apiData.result)
+      .catch(error => {
+        sliceCache.delete(query);
+        throw error;
+      });
+    sliceCache.set(query, request);
+  }
+  return sliceCache.get(query);
+}
 
- allData = [...anomalous, ...normal];
-allData.sort((a, b) => a.timestamp - b.timestamp);
-filteredData = allData; // ✅ Ahora sí, después de llenar y ordenar allData
+function sliceToPoints(slice, anomalous) {
+  const points = [];
+  const times = slice?.time_index ?? [];
+  (slice?.data ?? []).forEach((cells, i) => {
+    cells.forEach(([lat, lng]) => {
+      points.push(anomalous ? {
+        lat, lng,
+        value: 10,
+        type: 'Anomalía',
+        level: 'critical',
+        timestamp: new Date(times[i]),
+        message: `Anomalía detectada el ${times[i] ?? 'desconocido'}`
+      } : {
+        lat, lng,
+        value: 2,
+        type: 'Normal',
+        level: 'info',
+        timestamp: new Date(times[i]),
+        message: `Dato normal detectado el ${times[i] ?? 'desconocido'}`
+      });
+    });
+  });
+  return points;
+}
 
-timeAxis = [...new Set(allData.map(a => a.timestamp.getTime()))]
-  .sort((a, b) => a - b)
-  .map(t => new Date(t));
+    /**
+     * Loads and draws one hour of the current date (from the cache when already fetched).
+     */
+async function showHour(hour) {
+  const dateStr = currentDate;
+  try {
+    const result = await loadSlice(dateStr, hour, hour, sliceParams());
+    // A newer date or hour was selected while this one was loading
+    if (dateStr !== currentDate || hour !== parseInt(rangeHour.value)) {
+      return;
+    }
+    filteredData = [...sliceToPoints(result.anomalous, true), ...sliceToPoints(result.non_anomalous, false)];
+    applyFilters();
+  } catch (error) {
+    console.error("❌ Error:", error);
+  }
+}
 
+    /**
+     * Prefetches the remaining hours of the date, nearest to the selected hour first.
+     */
+async function prefetchHours(dateStr, fromHour) {
+  const params = sliceParams();
+  const hours = [...Array(24).keys()]
+    .filter(h => h !== fromHour)
+    .sort((a, b) => Math.abs(a - fromHour) - Math.abs(b - fromHour));
+  const worker = async () => {
+    while (hours.length && dateStr === currentDate) {
+      const hour = hours.shift();
+      await loadSlice(dateStr, hour, hour, params).catch(() => null);
+    }
+  };
+  await Promise.all(Array.from({ length: PREFETCH_CONCURRENCY }, worker));
+}
 
-//updateCharts(filteredData);
-updateAlertList(filteredData);
-applyFilters();
+    async function loadJSONData(dateStr) {
+  currentDate = dateStr;
+  const hour = parseInt(rangeHour.value);
+  await showHour(hour);
 
-   } catch (error) {
+  try {
+    // Anomalies per hour for the alert list: the whole day at the coarsest level
+    const day = await loadSlice(dateStr, 0, 23, { zoom: 0 });
+    if (dateStr === currentDate) {
+      const anomalies = (day.anomalous?.time_index ?? []).map((time, i) => ({
+        timestamp: new Date(time),
+        count: day.anomalous.rows[i]
+      }));
+      updateAlertList(anomalies);
+    }
+  } catch (error) {
     console.error("❌ Error:", error);
-    
   }
+
+  prefetchHours(dateStr, hour);
 }
 function formatearFechaLocalLima(fechaStr) {
   const [año, mes, dia] = fechaStr.split('-').map(Number);
@@ -129,13 +198,7 @@ async function cargarIndicadores(dateStr) {
   }
 
   try {
-    const response = await fetch(`${window.env.API_URL}/api/uber-trips/indicators`, {
-      method: 'POST',
-      headers: {
-        'Content-Type': 'application/json'
-      },
-      body: JSON.stringify({ date_code: dateStr })
-    });
+    const response = await fetch(`${window.env.API_URL}/api/uber-trips/indicators?date_code=${encodeURIComponent(dateStr)}`);
 
     if (!response.ok) {
       const errorData = await response.json();
@@ -194,11 +257,7 @@ async function cargarHistoryEvents(dateStr) {
   }
 
   try {
-    const response = await fetch(`${window.env.API_URL}/api/uber-trips/history_events`, {
-      method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
-      body: JSON.stringify({ date_code: dateStr })
-    });
+    const response = await fetch(`${window.env.API_URL}/api/uber-trips/history_events?date_code=${encodeURIComponent(dateStr)}`);
 
     if (!response.ok) {
       const errorData = await response.json();
@@ -260,14 +319,7 @@ result.forEach(event => {
      */
 
 function applyFilters() {
- rangeHour = document.getElementById("range-hour");
-
-
-  const selectedHour = parseInt(rangeHour.value);
-    filteredData = allData.filter(d => d.timestamp.getHours() === selectedHour);
-    
-
-   
+  // filteredData already holds only the selected hour (see showHour)
 
   // Limpia las capas previas si existen
   if (heatmapNormalLayer) {
@@ -357,7 +409,7 @@ function applyFilters() {
 
     /**
      * Updates the list of recent alerts in the sidebar.
-     * @param {Array} data - The data to use for alerts.
+     * @param {Array} data - Anomaly counts per hour: [{timestamp, count}].
      */
 function updateAlertList(data) {
   const alertList = document.getElementById('alert-list');
@@ -368,7 +420,7 @@ function updateAlertList(data) {
     return;
   }
 
-  const anomalies = data.filter(a => a.level === 'critical' || a.level === 'warning');
+  const anomalies = data.filter(a => a.count > 0);
 
   if (anomalies.length === 0) {
     alertList.innerHTML = '<p class="text-muted">No hay alertas recientes.</p>';
@@ -386,7 +438,7 @@ function updateAlertList(data) {
     });
 
     const hourLabel = `${hour}:00`;
-    hourlyCounts[hourLabel] = (hourlyCounts[hourLabel] || 0) + 1;
+    hourlyCounts[hourLabel] = (hourlyCounts[hourLabel] || 0) + anomaly.count;
   });
 
   const sortedHours = Object.keys(hourlyCounts).sort((a, b) => parseInt(a) - parseInt(b));
@@ -423,38 +475,3 @@ function updateAlertList(data) {
 
   renderList();
 }
-
-    /**
-     * Flattens any structure and returns up to `max` [lat,lng] pairs.
-     * Also accepts {lat,lng} objects.
-     * @param {Array|Object} raw - The raw data to extract points from.
-     * @param {number} max - The maximum number of points to extract.
-     * @returns {Array<[number, number]>} An array of [latitude, longitude] pairs.
-     */
-function extractPoints(raw) {
-  const out = [];
-  const stack = Array.isArray(raw) ? [...raw] : [raw];
-
-  while (stack.length) {
-    const item = stack.pop();
-
-    if (item && typeof item === 'object' && !Array.isArray(item)) {
-      const { lat, lng } = item;
-      if (Number.isFinite(+lat) && Number.isFinite(+lng)) {
-        out.push([+lat, +lng]);
-      } else {
-        Object.values(item).forEach(v => stack.push(v));
-      }
-      continue;
-    }
-
-    if (Array.isArray(item) && item.length === 2 &&
-        Number.isFinite(+item[0]) && Number.isFinite(+item[1])) {
-      out.push([+item[0], +item[1]]);
-    } else if (Array.isArray(item)) {
-      stack.push(...item);
-    }
-  }
-
-  return out;
-}
@@ -23,13 +23,7 @@ async function cargarIndicadores() {
   const fechaAleatoria = generarFechaAleatoria('2014-04'); // Cambia mes aquí
 
   try {
-    const response = await fetch(`${window.env.API_URL}/api/uber-trips/indicators`, {
-      method: 'POST',
-      headers: {
-        'Content-Type': 'application/json'
-      },
-      body: JSON.stringify({ date_code: fechaAleatoria })
-    });
+    const response = await fetch(`${window.env.API_URL}/api/uber-trips/indicators?date_code=${encodeURIComponent(fechaAleatoria)}`);
 
     if (!response.ok) {
       throw new Error('Error al obtener los indicadores');